@@ -2,13 +2,191 @@
 # TODO:
 # Currently only using VOX to key transmitter
 import socket
+import select
 import time
+import math
 import struct
+import functools
+import itertools
 #from pathlib import Path - Use if telemetry is also logged
 
 from debug import DEBUG_MODE
 
-def create_aprs_packet(callsign, ssid, telemetry, message=""):
+# Compressed position: compression type byte (current GPS fix, NMEA source, software origin)
+COMPRESSION_TYPE_GGA = 0x32  # cs bytes hold altitude
+COMPRESSION_TYPE_RMC = 0x3A  # cs bytes hold course/speed
+METERS_TO_FEET = 3.28084
+
+
+def base91(value, width):
+    """
+    Encodes a non-negative integer as 'width' base-91 characters (most significant first).
+    """
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 91)
+        chars.append(chr(digit + 33))
+    return "".join(reversed(chars))
+
+
+def compressed_position(lat, lon, symbol_table="/", symbol=">", altitude=None, course=None, speed=None):
+    """
+    Encodes a position in the APRS base-91 compressed format (13 characters).
+
+    The cs bytes carry the altitude if it is given, otherwise the course
+    and speed if both are given, otherwise nothing.
+
+    Args:
+        lat: Latitude (degrees, north positive)
+        lon: Longitude (degrees, east positive)
+        symbol_table: Symbol table identifier ('/' primary, '\\' alternate)
+        symbol: Symbol code (e.g. 'O' balloon)
+        altitude: Altitude (m)
+        course: Course over ground (degrees)
+        speed: Speed over ground (knots)
+
+    Returns:
+        str: Symbol table, YYYY, XXXX, symbol code, cs and compression type
+    """
+    y = int(380926 * (90 - lat))
+    x = int(190463 * (180 + lon))
+    position = f"{symbol_table}{base91(y, 4)}{base91(x, 4)}{symbol}"
+
+    if altitude is not None:
+        feet = max(altitude * METERS_TO_FEET, 1.0)
+        cs = base91(min(int(round(math.log(feet) / math.log(1.002))), 91 * 91 - 1), 2)
+        return position + cs + chr(COMPRESSION_TYPE_GGA + 33)
+    if course is not None and speed is not None:
+        c = chr(int(round(course / 4)) % 90 + 33)
+        s = chr(min(int(round(math.log(speed + 1) / math.log(1.08))), 90) + 33)
+        return position + c + s + chr(COMPRESSION_TYPE_RMC + 33)
+    # c = space: no course/speed/altitude
+    return position + "   "
+
+
+def uncompressed_position(lat, lon, symbol_table="/", symbol=">"):
+    """
+    Encodes a position in the APRS uncompressed format (ddmm.mmN/dddmm.mmW).
+    """
+    lat_minutes = round(abs(lat) * 60, 2)
+    lon_minutes = round(abs(lon) * 60, 2)
+    lat_text = f"{int(lat_minutes // 60):02d}{lat_minutes % 60:05.2f}{'N' if lat >= 0 else 'S'}"
+    lon_text = f"{int(lon_minutes // 60):03d}{lon_minutes % 60:05.2f}{'E' if lon >= 0 else 'W'}"
+    return f"{lat_text}{symbol_table}{lon_text}{symbol}"
+
+
+# Base-91 comment telemetry: 2 characters per value (0-8280), up to 5 analog channels
+TELEMETRY_MAX_VALUE = 91 * 91 - 1
+TELEMETRY_MAX_CHANNELS = 5
+TELEMETRY_MAX_BITS = 8
+
+# Sequence numbers of the telemetry sent by create_aprs_packet()
+_telemetry_sequence = itertools.count()
+
+
+def encode_base91_telemetry(telemetry, channels, bits=(), sequence=0):
+    """
+    Encodes readings as base-91 comment telemetry ('|ss1122334455bb|').
+
+    Each analog value is scaled into 0-8280 with the inverse of its channel
+    equation (value = scale * raw + offset), so the receiver decodes it with
+    the EQNS definition from telemetry_definitions(). Missing values are sent as 0.
+
+    Args:
+        telemetry: Sensor name -> readings dictionary
+        channels: (sensor, key, name, unit, scale, offset) for up to 5 analog channels
+        bits: (sensor, key, name) for up to 8 digital channels (set if the value is non-zero)
+        sequence: Packet sequence number (wraps at 8281)
+
+    Returns:
+        str: The telemetry, to be placed in the comment
+    """
+    encoded = [base91(sequence % (TELEMETRY_MAX_VALUE + 1), 2)]
+    for sensor, key, _, _, scale, offset in channels[:TELEMETRY_MAX_CHANNELS]:
+        value = telemetry.get(sensor, {}).get(key)
+        raw = 0
+        if value is not None:
+            raw = min(max(int(round((float(value) - offset) / scale)), 0), TELEMETRY_MAX_VALUE)
+        encoded.append(base91(raw, 2))
+
+    if bits:
+        value = 0
+        for index, (sensor, key, _) in enumerate(bits[:TELEMETRY_MAX_BITS]):
+            reading = telemetry.get(sensor, {}).get(key)
+            if reading is not None and float(reading) != 0:
+                # B1 is the least significant bit
+                value |= 1 << index
+        encoded.append(base91(value, 2))
+
+    return "|" + "".join(encoded) + "|"
+
+
+def telemetry_definitions(callsign, ssid, channels, bits=()):
+    """
+    Returns the PARM, UNIT, EQNS and BITS messages that describe the
+    base-91 telemetry channels (APRS messages addressed to the station itself).
+
+    The messages only depend on the channel definitions, so they are built
+    once and cached.
+
+    Args:
+        callsign: Station callsign
+        ssid: SSID
+        channels: Analog channel definitions (see encode_base91_telemetry())
+        bits: Digital channel definitions (see encode_base91_telemetry())
+
+    Returns:
+        tuple[str]: The four messages as TNC2 packets
+    """
+    return _telemetry_definitions(callsign, ssid, tuple(map(tuple, channels[:TELEMETRY_MAX_CHANNELS])),
+                                  tuple(map(tuple, bits[:TELEMETRY_MAX_BITS])))
+
+
+@functools.lru_cache(maxsize=4)
+def _telemetry_definitions(callsign, ssid, channels, bits):
+    source = f"{callsign}-{ssid}"
+    addressee = source.ljust(9)
+
+    # The bit labels start after the fifth analog slot, used or not
+    padding = [""] * (TELEMETRY_MAX_CHANNELS - len(channels))
+    names = [channel[2] for channel in channels] + padding + [bit[2] for bit in bits]
+    units = [channel[3] for channel in channels] + padding + ["On"] * len(bits)
+    equations = []
+    for channel in channels:
+        equations += ["0", f"{channel[4]:g}", f"{channel[5]:g}"]
+    # Unused analog channels still need an equation
+    equations += ["0", "1", "0"] * (TELEMETRY_MAX_CHANNELS - len(channels))
+
+    messages = (
+        "PARM." + ",".join(names),
+        "UNIT." + ",".join(units),
+        "EQNS." + ",".join(equations),
+        "BITS." + "1" * TELEMETRY_MAX_BITS,
+    )
+    return tuple(f"{source}>APRS,WIDE1-1::{addressee}:{message}" for message in messages)
+
+
+def _telemetry_comment(telemetry, telemetry_channels=None, telemetry_bits=()):
+    """
+    Returns the readings as base-91 telemetry (if channels are given) or as a
+    key=value list, leaving out the position fields.
+    """
+    if telemetry_channels is not None:
+        return encode_base91_telemetry(telemetry, telemetry_channels, telemetry_bits, next(_telemetry_sequence))
+
+    telemetry_list = []
+    for sensor in telemetry.keys():
+        for data in telemetry[sensor].keys():
+            if sensor == "UBLOX" and data in ["latitude", "longitude", "altitude"]:
+                # Skip position data (sent in the position field)
+                continue
+            telemetry_list.append(f"{data}={telemetry[sensor][data]}")
+
+    return ", ".join(telemetry_list)
+
+
+def create_aprs_packet(callsign, ssid, telemetry, message="", position_format="uncompressed",
+                       symbol_table="/", symbol=">", telemetry_channels=None, telemetry_bits=()):
     """
     Creates an APRS packet string for transmission.
     
@@ -17,6 +195,13 @@ def create_aprs_packet(callsign, ssid, telemetry, message=""):
         ssid: SSID (e.g., "11")
         telemetry: Dictionary containing sensor data including lat/lon
         message: Optional message text
+        position_format: "uncompressed" (ddmm.mm, altitude as /A=) or "compressed"
+            (base-91, altitude in the position)
+        symbol_table: APRS symbol table identifier
+        symbol: APRS symbol code
+        telemetry_channels: If given, send these channels as base-91 comment telemetry
+            (see encode_base91_telemetry()) instead of the key=value list
+        telemetry_bits: Digital channels sent with 'telemetry_channels'
         
     Returns:
         str: APRS packet in TNC2 format
@@ -25,22 +210,29 @@ def create_aprs_packet(callsign, ssid, telemetry, message=""):
     
     try:
         # Extract position from telemetry
-        lat = telemetry["UBLOX"]["latitude"]
-        lon = telemetry["UBLOX"]["longitude"]
+        gps = telemetry["UBLOX"]
+        lat = float(gps["latitude"])
+        lon = float(gps["longitude"])
+        altitude = float(gps["altitude"]) if gps.get("altitude") is not None else None
         
         # Build telemetry string
-        telemetry_list = []
-        for sensor in telemetry.keys():
-            for data in telemetry[sensor].keys():
-                if data not in ["latitude", "longitude"]:  # Skip position data
-                    telemetry_list.append(f"{data}={telemetry[sensor][data]}")
-        
-        telemetry_string = ", ".join(telemetry_list)
+        telemetry_string = _telemetry_comment(telemetry, telemetry_channels, telemetry_bits)
+
+        if position_format == "compressed":
+            position = compressed_position(lat, lon, symbol_table, symbol, altitude=altitude,
+                                           course=gps.get("course"), speed=gps.get("speed_knots"))
+        elif position_format == "uncompressed":
+            position = uncompressed_position(lat, lon, symbol_table, symbol)
+            if altitude is not None:
+                # Altitude extension (feet) at the start of the comment
+                telemetry_string = f"/A={max(int(round(altitude * METERS_TO_FEET)), 0):06d}{telemetry_string}"
+        else:
+            raise ValueError(f"Invalid position format: {position_format}")
         
         # Construct APRS packet in TNC2 format
         source = f"{callsign}-{ssid}"
-        # Position report with timestamp and comment
-        packet = f"{source}>APRS,WIDE1-1:!{lat:0.2f}/{lon:0.2f}>{telemetry_string} {message}".strip()
+        # Position report (no timestamp) with comment
+        packet = f"{source}>APRS,WIDE1-1:!{position}{telemetry_string} {message}".strip()
         
         if DEBUG_MODE:
             print(f"\n\tPacket: {packet}")
@@ -52,81 +244,778 @@ def create_aprs_packet(callsign, ssid, telemetry, message=""):
         raise Exception("Unable to create APRS packet", e)
 
 
+def create_status_packet(callsign, ssid, telemetry, message="", telemetry_channels=None, telemetry_bits=()):
+    """
+    Creates an APRS status report carrying the telemetry, for when there is
+    no position to report (e.g. before the first GPS fix).
+
+    Args:
+        callsign: Station callsign (e.g., "N0CALL")
+        ssid: SSID (e.g., "11")
+        telemetry: Dictionary containing sensor data
+        message: Optional message text
+        telemetry_channels: If given, send these channels as base-91 telemetry
+            (see encode_base91_telemetry()) instead of the key=value list
+        telemetry_bits: Digital channels sent with 'telemetry_channels'
+
+    Returns:
+        str: APRS packet in TNC2 format
+    """
+    print("[APRS_Tx] Creating APRS status packet...", end="")
+
+    telemetry_string = _telemetry_comment(telemetry, telemetry_channels, telemetry_bits)
+    packet = f"{callsign}-{ssid}>APRS,WIDE1-1:>{telemetry_string} {message}".strip()
+
+    if DEBUG_MODE:
+        print(f"\n\tPacket: {packet}")
+    else:
+        print("DONE")
+    return packet
+
+
+# Batched telemetry frame: APRS user-defined format, experimental user id '{', packet type 'B'
+BATCH_PREFIX = "{{B"
+# Most samples in one frame: 3 + 12 + 29 * 8 = 247 characters, within the 256-byte AX.25 information field
+BATCH_MAX_SAMPLES = 30
+SECONDS_PER_DAY = 86400
+# Field offsets that keep the encoded values non-negative
+BATCH_ALTITUDE_OFFSET = 1000      # m
+BATCH_TEMPERATURE_OFFSET = 1000   # 0.1 C
+BATCH_DELTA_OFFSET = 4140         # signed 2-character deltas (-4140 to 4140)
+
+
+def base91_decode(text):
+    """
+    Decodes base-91 characters (most significant first) into an integer.
+    """
+    value = 0
+    for char in text:
+        value = value * 91 + ord(char) - 33
+    return value
+
+
+def _sample_deltas(first, sample):
+    """
+    Returns the time (s), altitude (m), pressure (0.1 hPa) and temperature (0.1 C) deltas of 'sample' against 'first'.
+    """
+    return (int(round(sample[0] - first[0])), int(round(sample[1] - first[1])),
+            int(round((sample[2] - first[2]) * 10)), int(round((sample[3] - first[3]) * 10)))
+
+
+def _deltas_fit(first, sample):
+    """
+    Returns True if every delta of 'sample' against 'first' fits in 2 characters.
+    """
+    return all(-BATCH_DELTA_OFFSET <= delta <= BATCH_DELTA_OFFSET for delta in _sample_deltas(first, sample))
+
+
+def encode_sample_batch(samples):
+    """
+    Encodes several timestamped samples into one base-91 batch, each sample
+    after the first as deltas against the first.
+
+    Layout: sample count (1 char), first sample (UTC seconds of day (3),
+    altitude in m + 1000 (3), pressure in Pa (3), temperature in 0.1 C + 1000 (2)),
+    then per sample: time (s), altitude (m), pressure (0.1 hPa) and
+    temperature (0.1 C) deltas, 2 characters each.
+
+    Args:
+        samples: (timestamp (time.time()), altitude (m), pressure (hPa), temperature (C)) samples
+
+    Returns:
+        str: The encoded batch (8 characters per sample after the first)
+
+    Raises:
+        ValueError: If there are too many samples, or a delta does not fit in
+            2 characters (see create_batch_packets(), which starts a new frame instead)
+    """
+    if len(samples) > BATCH_MAX_SAMPLES:
+        raise ValueError(f"Too many samples for one frame: {len(samples)} (max {BATCH_MAX_SAMPLES})")
+    timestamp, altitude, pressure, temperature = samples[0]
+    encoded = [
+        base91(len(samples), 1),
+        base91(int(timestamp) % SECONDS_PER_DAY, 3),
+        base91(max(int(round(altitude)) + BATCH_ALTITUDE_OFFSET, 0), 3),
+        base91(max(int(round(pressure * 100)), 0), 3),
+        base91(max(int(round(temperature * 10)) + BATCH_TEMPERATURE_OFFSET, 0), 2),
+    ]
+    for sample in samples[1:]:
+        for delta in _sample_deltas(samples[0], sample):
+            if not -BATCH_DELTA_OFFSET <= delta <= BATCH_DELTA_OFFSET:
+                raise ValueError(f"Sample delta out of range: {delta} (max +/-{BATCH_DELTA_OFFSET})")
+            encoded.append(base91(delta + BATCH_DELTA_OFFSET, 2))
+    return "".join(encoded)
+
+
+def decode_sample_batch(data):
+    """
+    Decodes a batch made by encode_sample_batch().
+
+    Returns:
+        list[tuple]: (UTC seconds of day, altitude (m), pressure (hPa), temperature (C)) samples
+    """
+    count = base91_decode(data[0])
+    seconds = base91_decode(data[1:4])
+    altitude = base91_decode(data[4:7]) - BATCH_ALTITUDE_OFFSET
+    pressure = base91_decode(data[7:10]) / 100
+    temperature = (base91_decode(data[10:12]) - BATCH_TEMPERATURE_OFFSET) / 10
+
+    samples = [(seconds, altitude, pressure, temperature)]
+    for offset in range(12, 12 + 8 * (count - 1), 8):
+        dt, d_altitude, d_pressure, d_temperature = (
+            base91_decode(data[index:index + 2]) - BATCH_DELTA_OFFSET for index in range(offset, offset + 8, 2))
+        samples.append(((seconds + dt) % SECONDS_PER_DAY, altitude + d_altitude,
+                        round(pressure + d_pressure / 10, 2), round(temperature + d_temperature / 10, 1)))
+    return samples
+
+
+def create_batch_packet(callsign, ssid, samples):
+    """
+    Creates a batched telemetry packet (APRS user-defined format '{{B')
+    carrying several BMP280 samples.
+
+    Args:
+        callsign: Station callsign
+        ssid: SSID
+        samples: (timestamp, altitude (m), pressure (hPa), temperature (C)) samples, oldest first
+
+    Returns:
+        str: APRS packet in TNC2 format
+    """
+    if not samples:
+        raise ValueError("No samples to send")
+    return f"{callsign}-{ssid}>APRS,WIDE1-1:{BATCH_PREFIX}{encode_sample_batch(samples)}"
+
+
+def create_batch_packets(callsign, ssid, samples, max_samples=BATCH_MAX_SAMPLES):
+    """
+    Splits samples over as many batched telemetry packets as needed.
+
+    A new packet is started when one is full, or when a sample's deltas
+    against the packet's first sample would not fit (e.g. a fast descent).
+
+    Args:
+        callsign: Station callsign
+        ssid: SSID
+        samples: (timestamp, altitude (m), pressure (hPa), temperature (C)) samples, oldest first
+        max_samples: Samples per packet (at most BATCH_MAX_SAMPLES)
+
+    Returns:
+        list[str]: APRS packets in TNC2 format, oldest samples first
+    """
+    max_samples = min(max_samples, BATCH_MAX_SAMPLES)
+    batches = []
+    for sample in samples:
+        if batches and len(batches[-1]) < max_samples and _deltas_fit(batches[-1][0], sample):
+            batches[-1].append(sample)
+        else:
+            batches.append([sample])
+    return [create_batch_packet(callsign, ssid, batch) for batch in batches]
+
+
+# AX.25 UI frame fields
+AX25_CONTROL_UI = 0x03
+AX25_PID_NO_LAYER3 = 0xF0
+AX25_SSID_COMMAND = 0xE0   # Destination SSID byte: C bit + reserved bits
+AX25_SSID_RESPONSE = 0x60  # Source/path SSID byte: reserved bits
+AX25_LAST_ADDRESS = 0x01
+
+# KISS framing
+FEND = b'\xc0'  # Frame End
+FESC = b'\xdb'  # Frame Escape
+TFEND = b'\xdc'  # Transposed Frame End
+TFESC = b'\xdd'  # Transposed Frame Escape
+KISS_DATA_PORT0 = b'\x00'  # Command byte: data frame on port 0
+
+
+def encode_ax25_address(address, ssid_bits=AX25_SSID_RESPONSE, last=False):
+    """
+    Encodes one AX.25 address field (7 bytes).
+
+    Args:
+        address: Callsign with optional SSID (e.g. "N8SSU-11" or "WIDE1-1")
+        ssid_bits: Upper bits of the SSID byte (C/H bit and reserved bits)
+        last: Set the end-of-address bit (final address in the header)
+
+    Returns:
+        bytes: The callsign shifted left one bit and space padded, then the SSID byte
+    """
+    callsign, _, ssid = address.upper().partition('-')
+    if not callsign or len(callsign) > 6:
+        raise ValueError(f"Invalid AX.25 callsign: {address}")
+    ssid = int(ssid) if ssid else 0
+    if not 0 <= ssid <= 15:
+        raise ValueError(f"Invalid AX.25 SSID: {address}")
+
+    field = bytes(ord(char) << 1 for char in callsign.ljust(6))
+    return field + bytes((ssid_bits | (ssid << 1) | (AX25_LAST_ADDRESS if last else 0),))
+
+
+@functools.lru_cache(maxsize=16)
+def ax25_header(source, destination="APRS", path=("WIDE1-1",)):
+    """
+    Builds the address, control and PID fields of an AX.25 UI frame.
+
+    The result is cached, so the shifted address bytes for a station are
+    computed once.
+
+    Args:
+        source: Source callsign with SSID (e.g. "N8SSU-11")
+        destination: Destination callsign (e.g. "APRS")
+        path: Digipeater path (tuple, e.g. ("WIDE1-1",))
+
+    Returns:
+        bytes: Frame header (everything before the information field)
+    """
+    addresses = [source, *path]
+    header = encode_ax25_address(destination, AX25_SSID_COMMAND)
+    for index, address in enumerate(addresses):
+        header += encode_ax25_address(address, last=index == len(addresses) - 1)
+    return header + bytes((AX25_CONTROL_UI, AX25_PID_NO_LAYER3))
+
+
+@functools.lru_cache(maxsize=16)
+def _tnc2_header(text):
+    """
+    Converts a TNC2 header ("SRC>DEST,PATH1,PATH2") into AX.25 header bytes.
+    """
+    source, _, rest = text.partition('>')
+    destination, *path = rest.split(',')
+    return ax25_header(source, destination, tuple(path))
+
+
+def encode_ax25_frame(packet):
+    """
+    Encodes a TNC2 packet ("SRC>DEST,PATH:info") as a binary AX.25 UI frame.
+
+    Args:
+        packet: APRS packet string in TNC2 format
+
+    Returns:
+        bytes: The AX.25 frame (without flags or FCS, as carried in KISS)
+    """
+    header, separator, info = packet.partition(':')
+    if not separator or '>' not in header:
+        raise ValueError("Invalid packet format")
+    return _tnc2_header(header) + info.encode('ascii')
+
+
+def kiss_escape(data):
+    """
+    Escapes FEND/FESC bytes for the inside of a KISS frame.
+    """
+    return data.replace(FESC, FESC + TFESC).replace(FEND, FESC + TFEND)
+
+
 def encode_kiss_frame(packet):
     """
     Encode an APRS packet into a KISS frame for transmission.
     
     Args:
-        packet: APRS packet string in TNC2 format
+        packet: APRS packet string in TNC2 format (or an AX.25 frame as bytes)
         
     Returns:
-        bytes: KISS-encoded frame
+        bytes: KISS-encoded frame (data frame on port 0 carrying an AX.25 UI frame)
     """
-    FEND = 0xC0  # Frame End
-    FESC = 0xDB  # Frame Escape
-    TFEND = 0xDC  # Transposed Frame End
-    TFESC = 0xDD  # Transposed Frame Escape
-    
-    # Command byte: 0x00 = data frame on port 0
-    frame = bytearray([FEND, 0x00])
-    
-    # Add the packet data (direwolf will parse TNC2 format)
-    data = packet.encode('ascii')
-    
-    # Escape special characters
-    for byte in data:
-        if byte == FEND:
-            frame.extend([FESC, TFEND])
-        elif byte == FESC:
-            frame.extend([FESC, TFESC])
-        else:
-            frame.append(byte)
-    
-    # End frame
-    frame.append(FEND)
-    
-    return bytes(frame)
+    if isinstance(packet, str):
+        packet = encode_ax25_frame(packet)
+    return FEND + KISS_DATA_PORT0 + kiss_escape(packet) + FEND
+
+
+# AGW header (36 bytes): radio port, (reserved), data kind, (reserved), PID, (reserved),
+# call from, call to, data length, user (reserved)
+AGW_HEADER = struct.Struct('<B3xcxBx10s10sII')
+AGW_CALL_BYTES = 10
+AGW_MAX_DIGIPEATERS = 8
+
+
+class AgwClient:
+    """
+    Persistent connection to the direwolf AGW (AGWPE) TCP port.
+
+    Connects on first use, registers the station callsign ('X') and keeps
+    the socket open between packets. Packets go out either as raw AX.25
+    frames ('K', built here with the cached headers) or as unproto text that
+    direwolf frames itself ('V'). Before each frame, direwolf's transmit queue
+    for the radio port is queried ('y'); while it holds 'max_outstanding'
+    frames or more, the send waits for it (at most 'flow_timeout' seconds),
+    so packets are not piled up in direwolf faster than they go on the air.
+    After a failed connect, reconnects are spaced out with exponential
+    backoff, as in KissClient.
+    """
+
+    def __init__(self, host='localhost', port=8000, callsign=None, radio_port=0, max_outstanding=2,
+                 flow_timeout=30.0, poll_interval=0.1, min_backoff=1.0, max_backoff=60.0, connect_timeout=2.0):
+        """
+        Args:
+            host: Direwolf AGW server hostname
+            port: Direwolf AGW TCP port
+            callsign: Callsign registered on connect (None: no registration)
+            radio_port: Direwolf radio channel the frames are sent on
+            max_outstanding: Frames direwolf may have queued before the next send waits
+                (None: no flow control)
+            flow_timeout: Longest wait for room in direwolf's transmit queue (seconds)
+            poll_interval: Time between transmit queue queries while waiting (seconds)
+            min_backoff: First delay before reconnecting after a failed connect (seconds)
+            max_backoff: Longest delay between reconnect attempts (seconds)
+            connect_timeout: Connect and reply timeout (seconds)
+        """
+        self.host = host
+        self.port = port
+        self.callsign = callsign
+        self.radio_port = radio_port
+        self.max_outstanding = max_outstanding
+        self.flow_timeout = flow_timeout
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        self.connects = 0
+
+        self._sock = None
+        self._backoff = min_backoff
+        self._retry_at = 0.0
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise ConnectionError(f"direwolf unavailable, reconnecting in {self._retry_at - now:.0f} seconds")
+        try:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            # Small request/reply frames: do not hold a query back behind the previous frame's ACK
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.callsign:
+                self._register()
+        except OSError:
+            self.close()
+            self._retry_at = now + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            raise
+        self._backoff = self.min_backoff
+        self.connects += 1
+
+    def _register(self):
+        """
+        Registers the callsign with direwolf ('X'); the reply holds 1 on success.
+        """
+        self._write(b'X', call_from=self.callsign)
+        data = self._reply(b'X')
+        if not data or data[0] != 1:
+            raise ConnectionError(f"direwolf refused to register {self.callsign}")
+
+    def close(self):
+        """
+        Closes the connection (the next send reconnects).
+        """
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+
+    def _write(self, kind, data=b'', pid=0, call_from='', call_to='', radio_port=None):
+        if radio_port is None:
+            radio_port = self.radio_port
+        header = AGW_HEADER.pack(radio_port, kind, pid, call_from.encode('ascii'), call_to.encode('ascii'),
+                                 len(data), 0)
+        self._sock.sendall(header + data)
+
+    def _recv_exact(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self._sock.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("direwolf closed the AGW connection")
+            data += chunk
+        return bytes(data)
+
+    def _reply(self, kind, radio_port=None):
+        """
+        Reads frames until the reply of the given kind arrives (anything else,
+        e.g. monitored packets, is skipped).
 
+        Returns:
+            bytes: The reply data
+        """
+        if radio_port is None:
+            radio_port = self.radio_port
+        while True:
+            port, reply_kind, _, _, _, length, _ = AGW_HEADER.unpack(self._recv_exact(AGW_HEADER.size))
+            data = self._recv_exact(length)
+            # 'X' replies are not tied to a radio port
+            if reply_kind == kind and (port == radio_port or kind == b'X'):
+                return data
 
-def transmit_via_direwolf_kiss(packet, kiss_host='localhost', kiss_port=8001):
+    def _request(self, send):
+        """
+        Runs 'send' on the connection (connecting first if needed); the
+        connection is closed if it fails.
+        """
+        if self._sock is None:
+            self._connect()
+        try:
+            return send()
+        except OSError:
+            self.close()
+            raise
+
+    def outstanding_frames(self, radio_port=None, call_from=None, call_to=None):
+        """
+        Asks direwolf how many frames are waiting to be transmitted.
+
+        Without callsigns, this is the radio port's transmit queue ('y' query);
+        with both, the frames queued for that connection ('Y' query).
+
+        Args:
+            radio_port: Direwolf radio channel (default: the client's)
+            call_from/call_to: Callsigns of a connected session
+
+        Returns:
+            int: Frames still queued for transmission
+        """
+        kind = b'Y' if call_from and call_to else b'y'
+
+        def query():
+            self._write(kind, call_from=call_from or '', call_to=call_to or '', radio_port=radio_port)
+            data = self._reply(kind, radio_port)
+            if len(data) < 4:
+                raise ConnectionError(f"Invalid AGW '{kind.decode()}' reply from direwolf")
+            return struct.unpack_from('<I', data)[0]
+
+        return self._request(query)
+
+    def _wait_for_queue(self, below, timeout, radio_port=None):
+        """
+        Waits until direwolf's transmit queue holds fewer than 'below' frames.
+
+        Returns:
+            bool: True if it did within 'timeout' seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while self.outstanding_frames(radio_port) >= below:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def wait_until_sent(self, timeout, radio_port=None, airtime=0):
+        """
+        Waits until direwolf's transmit queue is empty and the last frame is off the air.
+
+        Direwolf takes a frame off its queue when it starts transmitting it,
+        so an empty queue is only trusted 'airtime' seconds after the last
+        query that still counted a frame (or after the call, if none did).
+
+        Args:
+            timeout: Longest wait (seconds)
+            radio_port: Direwolf radio channel (default: the client's)
+            airtime: Time the frame keeps the transmitter keyed (seconds)
+
+        Returns:
+            bool: True if the frames were transmitted within 'timeout' seconds.
+        """
+        now = time.monotonic()
+        deadline = now + timeout
+        done_at = now + airtime
+        while True:
+            if self.outstanding_frames(radio_port) > 0:
+                done_at = time.monotonic() + self.poll_interval + airtime
+            elif time.monotonic() >= done_at:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(max(min(self.poll_interval, done_at - time.monotonic()), 0))
+
+    def _flow_control(self, radio_port):
+        if self.max_outstanding is None:
+            return
+        if not self._wait_for_queue(self.max_outstanding, self.flow_timeout, radio_port):
+            raise ConnectionError(f"direwolf transmit queue still full after {self.flow_timeout} seconds")
+
+    def send_raw(self, frame, radio_port=None):
+        """
+        Sends an AX.25 frame as is ('K').
+
+        Args:
+            frame: AX.25 frame (bytes), or an APRS packet string in TNC2 format
+            radio_port: Direwolf radio channel (default: the client's)
+
+        Returns:
+            int: Bytes of AX.25 frame sent
+        """
+        if isinstance(frame, str):
+            frame = encode_ax25_frame(frame)
+        if radio_port is None:
+            radio_port = self.radio_port
+
+        def send():
+            self._flow_control(radio_port)
+            # The data starts with the KISS command byte (data frame on the radio port)
+            self._write(b'K', bytes((radio_port << 4,)) + frame, radio_port=radio_port)
+            return len(frame)
+
+        return self._request(send)
+
+    def send_unproto(self, packet, radio_port=None):
+        """
+        Sends a TNC2 packet as an unproto (UI) frame for direwolf to build ('V').
+
+        Args:
+            packet: APRS packet string in TNC2 format
+            radio_port: Direwolf radio channel (default: the client's)
+
+        Returns:
+            int: Bytes of information field sent
+        """
+        header, separator, info = packet.partition(':')
+        source, _, rest = header.partition('>')
+        if not separator or not source or not rest:
+            raise ValueError("Invalid packet format")
+        destination, *path = rest.split(',')
+        if len(path) > AGW_MAX_DIGIPEATERS:
+            raise ValueError(f"Too many digipeaters in path: {len(path)}")
+
+        # Number of digipeaters, then each one NUL-padded to 10 bytes
+        data = bytes((len(path),))
+        for digipeater in path:
+            data += digipeater.encode('ascii').ljust(AGW_CALL_BYTES, b'\0')
+        data += info.encode('ascii')
+
+        def send():
+            self._flow_control(radio_port)
+            self._write(b'V', data, pid=AX25_PID_NO_LAYER3, call_from=source, call_to=destination,
+                        radio_port=radio_port)
+            return len(info)
+
+        return self._request(send)
+
+
+class KissClient:
+    """
+    Persistent connection to the direwolf KISS TCP port.
+
+    Connects on first use and keeps the socket open between packets. Sends
+    are non-blocking: whatever the kernel does not take at once is kept and
+    written out by the next call. After a failed connect, reconnects are
+    spaced out with exponential backoff, so a missing direwolf does not cost
+    a connect timeout every cycle. Whether the frames have left direwolf's
+    transmit queue is asked from direwolf itself (AGW 'y' query).
+    """
+
+    def __init__(self, host='localhost', port=8001, agw_host=None, agw_port=8000,
+                 min_backoff=1.0, max_backoff=60.0, connect_timeout=2.0, max_pending=65536):
+        """
+        Args:
+            host: Direwolf KISS server hostname
+            port: Direwolf KISS TCP port
+            agw_host: Direwolf AGW server hostname for transmit queue queries (default: 'host')
+            agw_port: Direwolf AGW TCP port
+            min_backoff: First delay before reconnecting after a failed connect (seconds)
+            max_backoff: Longest delay between reconnect attempts (seconds)
+            connect_timeout: Connect timeout (seconds)
+            max_pending: Unsent bytes kept before the connection is considered stuck
+        """
+        self.host = host
+        self.port = port
+        self.agw_host = agw_host if agw_host is not None else host
+        self.agw_port = agw_port
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        self.max_pending = max_pending
+        self.connects = 0
+
+        self._sock = None
+        self._agw = AgwClient(self.agw_host, agw_port, max_outstanding=None, connect_timeout=connect_timeout)
+        self._pending = bytearray()
+        self._backoff = min_backoff
+        self._retry_at = 0.0
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise ConnectionError(f"direwolf unavailable, reconnecting in {self._retry_at - now:.0f} seconds")
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        except OSError:
+            self._retry_at = now + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            raise
+        sock.setblocking(False)
+        self._sock = sock
+        self._backoff = self.min_backoff
+        self.connects += 1
+
+    def close(self):
+        """
+        Closes the connections (the next send reconnects). Unsent bytes are dropped.
+        """
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._agw.close()
+        self._pending.clear()
+
+    def _discard_incoming(self):
+        """
+        Drops frames direwolf sends back (received packets), so its side never blocks.
+        """
+        while True:
+            try:
+                data = self._sock.recv(4096)
+            except BlockingIOError:
+                return
+            if not data:
+                raise ConnectionError("direwolf closed the KISS connection")
+
+    def send(self, frame):
+        """
+        Queues a KISS frame and writes as much as the socket takes without blocking.
+
+        Args:
+            frame: KISS-encoded frame
+
+        Returns:
+            bool: True if everything queued so far has been handed to the kernel.
+        """
+        if self._sock is None:
+            self._connect()
+        self._pending += frame
+        try:
+            self._discard_incoming()
+            while self._pending:
+                sent = self._sock.send(self._pending)
+                del self._pending[:sent]
+        except BlockingIOError:
+            if len(self._pending) > self.max_pending:
+                self.close()
+                raise ConnectionError("direwolf is not reading from the KISS connection")
+        except OSError:
+            self.close()
+            raise
+        return not self._pending
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued byte has been handed to the kernel.
+
+        If the connection stays backed up, it is closed (dropping the unsent
+        bytes, so a retry resends whole frames) and ConnectionError is raised.
+
+        Args:
+            timeout: Longest wait (seconds, default: the connect timeout)
+        """
+        if timeout is None:
+            timeout = self.connect_timeout
+        deadline = time.monotonic() + timeout
+        while self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([], [self._sock], [], remaining)[1]:
+                self.close()
+                raise ConnectionError(f"direwolf did not take the frame within {timeout} seconds")
+            self.send(b'')
+
+    def outstanding_frames(self, radio_port=0):
+        """
+        Asks direwolf how many frames are waiting in its transmit queue (AGW 'y' query).
+
+        Args:
+            radio_port: Direwolf radio channel
+
+        Returns:
+            int: Frames still queued for transmission
+        """
+        return self._agw.outstanding_frames(radio_port)
+
+    def wait_until_sent(self, timeout, radio_port=0, airtime=0):
+        """
+        Waits until every frame has been handed to direwolf and transmitted.
+
+        The KISS port gives no acknowledgement, so a frame still in flight
+        reads as an empty queue: the wait lasts at least 'airtime' seconds
+        (see AgwClient.wait_until_sent()).
+
+        Returns:
+            bool: True if the frames were transmitted within 'timeout' seconds.
+        """
+        deadline = time.monotonic() + timeout
+        if self._pending and self._sock is not None:
+            self.flush(timeout)
+        return self._agw.wait_until_sent(max(deadline - time.monotonic(), 0), radio_port, airtime)
+
+
+# Persistent KISS clients, one per (host, port)
+_kiss_clients = {}
+
+
+def get_kiss_client(kiss_host='localhost', kiss_port=8001, agw_host=None, agw_port=8000):
+    """
+    Returns the shared KissClient for a direwolf KISS port (querying its
+    transmit queue over the AGW port).
+    """
+    client = _kiss_clients.get((kiss_host, kiss_port))
+    if client is None:
+        client = _kiss_clients[(kiss_host, kiss_port)] = KissClient(kiss_host, kiss_port, agw_host, agw_port)
+    return client
+
+
+def _wait_until_sent(client, wait_timeout, airtime=0):
+    """
+    Waits for direwolf to transmit the frames handed to it.
+
+    The frame has already been handed over at this point, so a failed
+    transmit queue query is reported but not raised (a retry would send the
+    frame twice).
+    """
+    try:
+        sent = client.wait_until_sent(wait_timeout, airtime=airtime)
+    except OSError as e:
+        print("ERROR: Cannot query direwolf's transmit queue:", e)
+        return
+    if sent:
+        if DEBUG_MODE:
+            print("[APRS_Tx] Transmission complete")
+    else:
+        print(f"ERROR: direwolf still transmitting after {wait_timeout} seconds")
+
+
+def transmit_via_direwolf_kiss(packet, kiss_host='localhost', kiss_port=8001, wait_timeout=0,
+                               agw_host=None, agw_port=8000, airtime=0):
     """
     Transmit APRS packet via existing direwolf service using KISS protocol.
-    
+
+    The frame goes out over a persistent connection without blocking;
+    direwolf handles the actual transmission timing and PTT.
+
     Args:
         packet: APRS packet string in TNC2 format
         kiss_host: Direwolf KISS server hostname
         kiss_port: Direwolf KISS TCP port (default 8001)
+        wait_timeout: If set, wait up to this long (seconds) for direwolf's transmit
+            queue to drain (queried over its AGW port)
+        agw_host: Direwolf AGW server hostname for the transmit queue query (default: 'kiss_host')
+        agw_port: Direwolf AGW TCP port
+        airtime: Time the packet keeps the transmitter keyed (seconds), the
+            shortest 'wait_timeout' wait
     """
     if DEBUG_MODE:
-        print(f"[APRS_Tx] Connecting to direwolf KISS interface at {kiss_host}:{kiss_port}...", end="")
+        print(f"[APRS_Tx] Sending to direwolf KISS interface at {kiss_host}:{kiss_port}...", end="")
     else:
-        print("[APRS_Tx] Connecting to direwolf...", end="")
-    
-    sock = None
+        print("[APRS_Tx] Sending to direwolf...", end="")
+
+    client = get_kiss_client(kiss_host, kiss_port, agw_host, agw_port)
     try:
-        # Connect to direwolf KISS interface
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        sock.connect((kiss_host, kiss_port))
-        
-        print("DONE")
-        
         # Encode and send packet
         kiss_frame = encode_kiss_frame(packet)
+        if not client.send(kiss_frame):
+            # The socket is backed up: finish handing the frame over before calling it sent
+            client.flush()
+        print("DONE")
+
         if DEBUG_MODE:
-            print("[APRS_Tx] Sending...", end="")
-        sock.sendall(kiss_frame)
-        
-        if DEBUG_MODE:
-            print(f"DONE.\n\tSent {len(kiss_frame)} bytes to direwolf")
-        
-        # Wait for transmission to complete
-        # Direwolf will handle the actual transmission timing and PTT
-        time.sleep(1.0)  # Adjust based on typical packet length
-        
-        if DEBUG_MODE:
-            print("[APRS_Tx] Transmission complete")
-        
+            print(f"\tSent {len(kiss_frame)} bytes to direwolf")
+
+        if wait_timeout:
+            _wait_until_sent(client, wait_timeout, airtime)
+
     except ConnectionRefusedError:
         raise Exception(
             f"Cannot connect to direwolf on {kiss_host}:{kiss_port}. "
@@ -136,66 +1025,67 @@ def transmit_via_direwolf_kiss(packet, kiss_host='localhost', kiss_port=8001):
         raise Exception("Connection to direwolf timed out")
     except Exception as e:
         raise Exception("Transmission error:", e)
-    finally:
-        if sock:
-            sock.close()
 
 
-def transmit_via_direwolf_agw(packet, agw_host='localhost', agw_port=8000):
+# Persistent AGW clients, one per (host, port)
+_agw_clients = {}
+
+
+def get_agw_client(agw_host='localhost', agw_port=8000, callsign=None, max_outstanding=2):
+    """
+    Returns the shared AgwClient for a direwolf AGW port (registering
+    'callsign' when it connects).
+    """
+    client = _agw_clients.get((agw_host, agw_port))
+    if client is None:
+        client = _agw_clients[(agw_host, agw_port)] = AgwClient(agw_host, agw_port, callsign=callsign,
+                                                                max_outstanding=max_outstanding)
+    return client
+
+
+def transmit_via_direwolf_agw(packet, agw_host='localhost', agw_port=8000, unproto=False, max_outstanding=2,
+                              wait_timeout=0, airtime=0):
     """
     Transmit APRS packet via existing direwolf service using AGW protocol.
-    Alternative to KISS, may be easier for some applications.
-    
+
+    The frame goes out over a persistent connection once direwolf's transmit
+    queue has room; direwolf handles the actual transmission timing and PTT.
+
     Args:
         packet: APRS packet string in TNC2 format
         agw_host: Direwolf AGW server hostname
         agw_port: Direwolf AGW TCP port (default 8000)
+        unproto: Let direwolf build the frame ('V') instead of sending the encoded AX.25 frame ('K')
+        max_outstanding: Frames direwolf may have queued before this send waits (None: no flow control)
+        wait_timeout: If set, wait up to this long (seconds) for direwolf's transmit queue to drain
+        airtime: Time the packet keeps the transmitter keyed (seconds), the
+            shortest 'wait_timeout' wait
     """
     if DEBUG_MODE:
-        print(f"Connecting to direwolf AGW interface at {agw_host}:{agw_port}...", end="")
-    
-    sock = None
+        print(f"[APRS_Tx] Sending to direwolf AGW interface at {agw_host}:{agw_port}...", end="")
+    else:
+        print("[APRS_Tx] Sending to direwolf...", end="")
+
+    client = get_agw_client(agw_host, agw_port, callsign=packet.partition('>')[0], max_outstanding=max_outstanding)
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        sock.connect((agw_host, agw_port))
-        
-        if DEBUG_MODE:
-            print("DONE")
-        
-        # AGW 'K' frame = send unproto (UI) frame
-        # This is a simplified implementation
-        parts = packet.split(':', 1)
-        if len(parts) != 2:
-            raise ValueError("Invalid packet format")
-        
-        header = parts[0]
-        info = parts[1]
-        
-        # Send raw packet (direwolf AGW accepts TNC2 format)
-        # Frame format: 'K' command with radio port 0
-        agw_frame = bytearray()
-        agw_frame.extend(b'K')  # Unproto frame type
-        agw_frame.extend(struct.pack('<I', 0))  # Port number
-        agw_frame.extend(packet.encode('ascii'))
-        
-        sock.sendall(agw_frame)
-        
-        time.sleep(1.0)
-        
+        sent = client.send_unproto(packet) if unproto else client.send_raw(packet)
+        print("DONE")
+
         if DEBUG_MODE:
-            print("[APRS_Tx] Transmission complete")
-        
+            print(f"\tSent {sent} bytes to direwolf")
+
+        if wait_timeout:
+            _wait_until_sent(client, wait_timeout, airtime)
+
     except ConnectionRefusedError:
         raise Exception(
             f"Cannot connect to direwolf on {agw_host}:{agw_port}. "
             "Ensure direwolf service is running and AGWPE is enabled in config."
         )
+    except socket.timeout:
+        raise Exception("Connection to direwolf timed out")
     except Exception as e:
         raise Exception("Transmission error:", e)
-    finally:
-        if sock:
-            sock.close()
 
 
 def transmit_aprs(callsign, ssid, telemetry, message="",
@@ -213,7 +1103,7 @@ def transmit_aprs(callsign, ssid, telemetry, message="",
         ssid: SSID
         telemetry: Telemetry dictionary
         message: Optional message
-        interface: 'kiss' or 'agw' (KISS recommended)
+        interface: 'kiss' or 'agw'
         kiss_host/kiss_port: KISS interface settings
         agw_host/agw_port: AGW interface settings
     """
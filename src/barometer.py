@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+import bmp280
+from config import BARO_SAMPLE_RATE, BARO_WINDOW, BARO_OVERSAMPLE, BARO_MEDIAN, BARO_IIR_ALPHA
+from config import BARO_MAX_AGE
+
+from debug import DEBUG_MODE
+
+
+class BarometerSampler(threading.Thread):
+    """
+    Samples the BMP280 in the background at a fixed rate.
+
+    Each sample is the mean of 'oversample' burst reads. Altitude is then
+    median filtered over the last few samples (to drop I2C glitches) and IIR
+    smoothed, and the vertical speed is the least-squares slope of the
+    smoothed altitude over the whole window. Samples are kept in fixed-size
+    NumPy ring buffers; the filtered state is computed on the sampler thread,
+    so latest() is O(1).
+    """
+
+    def __init__(self, sensor=None, rate=BARO_SAMPLE_RATE, window=BARO_WINDOW,
+                 oversample=BARO_OVERSAMPLE, median=BARO_MEDIAN, alpha=BARO_IIR_ALPHA):
+        """
+        Args:
+            sensor: BMP280Sensor to sample (default: the shared bmp280.sensor)
+            rate: Sample rate (Hz)
+            window: Number of samples kept in the ring buffers
+            oversample: Burst reads averaged into one sample
+            median: Width of the median filter (samples)
+            alpha: IIR smoothing factor (0-1, higher follows the raw data more closely)
+        """
+        super().__init__(name="barometer", daemon=True)
+        self.sensor = sensor if sensor is not None else bmp280.sensor
+        self.period = 1.0 / rate
+        self.window = window
+        self.oversample = oversample
+        self.median = median
+        self.alpha = alpha
+
+        # Ring buffers: sample time, raw (oversampled) altitude, smoothed altitude
+        self._times = np.zeros(window)
+        self._raw = np.zeros(window)
+        self._smoothed = np.zeros(window)
+        self._index = 0
+        self._count = 0
+
+        # Latest filtered state (replaced as a whole, so readers never see a partial update)
+        self._state = None
+        self._stop_event = threading.Event()
+
+    def _ordered(self, buffer, length):
+        """
+        Returns the last 'length' entries of a ring buffer, oldest first.
+        """
+        indices = (self._index - length + np.arange(length)) % self.window
+        return buffer[indices]
+
+    def add_sample(self, timestamp, altitude, pressure, temperature):
+        """
+        Adds one sample and updates the filtered state.
+
+        Args:
+            timestamp: Sample time (time.monotonic())
+            altitude: Raw altitude (m)
+            pressure: Pressure (hPa)
+            temperature: Temperature (C)
+        """
+        self._times[self._index] = timestamp
+        self._raw[self._index] = altitude
+        self._index = (self._index + 1) % self.window
+        self._count = min(self._count + 1, self.window)
+
+        # Median over the most recent samples, then IIR smoothing
+        median = float(np.median(self._ordered(self._raw, min(self.median, self._count))))
+        if self._state is None:
+            smoothed = median
+        else:
+            smoothed = self.alpha * median + (1.0 - self.alpha) * self._state["altitude"]
+        self._smoothed[(self._index - 1) % self.window] = smoothed
+
+        # Vertical speed: least-squares slope of the smoothed altitude over the window
+        vertical_speed = 0.0
+        if self._count > 1:
+            times = self._ordered(self._times, self._count)
+            altitudes = self._ordered(self._smoothed, self._count)
+            times = times - times.mean()
+            denominator = np.dot(times, times)
+            if denominator > 0:
+                vertical_speed = float(np.dot(times, altitudes - altitudes.mean()) / denominator)
+
+        self._state = {
+            "time": timestamp,
+            "altitude": smoothed,
+            "vertical_speed": vertical_speed,
+            "pressure": pressure,
+            "temperature": temperature,
+        }
+
+    def sample(self):
+        """
+        Takes one oversampled reading from the sensor.
+        """
+        readings = np.array([
+            [reading["altitude"], reading["pressure"], reading["temperature"]]
+            for reading in (self.sensor.snapshot() for _ in range(self.oversample))
+        ])
+        altitude, pressure, temperature = readings.mean(axis=0)
+        self.add_sample(time.monotonic(), float(altitude), float(pressure), float(temperature))
+
+    def latest(self, max_age=BARO_MAX_AGE):
+        """
+        Returns the latest filtered state, or None if there is none younger than 'max_age' seconds.
+
+        Returns:
+            dict: Smoothed altitude (m), vertical speed (m/s), pressure (hPa),
+                temperature (C) and sample time.
+        """
+        state = self._state
+        if state is None or time.monotonic() - state["time"] > max_age:
+            return None
+        return state
+
+    def run(self):
+        next_sample = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                if DEBUG_MODE:
+                    print("ERROR: [barometer]", e)
+
+            # Keep a fixed sample rate (drop samples if a read overran)
+            next_sample += self.period
+            now = time.monotonic()
+            if next_sample < now:
+                next_sample = now
+            self._stop_event.wait(next_sample - now)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start(**kwargs):
+    """
+    Starts the background sampler and makes bmp280.read_sensor() use it.
+
+    Returns:
+        BarometerSampler: The running sampler.
+    """
+    sampler = BarometerSampler(**kwargs)
+    sampler.start()
+    bmp280.sampler = sampler
+    return sampler
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import aprs_tx
+from config import DEBUG_MODE
+from config import AIRTIME_BAUD, AIRTIME_TXDELAY, AIRTIME_DUTY_CYCLE, AIRTIME_BURST
+from config import BEACON_PHASE_PERIODS, BEACON_ASCENT_RATE, BEACON_DESCENT_RATE
+from config import BEACON_LOW_ALTITUDE, BEACON_BURST_HOLD
+
+# AX.25 bytes on the air besides the frame itself: FCS (2) and the closing flag
+AX25_TRAILER_BYTES = 3
+# Average growth of the bit stream from HDLC bit stuffing
+BIT_STUFFING = 1.05
+
+
+def frame_airtime(packet, baud=AIRTIME_BAUD, txdelay=AIRTIME_TXDELAY):
+    """
+    Estimates how long a packet keeps the transmitter keyed.
+
+    Args:
+        packet: APRS packet string in TNC2 format (or an AX.25 frame as bytes)
+        baud: Modem speed (bits/s)
+        txdelay: Key-up time before the frame (flags/preamble, seconds)
+
+    Returns:
+        float: Airtime (seconds)
+    """
+    if isinstance(packet, str):
+        packet = aprs_tx.encode_ax25_frame(packet)
+    bits = (len(packet) + AX25_TRAILER_BYTES) * 8 * BIT_STUFFING
+    return txdelay + bits / baud
+
+
+class AirtimeBudget:
+    """
+    Token bucket limiting the transmitter duty cycle.
+
+    Airtime is earned at 'duty_cycle' seconds per second, up to 'burst'
+    seconds, and spent by every frame sent. TxQueue holds packets back
+    (highest priority first) until the budget covers them.
+    """
+
+    def __init__(self, duty_cycle=AIRTIME_DUTY_CYCLE, burst=AIRTIME_BURST):
+        """
+        Args:
+            duty_cycle: Fraction of the time the transmitter may be keyed (0-1)
+            burst: Most airtime that can be spent at once (seconds)
+        """
+        self.duty_cycle = duty_cycle
+        self.burst = burst
+        self.spent = 0.0
+        self._tokens = burst
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def cost(self, packet):
+        """
+        Returns the airtime (seconds) a packet will use.
+        """
+        return frame_airtime(packet)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._time) * self.duty_cycle)
+        self._time = now
+
+    def time_until(self, cost):
+        """
+        Returns how long (seconds) until 'cost' seconds of airtime are available (0 if they are now).
+        """
+        with self._lock:
+            self._refill()
+            # A frame longer than the whole bucket goes out once the bucket is full
+            missing = min(cost, self.burst) - self._tokens
+        return max(0.0, missing / self.duty_cycle)
+
+    def consume(self, cost):
+        """
+        Spends 'cost' seconds of airtime.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= cost
+            self.spent += cost
+
+
+class BeaconScheduler:
+    """
+    Picks the beacon period from the flight phase.
+
+    The phase comes from the altitude and vertical speed: "ascent" and
+    "descent" past their rate thresholds, "burst" for a while after an
+    ascent turns into a descent, "descent_low" below the low altitude
+    threshold, and "float" otherwise (also on the ground).
+    """
+
+    def __init__(self, periods=BEACON_PHASE_PERIODS, ascent_rate=BEACON_ASCENT_RATE,
+                 descent_rate=BEACON_DESCENT_RATE, low_altitude=BEACON_LOW_ALTITUDE, burst_hold=BEACON_BURST_HOLD):
+        """
+        Args:
+            periods: Phase name -> beacon period (seconds)
+            ascent_rate: Vertical speed above which the balloon is ascending (m/s)
+            descent_rate: Sink rate above which the payload is descending (m/s)
+            low_altitude: Altitude below which a descent is "descent_low" (m)
+            burst_hold: How long the "burst" phase lasts after the turn (seconds)
+        """
+        self.periods = periods
+        self.ascent_rate = ascent_rate
+        self.descent_rate = descent_rate
+        self.low_altitude = low_altitude
+        self.burst_hold = burst_hold
+        self.phase = "float"
+        self._ascended = False
+        self._burst_at = None
+
+    def update(self, altitude, vertical_speed, now=None):
+        """
+        Updates the flight phase.
+
+        Args:
+            altitude: Altitude (m)
+            vertical_speed: Vertical speed (m/s, up positive)
+            now: Current time (time.monotonic(), default: now)
+
+        Returns:
+            float: The beacon period for the phase (seconds)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if vertical_speed > self.ascent_rate:
+            phase = "ascent"
+            self._ascended = True
+        elif vertical_speed < -self.descent_rate:
+            if self._ascended:
+                # First descent after an ascent: burst
+                self._ascended = False
+                self._burst_at = now
+            if self._burst_at is not None and now - self._burst_at < self.burst_hold:
+                phase = "burst"
+            elif altitude < self.low_altitude:
+                phase = "descent_low"
+            else:
+                phase = "descent"
+        else:
+            phase = "float"
+
+        if phase != self.phase and DEBUG_MODE:
+            print(f"[BEACON] Flight phase: {self.phase} -> {phase}")
+        self.phase = phase
+        return self.period()
+
+    def period(self):
+        """
+        Returns the beacon period (seconds) for the current phase.
+        """
+        return self.periods[self.phase]
+
+
+# Shared airtime budget (used by main's transmit queue) and beacon scheduler
+budget = AirtimeBudget()
+scheduler = BeaconScheduler()
@@ -1,42 +1,211 @@
 import wifi
 import time
 import board
+import threading
 import subprocess
 import adafruit_bmp280
-from config import CUTOFF_ALTITUDE
 
 from debug import DEBUG_MODE
-        
+
+# BMP280 registers
+REGISTER_DATA = 0xF7         # press_msb .. temp_xlsb (6 bytes)
+
+
+def compensate(raw_temperature, raw_pressure, calibration):
+    """
+    Converts raw 20-bit ADC readings into temperature and pressure
+    (floating point algorithm from the BMP280 datasheet).
+
+    Parameters:
+        raw_temperature (int): The raw temperature reading (adc_T).
+        raw_pressure (int): The raw pressure reading (adc_P).
+        calibration (tuple): The (dig_T1..T3, dig_P1..P9) calibration lists.
+
+    Returns:
+        tuple[float, float]: Temperature (C) and pressure (hPa).
+    """
+    t1, t2, t3 = calibration[0]
+    p1, p2, p3, p4, p5, p6, p7, p8, p9 = calibration[1]
+
+    var1 = (raw_temperature / 16384.0 - t1 / 1024.0) * t2
+    var2 = (raw_temperature / 131072.0 - t1 / 8192.0) ** 2 * t3
+    t_fine = int(var1 + var2)
+    temperature = t_fine / 5120.0
+
+    var1 = t_fine / 2.0 - 64000.0
+    var2 = var1 * var1 * p6 / 32768.0
+    var2 += var1 * p5 * 2.0
+    var2 = var2 / 4.0 + p4 * 65536.0
+    var3 = p3 * var1 * var1 / 524288.0
+    var1 = (var3 + p2 * var1) / 524288.0
+    var1 = (1.0 + var1 / 32768.0) * p1
+    if not var1:
+        raise ArithmeticError("Invalid BMP280 calibration (dig_P1 is zero).")
+    pressure = 1048576.0 - raw_pressure
+    pressure = ((pressure - var2 / 4096.0) * 6250.0) / var1
+    var1 = p9 * pressure * pressure / 2147483648.0
+    var2 = pressure * p8 / 32768.0
+    pressure += (var1 + var2 + p7) / 16.0
+
+    return temperature, pressure / 100
+
+
+def pressure_altitude(pressure, sea_level_pressure):
+    """
+    Converts pressure (hPa) into altitude (m) for the given sea level pressure (hPa).
+    """
+    return 44330 * (1.0 - (pressure / sea_level_pressure) ** 0.1903)
+
+
+class BMP280Sensor:
+    """
+    Long-lived BMP280 handle.
+
+    The I2C bus and the driver are created on first use and kept between
+    reads, so the calibration coefficients are read once and the sensor is
+    not re-initialized every cycle. After an IOError the handle is dropped
+    and re-created on the next read.
+
+    Reads are serialized with a lock, since the background sampler and
+    read_sensor() may use the sensor from different threads.
+    """
+
+    def __init__(self, address=0x77):
+        """
+        Parameters:
+            address (int): The I2C address of the BMP280 (0x77 on the Adafruit breakout).
+        """
+        self.address = address
+        self.calibration = None
+        self._device = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """
+        Creates the I2C bus and the BMP280 driver.
+
+        Returns:
+            Adafruit_BMP280_I2C: The connected driver.
+        """
+        i2c = board.I2C()
+        device = adafruit_bmp280.Adafruit_BMP280_I2C(i2c, address=self.address)
+
+        # The driver has just read the calibration block (dig_T1..T3, dig_P1..P9); reuse it for burst reads
+        self.calibration = (list(device._temp_calib), list(device._pressure_calib))
+
+        # Measure continuously so reads don't have to trigger and wait for a conversion
+        device.mode = adafruit_bmp280.MODE_NORMAL
+
+        self._device = device
+        return device
+
+    @property
+    def device(self):
+        """
+        The connected driver (connects on first use).
+        """
+        if self._device is None:
+            self.connect()
+        return self._device
+
+    def reset(self):
+        """
+        Drops the driver so the next read reconnects.
+        """
+        self._device = None
+
+    def read(self, reader):
+        """
+        Runs 'reader' against the driver, reconnecting once after an IOError.
+
+        Parameters:
+            reader (callable): Function taking the driver and returning the reading.
+
+        Returns:
+            The value returned by 'reader'.
+        """
+        with self._lock:
+            try:
+                return reader(self.device)
+            except IOError:
+                if DEBUG_MODE:
+                    print("\n[BMP280] I/O error, reconnecting...", end="")
+                self.reset()
+                return reader(self.device)
+
+    def snapshot(self):
+        """
+        Reads temperature, pressure and altitude from a single sample.
+
+        The raw pressure and temperature registers are read in one 6-byte
+        burst and compensated with the cached calibration, so the three values
+        are consistent and only one register read is made per snapshot.
+
+        Returns:
+            dict[str, float]: Temperature (C), pressure (hPa) and altitude (m).
+        """
+        def reader(device):
+            # The calibration is taken under the lock too (a reconnect replaces it)
+            return device._read_register(REGISTER_DATA, 6), device.sea_level_pressure, self.calibration
+
+        data, sea_level_pressure, calibration = self.read(reader)
+        raw_pressure = (data[0] << 12) | (data[1] << 4) | (data[2] >> 4)
+        raw_temperature = (data[3] << 12) | (data[4] << 4) | (data[5] >> 4)
+
+        temperature, pressure = compensate(raw_temperature, raw_pressure, calibration)
+        return {
+            "temperature": temperature,
+            "pressure": pressure,
+            "altitude": pressure_altitude(pressure, sea_level_pressure),
+        }
+
+
+# Shared handle used by read_sensor()
+sensor = BMP280Sensor()
+
+# Background sampler (set by barometer.start()); read_sensor() uses its
+# filtered state instead of a blocking read while it is running
+sampler = None
+
+# Latest reading returned by read_sensor(), at full resolution (temperature, pressure, altitude floats)
+last_reading = None
+
+
 def read_sensor():
     """
-    Connects to a BMP280 sensor via I2C bus and reads temperature, pressure, and altitude.
+    Reads temperature, pressure, and altitude from the BMP280 sensor (via I2C bus).
 
     Returns:
-        list[str]: A list of temperature, pressure, and altitude readings.
+        dict[str, str]: Temperature, pressure, and altitude readings.
     """
     print("[BMP280] Reading data...", end="")
-        
+
+    global last_reading
+
     # Output initially empty
     bmp280_output_data = {}
 
     try:
-        # Create an I2C bus object
-        i2c = board.I2C()
+        reading = sampler.latest() if sampler is not None else None
+        if reading is None:
+            # One burst read gives temperature, pressure and altitude from the same sample
+            reading = sensor.snapshot()
 
-        # Create a bmp280 object from the I2C bus
-        bmp280 = adafruit_bmp280.Adafruit_BMP280_I2C(i2c) 
+        last_reading = reading
 
-        # Disables wifi if cutoff altitude has been reached
-        wifi.disable_wifi() if bmp280.altitude >= CUTOFF_ALTITUDE else wifi.enable_wifi()
+        # Disables wifi if cutoff altitude has been reached (re-enables below the hysteresis band)
+        wifi.controller.update(reading["altitude"])
 
         # Adds collected bmp280 data to the return list
-        bmp280_output_data["Temperature"] = str(round(bmp280.temperature, 1))
-        bmp280_output_data["Pressure"] = str(round(bmp280.pressure / 1000, 2))
-        bmp280_output_data["Altitude"] = str(round(bmp280.altitude, 0))
+        bmp280_output_data["Temperature"] = str(round(reading["temperature"], 1))
+        bmp280_output_data["Pressure"] = str(round(reading["pressure"] / 1000, 2))
+        bmp280_output_data["Altitude"] = str(round(reading["altitude"], 0))
+        if "vertical_speed" in reading:
+            bmp280_output_data["VerticalSpeed"] = str(round(reading["vertical_speed"], 1))
 
     except IOError as e:
         raise
-        
+
     except Exception as e:
         raise
 
@@ -44,5 +213,4 @@ def read_sensor():
     if DEBUG_MODE:
         print("DONE")
     return bmp280_output_data
-    
 
@@ -15,6 +15,150 @@ LOGGING_MODE = True
 #==============================================+
 LOOP_TIME_DELAY = 60
 
+#=============================================+
+# The direwolf KISS TCP interface             |
+#                                             |
+# [USED: main.py]                             |
+#=============================================+
+KISS_HOST = "localhost"
+KISS_PORT = 8001
+
+#===============================================+
+# The direwolf AGW (AGWPE) TCP interface        |
+#   APRS_INTERFACE: "kiss" or "agw"             |
+#   AGW_MAX_OUTSTANDING: frames direwolf may    |
+#       have queued before the next send waits  |
+#       for room (None: no flow control)        |
+#                                               |
+# [USED: main.py]                               |
+#===============================================+
+APRS_INTERFACE = "kiss"
+AGW_HOST = "localhost"
+AGW_PORT = 8000
+AGW_MAX_OUTSTANDING = 2
+
+#=================================================+
+# Outgoing packet queue (sent to direwolf by a    |
+#   background sender, so the loop never waits on |
+#   the radio link)                               |
+#   TX_QUEUE_SIZE: packets kept before dropping   |
+#   TX_QUEUE_POLICY: "drop_oldest" (FIFO) or      |
+#       "priority" (highest priority first, drops |
+#       the lowest priority packet when full)     |
+#   TX_MAX_RETRIES: retries of a failed send      |
+#   TX_RETRY_DELAY: wait before a retry (s)       |
+#   TX_WAIT_TIMEOUT: how long (s) the sender      |
+#       waits for direwolf to transmit each frame |
+#       before sending the next (None: no wait;   |
+#       needs direwolf's AGW port, also in KISS   |
+#       mode, to query its transmit queue)        |
+#                                                 |
+# [USED: tx_queue.TxQueue, main.py]               |
+#=================================================+
+TX_QUEUE_SIZE = 16
+TX_QUEUE_POLICY = "priority"
+TX_MAX_RETRIES = 3
+TX_RETRY_DELAY = 2
+TX_WAIT_TIMEOUT = None
+
+#=================================================+
+# How the main service schedules its subsystems   |
+#   "concurrent": each subsystem runs as its own  |
+#       task at its own rate (see *_PERIOD below) |
+#   "sequential": one blocking loop, followed by  |
+#       'LOOP_TIME_DELAY'                         |
+#   "deadline": one loop that starts every        |
+#       'LOOP_TIME_DELAY' seconds (measured from  |
+#       cycle start), with per-stage budgets      |
+#                                                 |
+# [USED: main.py]                                 |
+#=================================================+
+LOOP_MODE = "concurrent"
+
+#===============================================+
+# The period (s) of each task in concurrent mode |
+#                                               |
+# [USED: main.py]                               |
+#===============================================+
+BMP280_PERIOD = 5
+GPS_PERIOD = 5
+BEACON_PERIOD = LOOP_TIME_DELAY
+CAPTURE_PERIOD = LOOP_TIME_DELAY
+
+#=================================================+
+# Adaptive beacon rate: the beacon period (s)     |
+#   for each flight phase, replacing              |
+#   'BEACON_PERIOD' once the phase is known       |
+#   (re-evaluated every 'BMP280_PERIOD')          |
+#   Concurrent mode only: the sequential and      |
+#   deadline loops beacon every cycle             |
+#   ('LOOP_TIME_DELAY')                           |
+#   BEACON_ASCENT_RATE: climb rate (m/s) above    |
+#       which the balloon is ascending            |
+#   BEACON_DESCENT_RATE: sink rate (m/s) above    |
+#       which the payload is descending           |
+#   BEACON_LOW_ALTITUDE: descent below this (m)   |
+#       is "descent_low" (landing)                |
+#   BEACON_BURST_HOLD: time (s) in "burst" after  |
+#       the ascent turns into a descent           |
+#                                                 |
+# [USED: beacon.BeaconScheduler]                  |
+#=================================================+
+BEACON_PHASE_PERIODS = {"ascent": 60, "float": 180, "burst": 10, "descent": 30, "descent_low": 15}
+BEACON_ASCENT_RATE = 1.0
+BEACON_DESCENT_RATE = 3.0
+BEACON_LOW_ALTITUDE = 3000
+BEACON_BURST_HOLD = 120
+
+#=================================================+
+# Transmitter airtime budget (token bucket): the  |
+#   transmit queue holds packets back, highest    |
+#   priority first, while the budget is spent     |
+#   AIRTIME_DUTY_CYCLE: fraction of the time the  |
+#       transmitter may be keyed                  |
+#   AIRTIME_BURST: most airtime (s) spent at once |
+#   AIRTIME_BAUD, AIRTIME_TXDELAY: modem speed    |
+#       and key-up time (s) for airtime estimates |
+#                                                 |
+# [USED: beacon.AirtimeBudget, main.py]           |
+#=================================================+
+AIRTIME_DUTY_CYCLE = 0.1
+AIRTIME_BURST = 5.0
+AIRTIME_BAUD = 1200
+AIRTIME_TXDELAY = 0.3
+
+#==================================================+
+# The time budget (s) of each stage in deadline    |
+#   mode (a stage is skipped when less than its    |
+#   budget is left in the cycle)                   |
+#                                                  |
+# [USED: main.py]                                  |
+#==================================================+
+STAGE_BUDGETS = {
+    "bmp280": 2,
+    "ublox": 1,
+    "beacon": 8,
+    "webcam": 30,
+}
+
+#===============================================+
+# Records per-stage latency histograms and      |
+#   appends p50/p95/max to data/latency.txt     |
+#   every 'LATENCY_FLUSH_CYCLES' cycles         |
+#                                               |
+# [USED: main.py, timing.py]                    |
+#===============================================+
+LATENCY_STATS = True
+LATENCY_FLUSH_CYCLES = 10
+
+#=================================================+
+# The maximum age (s) of a sensor reading for it  |
+#   to be included in a beacon (concurrent mode)  |
+#                                                 |
+# [USED: main.py]                                 |
+#=================================================+
+SNAPSHOT_MAX_AGE = 120
+
 #========================================+
 # The callsign for outgoing APRS packets | 
 #                                        |
@@ -22,6 +166,74 @@ LOOP_TIME_DELAY = 60
 #========================================+
 CALLSIGN = "N8SSU"
 
+#=================================================+
+# APRS position report format and symbol          |
+#   "compressed": base-91 lat/lon with altitude   |
+#       in the position (13 bytes)                |
+#   "uncompressed": ddmm.mmN/dddmm.mmW plus a     |
+#       /A=nnnnnn altitude comment                |
+#   APRS_SYMBOL_TABLE/APRS_SYMBOL: "/" "O" is the |
+#       balloon symbol                            |
+#                                                 |
+# [USED: main.py]                                 |
+#=================================================+
+APRS_POSITION_FORMAT = "compressed"
+APRS_SYMBOL_TABLE = "/"
+APRS_SYMBOL = "O"
+
+#=================================================+
+# APRS telemetry in the beacon comment            |
+#   "base91": |ss1122334455bb| comment telemetry  |
+#       (2 bytes per channel), described by       |
+#       PARM/UNIT/EQNS/BITS messages re-sent      |
+#       every 'APRS_TELEMETRY_DEFINITIONS_PERIOD' |
+#       seconds                                   |
+#   "text": key=value list of every reading       |
+#   APRS_TELEMETRY_CHANNELS: up to 5 analog       |
+#       channels (sensor, key, name, unit, scale, |
+#       offset); value = scale * (0-8280) + offset|
+#   APRS_TELEMETRY_BITS: up to 8 digital channels |
+#       (sensor, key, name), set when non-zero    |
+#                                                 |
+# [USED: main.py]                                 |
+#=================================================+
+APRS_TELEMETRY_FORMAT = "base91"
+APRS_TELEMETRY_CHANNELS = [
+    ("BMP280", "Temperature", "Temp", "degC", 0.02, -100),   # -100 to 65.6 C
+    ("BMP280", "Pressure", "Press", "bar", 0.000125, 0),     # 0 to 1.035 (hPa/1000)
+    ("BMP280", "Altitude", "Alt", "m", 5, -500),             # -500 to 40900 m
+    ("BMP280", "VerticalSpeed", "VSpd", "m/s", 0.02, -80),   # -80 to 85.6 m/s
+    ("UBLOX", "num_sats", "Sats", "sats", 1, 0),
+]
+APRS_TELEMETRY_BITS = [
+    ("UBLOX", "fix_quality", "Fix"),
+]
+APRS_TELEMETRY_DEFINITIONS_PERIOD = 600
+
+#=================================================+
+# Batched telemetry: every BMP280 reading is      |
+#   buffered and sent with each beacon as one     |
+#   '{{B' frame (delta encoded against the first  |
+#   sample), so the profile between beacons is    |
+#   not lost                                      |
+#   APRS_BATCH_MAX_SAMPLES: samples per frame     |
+#       (at most 30, to fit the 256-byte AX.25    |
+#       information field; more samples, or a     |
+#       delta beyond +/-4140, start a new frame)  |
+#   APRS_BATCH_BUFFER_SIZE: samples kept between  |
+#       beacons (the oldest are dropped beyond    |
+#       this), two of the longest beacon periods  |
+#   In "sequential" and "deadline" mode the       |
+#   BMP280 is read once per cycle, so the frame   |
+#   is only sent once APRS_BATCH_MAX_SAMPLES      |
+#   readings (several beacons) are buffered       |
+#                                                 |
+# [USED: main.py, samples.SampleBuffer]           |
+#=================================================+
+APRS_BATCH = True
+APRS_BATCH_MAX_SAMPLES = 24
+APRS_BATCH_BUFFER_SIZE = 2 * (max(BEACON_PERIOD, *BEACON_PHASE_PERIODS.values()) // BMP280_PERIOD + 1)
+
 #==========================================+
 # Tells the KISS client to filter incoming |
 #   packets by callsign (or not to)        | 
@@ -51,27 +263,166 @@ SSID = "11"
 # The altitude (m, from BMP280) where Wi-Fi must be dis-  |
 #   abled according to FAA regulations)                   |
 #                                                         |
-# [USED: Not yet used]                                    |
+# [USED: wifi.py]                                         |
 #=========================================================+
 CUTOFF_ALTITUDE = 1524
 
+#=========================================================+
+# The Wi-Fi interface, and the distance (m) below the     |
+#   cutoff altitude that must be reached before Wi-Fi is  |
+#   re-enabled (prevents flapping near the cutoff)        |
+#                                                         |
+# [USED: wifi.py]                                         |
+#=========================================================+
+WIFI_INTERFACE = "wlan0"
+WIFI_HYSTERESIS = 100
+
 #=====================================================+
-# The maximum number of times to retry a GPS read if  |
-#   unsuccessful                                      |
+# The maximum number of consecutive GPS epochs        |
+#   without a fix before the fix is reported as lost  |
 #                                                     |
 # [USED: ublox.poll_gps]                              |
 #=====================================================+
 GPS_MAX_ATTEMPTS = 10
 
 #====================================================+
-# The maximum amount of time for a GPS read to occur |
-#   (the read is retried 'GPS_MAX_ATTEMPTS' times    |
-#       before giving up)                            |
+# The maximum amount of time (s) to wait for the     |
+#   first GPS fix after the GPS reader starts        |
 #                                                    |
 # [USED: ublox.poll_gps]                             |
 #====================================================+
 GPS_TIMEOUT = 20
 
+#=====================================================+
+# The time (s) between GPS reads when no data is     |
+#   available (each read drains the module's whole    |
+#   output buffer)                                    |
+#                                                     |
+# [USED: ublox.GPSService]                            |
+#=====================================================+
+GPS_POLL_INTERVAL = 0.1
+
+#=====================================================+
+# The GPS fields converted from NMEA sentences (GGA,  |
+#   RMC, GSA and VTG provide: time, latitude,         |
+#   longitude, fix_quality, num_sats, hdop, altitude, |
+#   status, speed_knots, course, date, fix_mode,      |
+#   pdop, vdop, speed_kmh; 'fix_quality' is required) |
+#                                                     |
+# [USED: ublox.UBLOX_I2C]                             |
+#=====================================================+
+GPS_NMEA_FIELDS = ["time", "latitude", "longitude", "fix_quality", "num_sats", "hdop",
+                   "altitude", "status", "speed_knots", "course", "date"]
+
+#=====================================================+
+# The protocol read from the GPS module               |
+#   "nmea": GGA + RMC text sentences                  |
+#   "ubx": binary UBX-NAV-PVT (one message per fix)   |
+#                                                     |
+# [USED: ublox.UBLOX_I2C, ublox.GPSService]           |
+#=====================================================+
+GPS_PROTOCOL = "nmea"
+
+#=====================================================+
+# GPS receiver configuration sent at startup (each    |
+#   message must be ACKed by the module)              |
+#   GPS_DISABLED_NMEA: sentences turned off on I2C    |
+#       (all of them in "ubx" mode)                   |
+#   GPS_DYNAMIC_MODEL: "airborne1g" keeps the fix     |
+#       above ~12 km ("portable" is the default)      |
+#   GPS_MEASUREMENT_RATE: time between fixes (ms)     |
+#                                                     |
+# [USED: ublox.UBLOX_I2C.configure]                   |
+#=====================================================+
+GPS_CONFIGURE = True
+GPS_DISABLED_NMEA = ["GSV", "GSA", "GLL", "VTG"]
+GPS_DYNAMIC_MODEL = "airborne1g"
+GPS_MEASUREMENT_RATE = 1000
+
+#=====================================================+
+# The maximum age (s) of the cached GPS fix before    |
+#   it is reported as stale (the beacon then sends    |
+#   the estimated position), and the number of recent |
+#   fixes kept by the background GPS reader           |
+#                                                     |
+# [USED: ublox, main.py, vfan.read_gps]               |
+#=====================================================+
+GPS_MAX_FIX_AGE = 10
+GPS_FIX_HISTORY = 60
+
+#=====================================================+
+# Record the raw GPS byte stream (every read from the |
+#   module, with its time) to data/gps_capture.bin,   |
+#   for replay with gps_capture.ReplayBus             |
+#                                                     |
+# [USED: ublox.GPSService]                            |
+#=====================================================+
+GPS_CAPTURE = False
+
+#=====================================================+
+# Interrupt-driven GPS reads: the module drives its   |
+#   TX-ready output (PIO) while data is waiting, and  |
+#   the reader waits for the edge on a Pi GPIO        |
+#   GPS_TXREADY_PIN: BCM GPIO wired to the module's   |
+#       TX-ready PIO (None: poll the registers)       |
+#   GPS_TXREADY_PIO: module PIO used as TX-ready      |
+#   GPS_TXREADY_THRESHOLD: bytes pending before the   |
+#       pin is asserted (multiple of 8)               |
+#   GPS_TXREADY_TIMEOUT: re-check the registers after |
+#       this long without an edge (s)                 |
+#                                                     |
+# [USED: ublox.UBLOX_I2C, ublox.GPSService]           |
+#=====================================================+
+GPS_TXREADY_PIN = None
+GPS_TXREADY_PIO = 6
+GPS_TXREADY_THRESHOLD = 8
+GPS_TXREADY_TIMEOUT = 1.0
+
+#=====================================================+
+# Position/altitude estimator used when there is no   |
+#   fresh GPS fix (1-sigma noise values)              |
+#   EST_ACCEL_NOISE: vertical acceleration (m/s^2)    |
+#   EST_BARO_BIAS_DRIFT: barometer offset drift       |
+#       (m/sqrt(s))                                   |
+#   EST_BARO_NOISE, EST_GPS_ALT_NOISE: altitude (m)   |
+#   EST_GPS_VEL_NOISE: GPS vertical speed (m/s)       |
+#   EST_HDOP_ERROR: position error per unit HDOP (m)  |
+#   EST_VELOCITY_ERROR: position error growth (m/s)   |
+#   EST_MAX_DEAD_RECKONING: stop extrapolating the    |
+#       last fix's velocity after this long (s)       |
+#                                                     |
+# [USED: estimator.PositionEstimator]                 |
+#=====================================================+
+EST_ACCEL_NOISE = 1.0
+EST_BARO_BIAS_DRIFT = 0.1
+EST_BARO_NOISE = 2.0
+EST_GPS_ALT_NOISE = 10.0
+EST_GPS_VEL_NOISE = 0.5
+EST_HDOP_ERROR = 5.0
+EST_VELOCITY_ERROR = 5.0
+EST_MAX_DEAD_RECKONING = 600
+
+#=================================================+
+# Background BMP280 sampler (smoothed altitude and |
+#   vertical speed between main loop reads)       |
+#   BARO_SAMPLE_RATE: samples per second (Hz)     |
+#   BARO_WINDOW: samples kept (vertical speed is  |
+#       fitted over the whole window)             |
+#   BARO_OVERSAMPLE: reads averaged per sample    |
+#   BARO_MEDIAN: median filter width (samples)    |
+#   BARO_IIR_ALPHA: IIR smoothing factor (0-1)    |
+#   BARO_MAX_AGE: oldest usable state (s)         |
+#                                                 |
+# [USED: barometer.py, main.py]                   |
+#=================================================+
+BARO_SAMPLER = True
+BARO_SAMPLE_RATE = 5
+BARO_WINDOW = 50
+BARO_OVERSAMPLE = 2
+BARO_MEDIAN = 5
+BARO_IIR_ALPHA = 0.3
+BARO_MAX_AGE = 2
+
 #===========================================+
 # The resolution for fswebcam image capture |
 #                                           |
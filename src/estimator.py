@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from config import EST_ACCEL_NOISE, EST_BARO_BIAS_DRIFT, EST_BARO_NOISE, EST_GPS_ALT_NOISE, EST_GPS_VEL_NOISE
+from config import EST_HDOP_ERROR, EST_VELOCITY_ERROR, EST_MAX_DEAD_RECKONING
+
+# Mean Earth radius (m), for dead reckoning in degrees
+EARTH_RADIUS = 6371000.0
+KNOTS_TO_M_PER_S = 0.514444
+
+# Measurement rows of the vertical filter (state: altitude, vertical speed, barometer bias)
+H_BARO = np.array([[1.0, 0.0, 1.0]])
+H_GPS_ALTITUDE = np.array([[1.0, 0.0, 0.0]])
+H_GPS_VERTICAL_SPEED = np.array([[0.0, 1.0, 0.0]])
+
+
+class PositionEstimator:
+    """
+    Fuses the barometer with the GPS fixes so a position is always available.
+
+    Altitude is a three-state Kalman filter (altitude, vertical speed and the
+    offset of the barometric altitude from GPS altitude). GPS fixes correct
+    all three; between fixes the barometer keeps the altitude and vertical
+    speed current, using the last learned offset. The horizontal position is
+    dead-reckoned from the last fix with its velocity (for at most
+    EST_MAX_DEAD_RECKONING seconds), and its uncertainty grows with the time
+    since that fix.
+
+    Updates and estimates may come from different threads.
+    """
+
+    def __init__(self, accel_noise=EST_ACCEL_NOISE, bias_drift=EST_BARO_BIAS_DRIFT, baro_noise=EST_BARO_NOISE,
+                 gps_altitude_noise=EST_GPS_ALT_NOISE, gps_velocity_noise=EST_GPS_VEL_NOISE):
+        """
+        Args:
+            accel_noise: Vertical acceleration noise (m/s^2, 1 sigma)
+            bias_drift: Barometer offset random walk (m/sqrt(s))
+            baro_noise: Barometric altitude noise (m, 1 sigma)
+            gps_altitude_noise: GPS altitude noise (m, 1 sigma)
+            gps_velocity_noise: GPS vertical speed noise (m/s, 1 sigma)
+        """
+        self.accel_noise = accel_noise
+        self.bias_drift = bias_drift
+        self.baro_variance = baro_noise ** 2
+        self.gps_altitude_variance = gps_altitude_noise ** 2
+        self.gps_velocity_variance = gps_velocity_noise ** 2
+
+        # Vertical filter (None until the first measurement)
+        self._x = None
+        self._P = None
+        self._time = None
+
+        # Last GPS fix: (timestamp, latitude, longitude, north/east velocity (m/s), horizontal error (m))
+        self._fix = None
+        self._fix_time_field = None
+        self._lock = threading.Lock()
+
+    def _predict(self, x, P, dt):
+        """
+        Propagates a vertical state 'dt' seconds ahead (constant vertical speed).
+        """
+        F = np.array([[1.0, dt, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+        q = self.accel_noise ** 2
+        Q = np.array([
+            [q * dt ** 4 / 4, q * dt ** 3 / 2, 0.0],
+            [q * dt ** 3 / 2, q * dt ** 2, 0.0],
+            [0.0, 0.0, self.bias_drift ** 2 * dt],
+        ])
+        return F @ x, F @ P @ F.T + Q
+
+    def _correct(self, H, z, variance, timestamp):
+        """
+        Applies one scalar measurement 'z' = H x (+ noise) at 'timestamp'.
+        """
+        if self._x is None:
+            if H is H_GPS_VERTICAL_SPEED:
+                # Wait for an altitude to start from
+                return
+            # Start at the first altitude; the barometer offset is unknown until GPS altitude arrives
+            self._x = np.array([z, 0.0, 0.0])
+            self._P = np.diag([variance, 100.0, 1e4])
+            self._time = timestamp
+            return
+
+        dt = timestamp - self._time
+        if dt > 0:
+            self._x, self._P = self._predict(self._x, self._P, dt)
+            self._time = timestamp
+
+        S = (H @ self._P @ H.T)[0, 0] + variance
+        K = (self._P @ H.T) / S
+        self._x = self._x + K[:, 0] * (z - (H @ self._x)[0])
+        self._P = (np.eye(3) - K @ H) @ self._P
+
+    def update_baro(self, altitude, timestamp=None):
+        """
+        Adds a barometric altitude.
+
+        Args:
+            altitude: Barometric altitude (m)
+            timestamp: Measurement time (time.monotonic(), default: now)
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            self._correct(H_BARO, float(altitude), self.baro_variance, timestamp)
+
+    def update_gps(self, fix, timestamp=None):
+        """
+        Adds a GPS fix (as returned by ublox.poll_gps()).
+
+        A fix that was already added (same 'time' field) is ignored, so the
+        cached fix can be passed in every cycle.
+
+        Args:
+            fix: GPS data with latitude/longitude and optionally altitude, hdop,
+                vel_n/vel_e/vel_d (UBX) or speed_knots/course (NMEA)
+            timestamp: Fix time (time.monotonic(), default: now)
+        """
+        if fix.get("latitude") is None or fix.get("longitude") is None:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        with self._lock:
+            if fix.get("time") is not None and fix.get("time") == self._fix_time_field:
+                return
+            self._fix_time_field = fix.get("time")
+
+            if fix.get("vel_n") is not None and fix.get("vel_e") is not None:
+                velocity = (fix["vel_n"], fix["vel_e"])
+            elif fix.get("speed_knots") is not None and fix.get("course") is not None:
+                speed = fix["speed_knots"] * KNOTS_TO_M_PER_S
+                course = math.radians(fix["course"])
+                velocity = (speed * math.cos(course), speed * math.sin(course))
+            else:
+                velocity = (0.0, 0.0)
+
+            error = EST_HDOP_ERROR * (fix.get("hdop") or fix.get("pdop") or 1.0)
+            self._fix = (timestamp, fix["latitude"], fix["longitude"], velocity, error)
+
+            if fix.get("altitude") is not None:
+                self._correct(H_GPS_ALTITUDE, float(fix["altitude"]), self.gps_altitude_variance, timestamp)
+            if fix.get("vel_d") is not None:
+                self._correct(H_GPS_VERTICAL_SPEED, -float(fix["vel_d"]), self.gps_velocity_variance, timestamp)
+
+    def vertical(self, timestamp=None):
+        """
+        Returns the filtered altitude and vertical speed (available before the first GPS fix).
+
+        Returns:
+            tuple[float, float]: Altitude (m) and vertical speed (m/s), or None without any measurement
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            if self._x is None:
+                return None
+            x = self._x
+            if timestamp > self._time:
+                x, _ = self._predict(x, self._P, timestamp - self._time)
+        return float(x[0]), float(x[1])
+
+    def estimate(self, timestamp=None):
+        """
+        Returns the current estimate, or None before the first GPS fix.
+
+        Args:
+            timestamp: Time to estimate for (time.monotonic(), default: now)
+
+        Returns:
+            dict: Latitude/longitude (degrees), altitude (m), vertical speed (m/s),
+                1-sigma position and altitude errors (m) and the age of the last fix (s)
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        with self._lock:
+            if self._fix is None:
+                return None
+            fix_time, latitude, longitude, (vel_n, vel_e), error = self._fix
+
+            x, P = self._x, self._P
+            if x is not None and timestamp > self._time:
+                x, P = self._predict(x, P, timestamp - self._time)
+
+        age = max(0.0, timestamp - fix_time)
+        elapsed = min(age, EST_MAX_DEAD_RECKONING)
+        latitude += math.degrees(vel_n * elapsed / EARTH_RADIUS)
+        longitude += math.degrees(vel_e * elapsed / (EARTH_RADIUS * max(math.cos(math.radians(latitude)), 1e-6)))
+
+        estimate = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "position_error": round(error + EST_VELOCITY_ERROR * age, 1),
+            "fix_age": round(age, 1),
+        }
+        if x is not None:
+            estimate["altitude"] = round(float(x[0]), 1)
+            estimate["vertical_speed"] = round(float(x[1]), 1)
+            estimate["altitude_error"] = round(math.sqrt(max(P[0, 0], 0.0)), 1)
+        return estimate
+
+
+# Shared estimator fed by main.read_bmp280() / main.read_gps()
+estimator = PositionEstimator()
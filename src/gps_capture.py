@@ -0,0 +1,160 @@
+"""
+Raw GPS byte-stream capture and replay.
+
+Capture file format (little-endian):
+    header: b'GPSCAP1\n'
+    records: elapsed time since capture start (uint32, ms), length (uint16), raw bytes
+
+CaptureWriter records every raw byte read from the u-blox module (see
+UBLOX_I2C(capture=...)). ReplayBus plays a capture back as a stand-in for
+smbus.SMBus, either in real time or as fast as the reader drains it.
+"""
+
+import struct
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+TELEM_DIR = ROOT_DIR / "./data"
+CAPTURE_FNAME = TELEM_DIR / "gps_capture.bin"
+CAPTURE_FNAME = CAPTURE_FNAME.resolve()
+
+MAGIC = b'GPSCAP1\n'
+RECORD_HEADER = struct.Struct('<IH')
+
+# Largest record (the length field is 16 bits)
+MAX_RECORD = 0xFFFF
+
+
+class CaptureWriter:
+    """
+    Appends timestamped raw reads to a capture file.
+    """
+
+    def __init__(self, file=None):
+        """
+        Args:
+            file: Capture file path (default: data/gps_capture.bin); a new file is started
+        """
+        if file is None:
+            file = CAPTURE_FNAME
+        self.file = file
+        self._fp = open(file, "wb")
+        self._fp.write(MAGIC)
+        self._start = time.monotonic()
+        self.records = 0
+
+    def write(self, data):
+        """
+        Records one read.
+
+        Args:
+            data: The raw bytes read from the module
+        """
+        if not data:
+            return
+        elapsed_ms = int((time.monotonic() - self._start) * 1000) & 0xFFFFFFFF
+        for start in range(0, len(data), MAX_RECORD):
+            chunk = data[start:start + MAX_RECORD]
+            self._fp.write(RECORD_HEADER.pack(elapsed_ms, len(chunk)))
+            self._fp.write(chunk)
+            self.records += 1
+
+    def flush(self):
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+
+def read_capture(file):
+    """
+    Reads a capture file.
+
+    Args:
+        file: Capture file path
+
+    Returns:
+        list[tuple[float, bytes]]: (seconds since capture start, raw bytes) for every record
+    """
+    with open(file, "rb") as fp:
+        data = fp.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{file} is not a GPS capture file.")
+
+    records = []
+    offset = len(MAGIC)
+    while offset + RECORD_HEADER.size <= len(data):
+        elapsed_ms, length = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        records.append((elapsed_ms / 1000.0, data[offset:offset + length]))
+        offset += length
+    return records
+
+
+class ReplayBus:
+    """
+    Stand-in for smbus.SMBus that serves a capture through the u-blox
+    registers (0xFD/0xFE: bytes available, 0xFF: data stream).
+
+    In real-time mode a record becomes available when its capture time has
+    elapsed since the replay started; otherwise one record is released every
+    time the available-byte count is read.
+    """
+
+    def __init__(self, file, realtime=False):
+        """
+        Args:
+            file: Capture file path
+            realtime: Replay with the original timing instead of as fast as possible
+        """
+        self.records = read_capture(file)
+        self.realtime = realtime
+        self.stream = bytearray()
+        self._next = 0
+        self._start = time.monotonic()
+
+    @property
+    def exhausted(self):
+        """
+        True once every record has been released and read.
+        """
+        return self._next >= len(self.records) and not self.stream
+
+    def _release(self):
+        if self.realtime:
+            elapsed = time.monotonic() - self._start
+            while self._next < len(self.records) and self.records[self._next][0] <= elapsed:
+                self.stream += self.records[self._next][1]
+                self._next += 1
+        elif not self.stream and self._next < len(self.records):
+            self.stream += self.records[self._next][1]
+            self._next += 1
+
+    def _take(self, length):
+        data = self.stream[:length]
+        del self.stream[:length]
+        return list(data) + [0xFF] * (length - len(data))
+
+    def read_byte_data(self, address, register):
+        if register == 0xFD:
+            self._release()
+            return (len(self.stream) >> 8) & 0xFF
+        if register == 0xFE:
+            return len(self.stream) & 0xFF
+        return self._take(1)[0]
+
+    def read_i2c_block_data(self, address, register, length=32):
+        if register == 0xFD:
+            self._release()
+            available = len(self.stream)
+            header = [(available >> 8) & 0xFF, available & 0xFF]
+            return (header + self._take(max(0, length - 2)))[:length]
+        return self._take(length)
+
+    def write_i2c_block_data(self, address, register, data):
+        # Writes (UBX polls/configuration) have no effect on a recording
+        pass
+
+    def close(self):
+        pass
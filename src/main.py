@@ -4,81 +4,345 @@ import time
 import webcam
 import aprs_tx
 import telem
+import timing
+import barometer
+import tx_queue
+import samples
+import beacon
+from estimator import estimator
+from scheduler import Scheduler, DeadlineCycle
 
 # Import/centralize macros, one configuration file (config.py)
 from config import DEBUG_MODE, LOGGING_MODE
 
-from config import LOOP_TIME_DELAY
+from config import LOOP_TIME_DELAY, LOOP_MODE
+from config import BMP280_PERIOD, GPS_PERIOD, BEACON_PERIOD, CAPTURE_PERIOD, SNAPSHOT_MAX_AGE
+from config import STAGE_BUDGETS
+from config import LATENCY_STATS, LATENCY_FLUSH_CYCLES
+from config import BARO_SAMPLER
 
-from config import GPS_MAX_ATTEMPTS, GPS_TIMEOUT
+from config import GPS_MAX_ATTEMPTS, GPS_TIMEOUT, GPS_MAX_FIX_AGE
 
 from config import RESOLUTION, SKIPPED_FRAMES, CAPTURE_DELAY, CAPTURED_FRAMES
 from config import WEBCAM_DEVICES
 
 from config import CALLSIGN, SSID
+from config import APRS_POSITION_FORMAT, APRS_SYMBOL_TABLE, APRS_SYMBOL
+from config import APRS_TELEMETRY_FORMAT, APRS_TELEMETRY_CHANNELS, APRS_TELEMETRY_BITS
+from config import APRS_TELEMETRY_DEFINITIONS_PERIOD
+from config import APRS_BATCH, APRS_BATCH_MAX_SAMPLES
+from config import KISS_HOST, KISS_PORT
+from config import APRS_INTERFACE, AGW_HOST, AGW_PORT, AGW_MAX_OUTSTANDING
+from config import TX_WAIT_TIMEOUT
 
+if LATENCY_STATS:
+    # Time every call to each stage's driver function
+    timing.instrument(bmp280, "read_sensor")
+    timing.instrument(ublox, "poll_gps")
+    timing.instrument(aprs_tx, "create_aprs_packet")
+    timing.instrument(aprs_tx, "transmit_via_direwolf_kiss")
+    timing.instrument(aprs_tx, "transmit_via_direwolf_agw")
+    timing.instrument(telem, "log_data")
+    timing.instrument(webcam, "capture_images")
 
-if __name__ == "__main__":
 
-    while True:
-        # Initializes data list to empty dict
-        data_list = {}
-
-        try:
-            # Collect data from bmp280
-            bmp280_dict = bmp280.read_sensor()
-
-            # Add bmp280 data to data_list
-            data_list["BMP280"] = bmp280_dict
-
-        except IOError as e:
-            print("ERROR:", "Missing BMP280 device.")
-
-        except Exception as e:
-            print("ERROR:", "Error reading from BMP280 device.")
-
-        try:
-            # Collect data from UBLOX GPS
-            gps_dict = ublox.poll_gps(max_no_fix_cycles=GPS_MAX_ATTEMPTS, timeout_seconds=GPS_TIMEOUT)
-            # Add UBLOX GPS data to data_list
-            data_list["UBLOX"] = gps_dict
-
-        except IOError as e:
-            print("ERROR:", e)
-
-        except Exception as e:
-            print("ERROR:", e)
-
-        # Print the telemetry string
-        if DEBUG_MODE:
-            for sensor in data_list:
-                for data in data_list[sensor].keys():
-                    print(f"Data: {data}:{data_list[sensor][data]}")
-
-        packetAPRS = ""
-        try:
-            # Create an APRS packet from telemetry
-            packetAPRS = aprs_tx.create_aprs_packet(CALLSIGN, SSID, data_list, message="TEST BEACON")
-            
-            # Transmit the APRS packet
-            aprs_tx.transmit_via_direwolf_kiss(packetAPRS)
-
-        except Exception as e:
-            print("ERROR:", e)
-	
-        try:
-            if LOGGING_MODE:
-                telem.log_data(data=packetAPRS)
-
-        except Exception as e:
-            print("ERROR:", e)
-
-        try:
-            if LOGGING_MODE:
-                images_saved = webcam.capture_images(RESOLUTION, SKIPPED_FRAMES, CAPTURE_DELAY,
-                                                        CAPTURED_FRAMES, WEBCAM_DEVICES)
-        except Exception as e:
-            print("ERROR:", e)
-            
+def read_bmp280():
+    """
+    Reads the BMP280 sensor.
+
+    Returns:
+        dict: The BMP280 readings, or None if the read failed.
+    """
+    try:
+        # Collect data from bmp280
+        bmp280_dict = bmp280.read_sensor()
+        estimator.update_baro(float(bmp280_dict["Altitude"]))
+        if APRS_BATCH:
+            reading = bmp280.last_reading
+            samples.buffer.add(reading["altitude"], reading["pressure"], reading["temperature"])
+        return bmp280_dict
+
+    except IOError as e:
+        print("ERROR:", "Missing BMP280 device.")
+
+    except Exception as e:
+        print("ERROR:", "Error reading from BMP280 device.")
+
+    return None
+
+
+def read_gps(wait=0):
+    """
+    Polls the UBLOX GPS.
+
+    Args:
+        wait: Time (seconds) to wait for a fresh fix when there is none (default: return at once)
+
+    Returns:
+        dict: The GPS fix, or None if no fix was obtained.
+    """
+    try:
+        # Collect data from UBLOX GPS
+        gps_dict, timestamp = ublox.poll_gps(max_no_fix_cycles=GPS_MAX_ATTEMPTS, timeout_seconds=GPS_TIMEOUT,
+                                             wait=wait, with_timestamp=True)
+        estimator.update_gps(gps_dict, timestamp)
+        return gps_dict
+
+    except IOError as e:
+        print("ERROR:", e)
+
+    except Exception as e:
+        print("ERROR:", e)
+
+    return None
+
+
+def transmit(packet):
+    """
+    Sends one packet to direwolf (called by the transmit queue's sender thread)
+    and waits for it to be transmitted, so the next one is only sent after it.
+    """
+    airtime = beacon.frame_airtime(packet)
+    if APRS_INTERFACE == "agw":
+        aprs_tx.transmit_via_direwolf_agw(packet, AGW_HOST, AGW_PORT, max_outstanding=AGW_MAX_OUTSTANDING,
+                                          wait_timeout=TX_WAIT_TIMEOUT, airtime=airtime)
+    else:
+        aprs_tx.transmit_via_direwolf_kiss(packet, KISS_HOST, KISS_PORT, wait_timeout=TX_WAIT_TIMEOUT,
+                                           agw_host=AGW_HOST, agw_port=AGW_PORT, airtime=airtime)
+
+
+def start_tx_queue():
+    """
+    Returns the shared transmit queue (started on first use, within the airtime budget).
+    """
+    return tx_queue.start_queue(transmit, airtime=beacon.budget)
+
+
+# When the telemetry definitions were last queued (None: never)
+definitions_sent_at = None
+
+
+def send_telemetry_definitions():
+    """
+    Queues the PARM/UNIT/EQNS/BITS messages every 'APRS_TELEMETRY_DEFINITIONS_PERIOD' seconds.
+    """
+    global definitions_sent_at
+    now = time.monotonic()
+    if definitions_sent_at is not None and now - definitions_sent_at < APRS_TELEMETRY_DEFINITIONS_PERIOD:
+        return
+    definitions_sent_at = now
+
+    queue = start_tx_queue()
+    for packet in aprs_tx.telemetry_definitions(CALLSIGN, SSID, APRS_TELEMETRY_CHANNELS, APRS_TELEMETRY_BITS):
+        queue.put(packet, tx_queue.PRIORITY_TELEMETRY)
+
+
+def send_beacon(data_list, batch_min_samples=2):
+    """
+    Builds an APRS packet from the collected data, queues it for
+    transmission, and logs it.
+
+    Without a GPS fix, the estimated position (dead-reckoned from the last
+    fix, altitude from the barometer) is sent in its place, and before the
+    first fix the readings go out as a status report. The BMP280 readings
+    taken since the last beacon follow in batched frames.
+
+    Args:
+        data_list: Sensor name -> readings dictionary
+        batch_min_samples: Buffered readings needed before they are sent (fewer are kept
+            for a later beacon)
+    """
+    if "UBLOX" not in data_list:
+        estimate = estimator.estimate()
+        if estimate is not None:
+            data_list["UBLOX"] = estimate
+
+    # Print the telemetry string
+    if DEBUG_MODE:
+        for sensor in data_list:
+            for data in data_list[sensor].keys():
+                print(f"Data: {data}:{data_list[sensor][data]}")
+
+    packetAPRS = ""
+    try:
+        if APRS_TELEMETRY_FORMAT == "base91":
+            # The receiver needs the channel definitions to decode the telemetry
+            send_telemetry_definitions()
+            channels, bits = APRS_TELEMETRY_CHANNELS, APRS_TELEMETRY_BITS
+        else:
+            channels, bits = None, ()
+
+        # Create an APRS packet from telemetry
+        if "UBLOX" in data_list:
+            packetAPRS = aprs_tx.create_aprs_packet(CALLSIGN, SSID, data_list, message="TEST BEACON",
+                                                    position_format=APRS_POSITION_FORMAT,
+                                                    symbol_table=APRS_SYMBOL_TABLE, symbol=APRS_SYMBOL,
+                                                    telemetry_channels=channels, telemetry_bits=bits)
+        else:
+            # No position yet: send the barometer readings on their own
+            packetAPRS = aprs_tx.create_status_packet(CALLSIGN, SSID, data_list, message="TEST BEACON",
+                                                      telemetry_channels=channels, telemetry_bits=bits)
+
+        # Queue the APRS packet (sent by the background sender)
+        queue = start_tx_queue()
+        if not queue.put(packetAPRS, tx_queue.PRIORITY_POSITION):
+            print("ERROR:", "Transmit queue full, packet dropped.")
+
+        # Send the readings buffered since the last beacon ('APRS_BATCH_MAX_SAMPLES' per frame)
+        if APRS_BATCH and len(samples.buffer) >= batch_min_samples:
+            for packet in aprs_tx.create_batch_packets(CALLSIGN, SSID, samples.buffer.drain(),
+                                                       APRS_BATCH_MAX_SAMPLES):
+                queue.put(packet, tx_queue.PRIORITY_TELEMETRY)
+
+    except Exception as e:
+        print("ERROR:", e)
+
+    try:
+        if LOGGING_MODE:
+            telem.log_data(data=packetAPRS)
+
+    except Exception as e:
+        print("ERROR:", e)
+
+
+def capture_images(timeout=None):
+    """
+    Captures an image from each webcam (only when logging).
+
+    Args:
+        timeout: Maximum time (seconds) for the captures (default: no limit)
+    """
+    try:
+        if LOGGING_MODE:
+            webcam.capture_images(RESOLUTION, SKIPPED_FRAMES, CAPTURE_DELAY,
+                                  CAPTURED_FRAMES, WEBCAM_DEVICES, timeout=timeout)
+    except Exception as e:
+        print("ERROR:", e)
+
+
+def end_cycle():
+    """
+    Flushes the latency histograms every 'LATENCY_FLUSH_CYCLES' cycles.
+    """
+    try:
+        if LATENCY_STATS:
+            timing.end_cycle(LATENCY_FLUSH_CYCLES)
+    except Exception as e:
+        print("ERROR:", e)
+
+
+def run_cycle():
+    """
+    Runs every subsystem once, one after another.
+    """
+    # Initializes data list to empty dict
+    data_list = {}
+
+    # Add bmp280 data to data_list
+    bmp280_dict = read_bmp280()
+    if bmp280_dict is not None:
+        data_list["BMP280"] = bmp280_dict
+
+    # Add UBLOX GPS data to data_list
+    gps_dict = read_gps()
+    if gps_dict is not None:
+        data_list["UBLOX"] = gps_dict
+
+    # One BMP280 reading per cycle: batch the readings of several beacons into full frames
+    send_beacon(data_list, batch_min_samples=APRS_BATCH_MAX_SAMPLES)
+    capture_images()
+    end_cycle()
+
+    print("=" * 68)
+
+
+def run_deadline(cycle):
+    """
+    Runs every subsystem once within the stage budgets of a fixed-cadence cycle.
+
+    The GPS stage waits for a fresh fix and the webcam stage for its
+    captures only as long as their budgets allow. The BMP280 read and the
+    beacon (which is only queued) do not wait on the hardware.
+
+    Args:
+        cycle: The DeadlineCycle that times the loop
+    """
+    data_list = {}
+
+    bmp280_dict = cycle.run_stage("bmp280", lambda budget: read_bmp280())
+    if bmp280_dict is not None:
+        data_list["BMP280"] = bmp280_dict
+
+    # Waits for a fresh fix within the stage budget
+    gps_dict = cycle.run_stage("ublox", lambda budget: read_gps(wait=min(GPS_TIMEOUT, budget)))
+    if gps_dict is not None:
+        data_list["UBLOX"] = gps_dict
+
+    # One BMP280 reading per cycle: batch the readings of several beacons into full frames
+    cycle.run_stage("beacon", lambda budget: send_beacon(data_list, batch_min_samples=APRS_BATCH_MAX_SAMPLES))
+    cycle.run_stage("webcam", lambda budget: capture_images(timeout=budget))
+    end_cycle()
+
+    print("=" * 68)
+
+
+def run_concurrent():
+    """
+    Runs each subsystem as its own task at its own rate.
+
+    The sensor tasks publish their latest readings to a shared snapshot,
+    which the beacon task reads, so a slow GPS fix never holds up a
+    transmission or an image capture.
+    """
+    scheduler = Scheduler()
+    snapshot = scheduler.snapshot
+
+    def send():
+        # A GPS fix older than GPS_MAX_FIX_AGE is left out, so send_beacon() uses the estimate instead
+        send_beacon(snapshot.read(max_age=SNAPSHOT_MAX_AGE, max_ages={"UBLOX": GPS_MAX_FIX_AGE}))
+        end_cycle()
         print("=" * 68)
-        time.sleep(LOOP_TIME_DELAY)
+
+    def update_phase():
+        # Beacon faster on burst and descent, slower at float; a shorter
+        # period wakes the beacon task instead of waiting out the old one
+        vertical = estimator.vertical()
+        if vertical is not None:
+            beacon_task.set_period(beacon.scheduler.update(*vertical))
+
+    scheduler.add_task("bmp280", BMP280_PERIOD, read_bmp280, key="BMP280")
+    scheduler.add_task("ublox", GPS_PERIOD, read_gps, key="UBLOX")
+    # Re-evaluate the flight phase at the barometer's rate, not the beacon's
+    scheduler.add_task("phase", BMP280_PERIOD, update_phase, delay=BMP280_PERIOD)
+    # Give the sensor tasks a head start before the first beacon
+    beacon_task = scheduler.add_task("beacon", BEACON_PERIOD, send, delay=GPS_PERIOD)
+    scheduler.add_task("webcam", CAPTURE_PERIOD, capture_images)
+
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+
+    # Start reading the GPS in the background (poll_gps() returns the latest fix)
+    ublox.start_service()
+
+    # Send packets to direwolf from a background thread
+    start_tx_queue()
+
+    if BARO_SAMPLER:
+        # Sample the barometer in the background; read_bmp280() then returns immediately
+        barometer.start()
+
+    if LOOP_MODE == "concurrent":
+        run_concurrent()
+
+    elif LOOP_MODE == "deadline":
+        cycle = DeadlineCycle(LOOP_TIME_DELAY, STAGE_BUDGETS)
+        while True:
+            run_deadline(cycle)
+            cycle.wait_for_next_cycle()
+
+    else:
+        while True:
+            run_cycle()
+            time.sleep(LOOP_TIME_DELAY)
@@ -0,0 +1,56 @@
+import collections
+import threading
+import time
+
+from config import APRS_BATCH_BUFFER_SIZE
+
+
+class SampleBuffer:
+    """
+    Ring buffer of timestamped BMP280 samples waiting to be sent in a batched
+    telemetry frames (see aprs_tx.create_batch_packets()).
+
+    Only the newest 'size' samples are kept if the buffer is not drained in time.
+    """
+
+    def __init__(self, size=APRS_BATCH_BUFFER_SIZE):
+        """
+        Args:
+            size: Maximum number of samples kept
+        """
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, altitude, pressure, temperature, timestamp=None):
+        """
+        Adds one sample.
+
+        Args:
+            altitude: Altitude (m)
+            pressure: Pressure (hPa)
+            temperature: Temperature (C)
+            timestamp: Sample time (time.time(), default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._samples.append((timestamp, altitude, pressure, temperature))
+
+    def drain(self):
+        """
+        Removes and returns every buffered sample, oldest first.
+
+        Returns:
+            list[tuple]: (timestamp, altitude, pressure, temperature) samples
+        """
+        with self._lock:
+            samples = list(self._samples)
+            self._samples.clear()
+        return samples
+
+
+# Shared buffer fed by main.read_bmp280()
+buffer = SampleBuffer()
@@ -0,0 +1,247 @@
+import threading
+import time
+
+from config import DEBUG_MODE
+
+
+class Snapshot:
+    """
+    Thread-safe store for the latest reading published by each task.
+
+    Every acquisition task writes its most recent result under its own key,
+    and the beacon task reads a consistent copy of all of them at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._stamps = {}
+
+    def publish(self, key, value):
+        """
+        Stores the latest value for a key.
+
+        Args:
+            key: Name of the reading (e.g. "BMP280")
+            value: The reading itself
+        """
+        with self._lock:
+            self._values[key] = value
+            self._stamps[key] = time.monotonic()
+
+    def age(self, key):
+        """
+        Returns the age (in seconds) of a key's latest value, or None if it was never published.
+        """
+        with self._lock:
+            stamp = self._stamps.get(key)
+        if stamp is None:
+            return None
+        return time.monotonic() - stamp
+
+    def read(self, max_age=None, max_ages=None):
+        """
+        Returns a copy of the published values.
+
+        Args:
+            max_age: If given, values older than this many seconds are left out
+            max_ages: Key -> maximum age (seconds) for keys that go stale
+                sooner (or later) than 'max_age'
+
+        Returns:
+            dict: Reading name -> latest value
+        """
+        now = time.monotonic()
+        max_ages = max_ages or {}
+        with self._lock:
+            values = {}
+            for key, value in self._values.items():
+                limit = max_ages.get(key, max_age)
+                if limit is None or now - self._stamps[key] <= limit:
+                    values[key] = value
+            return values
+
+
+class PeriodicTask(threading.Thread):
+    """
+    Runs an action at a fixed rate on its own thread.
+
+    The period is measured from the start of each run, so a slow action only
+    delays its own task. If a key is given, the action's return value is
+    published to the shared snapshot. The period can be changed from another
+    thread with set_period(), which takes effect on the current wait.
+    """
+
+    def __init__(self, name, period, action, snapshot=None, key=None, delay=0):
+        super().__init__(name=name, daemon=True)
+        self.period = period
+        self.delay = delay
+        self.action = action
+        self.snapshot = snapshot
+        self.key = key
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def set_period(self, period):
+        """
+        Changes the period, waking the task if its next run is now due sooner.
+
+        Args:
+            period: New time between the starts of consecutive runs (seconds)
+        """
+        shorter = period < self.period
+        self.period = period
+        if shorter:
+            self._wake_event.set()
+
+    def run(self):
+        # Optional offset before the first run
+        if self.delay > 0:
+            self._stop_event.wait(self.delay)
+
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                result = self.action()
+                if self.key is not None and result is not None:
+                    self.snapshot.publish(self.key, result)
+            except Exception as e:
+                print(f"ERROR: [{self.name}]", e)
+
+            # Sleep for the rest of the period (returns early when stopped,
+            # and re-checks the period when set_period() shortens it)
+            while not self._stop_event.is_set():
+                remaining = self.period - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+                self._wake_event.wait(remaining)
+                self._wake_event.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+
+class Scheduler:
+    """
+    Owns a set of periodic tasks that share one snapshot.
+    """
+
+    def __init__(self):
+        self.snapshot = Snapshot()
+        self.tasks = []
+
+    def add_task(self, name, period, action, key=None, delay=0):
+        """
+        Registers an action to run every 'period' seconds.
+
+        Args:
+            name: Task name (used for thread name and error messages)
+            period: Time between the starts of consecutive runs (seconds)
+            action: Callable run by the task
+            key: Snapshot key to publish the action's return value under
+            delay: Time to wait before the first run (seconds)
+        """
+        task = PeriodicTask(name, period, action, snapshot=self.snapshot, key=key, delay=delay)
+        self.tasks.append(task)
+        return task
+
+    def start(self):
+        for task in self.tasks:
+            if DEBUG_MODE:
+                print(f"[SCHED] Starting task '{task.name}' (every {task.period}s)")
+            task.start()
+
+    def stop(self):
+        for task in self.tasks:
+            task.stop()
+
+    def run_forever(self):
+        """
+        Starts every task and blocks until interrupted.
+        """
+        self.start()
+        try:
+            while any(task.is_alive() for task in self.tasks):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+
+
+class DeadlineCycle:
+    """
+    Fixed-cadence cycle timer with per-stage time budgets.
+
+    The period is measured from the start of each cycle instead of from the
+    end of the work, so the cadence does not drift. A stage is skipped when
+    the time left in the cycle is smaller than its budget, and any stage that
+    runs past its budget is reported.
+    """
+
+    def __init__(self, period, budgets):
+        """
+        Args:
+            period: Time between the starts of consecutive cycles (seconds)
+            budgets: Stage name -> time budget (seconds)
+        """
+        self.period = period
+        self.budgets = budgets
+        self.cycle_start = time.monotonic()
+        self.overruns = 0
+        self.skipped = 0
+
+    def remaining(self):
+        """
+        Returns the time left (in seconds) before the next cycle is due.
+        """
+        return self.period - (time.monotonic() - self.cycle_start)
+
+    def run_stage(self, name, action):
+        """
+        Runs one stage within its budget.
+
+        Args:
+            name: Stage name (a key of the budget table)
+            action: Callable taking the stage budget in seconds, so stages
+                that wait on hardware can shorten their own timeouts
+
+        Returns:
+            The action's return value, or None if the stage was skipped.
+        """
+        budget = self.budgets.get(name, self.period)
+        remaining = self.remaining()
+        if remaining < budget:
+            self.skipped += 1
+            print(f"[CYCLE] Skipping '{name}' ({remaining:.1f}s left, budget {budget}s)")
+            return None
+
+        start = time.monotonic()
+        result = action(budget)
+        elapsed = time.monotonic() - start
+
+        if elapsed > budget:
+            self.overruns += 1
+            print(f"[CYCLE] Stage '{name}' overran its budget ({elapsed:.1f}s > {budget}s)")
+        elif DEBUG_MODE:
+            print(f"[CYCLE] Stage '{name}' took {elapsed:.1f}s (budget {budget}s)")
+
+        return result
+
+    def wait_for_next_cycle(self):
+        """
+        Sleeps until the start of the next cycle.
+
+        Cycle starts stay on a fixed grid (start + n * period), so sleep
+        jitter does not accumulate. If the cycle ran longer than a full
+        period, the missed cycle starts are dropped.
+        """
+        elapsed = time.monotonic() - self.cycle_start
+        missed = int(elapsed // self.period)
+        if missed > 0:
+            print(f"[CYCLE] Cycle overran its period ({elapsed:.1f}s > {self.period}s), "
+                  f"skipping {missed} cycle start(s)")
+
+        next_start = self.cycle_start + (missed + 1) * self.period
+        time.sleep(max(0, next_start - time.monotonic()))
+        self.cycle_start = next_start
@@ -8,7 +8,9 @@ TELEM_DIR = ROOT_DIR / "./data"
 LOG_FNAME = TELEM_DIR / "data.txt"
 LOG_FNAME = LOG_FNAME.resolve()
 
-def log_data(data, file=LOG_FNAME):
+def log_data(data, file=None):
+    if file is None:
+        file = LOG_FNAME
     try:
         print("[TELEM] Logging telemetry data...", end="")
         with open(file, "a+", encoding="utf-8") as fp:
@@ -0,0 +1,181 @@
+import bisect
+import functools
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+TELEM_DIR = ROOT_DIR / "./data"
+LATENCY_FNAME = TELEM_DIR / "latency.txt"
+LATENCY_FNAME = LATENCY_FNAME.resolve()
+
+# Bucket upper edges (seconds): log-spaced from 1 us to ~170 s, 25% apart
+BUCKET_EDGES = tuple(1e-6 * 1.25 ** i for i in range(86))
+
+
+class LatencyHistogram:
+    """
+    Fixed-size latency histogram.
+
+    Samples are counted into log-spaced buckets, so memory use does not grow
+    with the number of calls. Percentiles are reported as the upper edge of
+    the bucket they fall in (within 25% of the true value); the maximum is exact.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(BUCKET_EDGES) + 1)
+            self.count = 0
+            self.max = 0.0
+
+    def record(self, seconds):
+        """
+        Adds one latency sample.
+
+        Args:
+            seconds: The measured latency
+        """
+        index = bisect.bisect_left(BUCKET_EDGES, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Returns the latency (seconds) below which 'fraction' of the samples fall.
+
+        Args:
+            fraction: Percentile as a fraction (e.g. 0.95)
+        """
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            target = fraction * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    if index < len(BUCKET_EDGES):
+                        return min(BUCKET_EDGES[index], self.max)
+                    return self.max
+            return self.max
+
+    def summary(self):
+        """
+        Returns the sample count and the p50/p95/max latencies (seconds).
+        """
+        return {
+            "count": self.count,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+# Stage name -> histogram
+histograms = {}
+
+_cycles = 0
+
+
+def get_histogram(name):
+    """
+    Returns the histogram for a stage, creating it on first use.
+    """
+    if name not in histograms:
+        histograms[name] = LatencyHistogram()
+    return histograms[name]
+
+
+def timed(name):
+    """
+    Decorator that records the latency of every call (including failed ones)
+    into the named stage histogram.
+
+    Args:
+        name: Stage name (e.g. "bmp280.read_sensor")
+    """
+    histogram = get_histogram(name)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+def instrument(module, attribute):
+    """
+    Replaces a module-level function with a timed wrapper.
+
+    Callers that look the function up through the module (including the
+    module itself) are timed as well.
+
+    Args:
+        module: The module that defines the function (e.g. bmp280)
+        attribute: The function name (e.g. "read_sensor")
+    """
+    func = getattr(module, attribute)
+    if getattr(func, "__wrapped__", None) is not None:
+        return
+    name = f"{module.__name__}.{attribute}"
+    setattr(module, attribute, timed(name)(func))
+
+
+def format_stats():
+    """
+    Formats every stage histogram as one compact line (latencies in ms).
+    """
+    stages = []
+    for name, histogram in histograms.items():
+        stats = histogram.summary()
+        if stats["count"] == 0:
+            continue
+        stages.append(
+            f"{name} n={stats['count']} "
+            f"p50={stats['p50'] * 1000:.1f} p95={stats['p95'] * 1000:.1f} max={stats['max'] * 1000:.1f}"
+        )
+    return "; ".join(stages)
+
+
+def flush(file=None):
+    """
+    Appends the current statistics to the latency file and resets the histograms.
+
+    Returns:
+        int: The number of bytes written
+    """
+    if file is None:
+        file = LATENCY_FNAME
+    line = format_stats()
+    if not line:
+        return 0
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(file, "a", encoding="utf-8") as fp:
+        written = fp.write(f"[{timestamp}] {line}\n")
+    for histogram in histograms.values():
+        histogram.reset()
+    return written
+
+
+def end_cycle(flush_every, file=None):
+    """
+    Marks the end of a main loop cycle, flushing every 'flush_every' cycles.
+    """
+    global _cycles
+    _cycles += 1
+    if flush_every > 0 and _cycles % flush_every == 0:
+        flush(file)
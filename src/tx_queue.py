@@ -0,0 +1,231 @@
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+from config import DEBUG_MODE
+from config import TX_QUEUE_SIZE, TX_QUEUE_POLICY, TX_MAX_RETRIES, TX_RETRY_DELAY
+
+# Packet priorities ("priority" policy): position reports go ahead of bulk telemetry
+PRIORITY_TELEMETRY = 0
+PRIORITY_POSITION = 1
+
+
+class TxItem:
+    """
+    One queued packet and its timing.
+    """
+
+    __slots__ = ("packet", "priority", "enqueued_at", "sent_at", "attempts")
+
+    def __init__(self, packet, priority=0):
+        self.packet = packet
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.sent_at = None
+        self.attempts = 0
+
+
+class TxQueue(threading.Thread):
+    """
+    Bounded outgoing packet queue with a background sender.
+
+    put() only appends to the queue, so the caller never waits on the radio
+    link. When the queue is full, the "drop_oldest" policy discards the oldest
+    packet, and the "priority" policy discards the lowest priority packet
+    (the oldest among equals, or the new one if its priority is lower than
+    every queued packet's). With "priority", higher priority packets are also
+    sent first. A failed send is retried up to 'max_retries' times before the
+    packet is dropped. With an airtime budget, the next packet is held back
+    until the budget covers it (a higher priority packet queued meanwhile
+    goes first), and the budget is charged once the send succeeds.
+    """
+
+    def __init__(self, send, maxsize=TX_QUEUE_SIZE, policy=TX_QUEUE_POLICY,
+                 max_retries=TX_MAX_RETRIES, retry_delay=TX_RETRY_DELAY, history=50, airtime=None):
+        """
+        Args:
+            send: Function called with each packet (raises on failure)
+            maxsize: Maximum number of queued packets
+            policy: "drop_oldest" (FIFO) or "priority"
+            max_retries: Retries after a failed send before the packet is dropped
+            retry_delay: Time to wait before retrying a failed send (seconds)
+            history: Number of sent packets kept in 'sent_items'
+            airtime: Budget with cost(packet), time_until(cost) and consume(cost)
+                (e.g. beacon.AirtimeBudget), or None to send as fast as possible
+        """
+        if policy not in ("drop_oldest", "priority"):
+            raise ValueError(f"Invalid transmit queue policy: {policy}")
+        super().__init__(name="tx_queue", daemon=True)
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.airtime = airtime
+
+        # FIFO for "drop_oldest", heap of (-priority, sequence, item) for "priority"
+        self._fifo = collections.deque()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.retried = 0
+        self.sent_items = collections.deque(maxlen=history)
+
+    def __len__(self):
+        return len(self._fifo) if self.policy == "drop_oldest" else len(self._heap)
+
+    def _push(self, item, sequence=None):
+        if self.policy == "drop_oldest":
+            self._fifo.append(item)
+        else:
+            if sequence is None:
+                sequence = next(self._sequence)
+            heapq.heappush(self._heap, (-item.priority, sequence, item))
+
+    def _peek(self):
+        return self._fifo[0] if self.policy == "drop_oldest" else self._heap[0][2]
+
+    def _pop(self):
+        if self.policy == "drop_oldest":
+            return self._fifo.popleft(), None
+        _, sequence, item = heapq.heappop(self._heap)
+        return item, sequence
+
+    def _make_room(self, item):
+        """
+        Drops a packet to make room for 'item'.
+
+        Returns:
+            bool: False if 'item' itself is the packet to drop.
+        """
+        self.dropped += 1
+        if self.policy == "drop_oldest":
+            self._fifo.popleft()
+            return True
+
+        # Lowest priority, then oldest
+        victim = max(self._heap, key=lambda entry: (entry[0], -entry[1]))
+        if -victim[0] > item.priority:
+            return False
+        self._heap.remove(victim)
+        heapq.heapify(self._heap)
+        return True
+
+    def put(self, packet, priority=0):
+        """
+        Queues a packet for transmission (never blocks).
+
+        Args:
+            packet: The packet passed to 'send'
+            priority: Higher is sent first ("priority" policy only)
+
+        Returns:
+            bool: False if the packet was dropped because the queue is full.
+        """
+        item = TxItem(packet, priority)
+        with self._condition:
+            if len(self) >= self.maxsize and not self._make_room(item):
+                return False
+            self._push(item)
+            self.enqueued += 1
+            self._condition.notify()
+        return True
+
+    def stats(self):
+        """
+        Returns the queue counters.
+
+        Returns:
+            dict: Queued, enqueued, sent, dropped and retried packet counts, and the
+                mean enqueue-to-send latency (s) of the recent packets
+        """
+        items = list(self.sent_items)
+        latency = sum(item.sent_at - item.enqueued_at for item in items) / len(items) if items else None
+        return {
+            "queued": len(self),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "latency": latency,
+        }
+
+    def run(self):
+        while not self._stop_event.is_set():
+            cost = None
+            with self._condition:
+                while not self._stop_event.is_set():
+                    if not len(self):
+                        self._condition.wait()
+                        continue
+                    if self.airtime is None:
+                        break
+                    # Wait for airtime (woken early by put(), in case a higher priority packet arrives)
+                    cost = self.airtime.cost(self._peek().packet)
+                    delay = self.airtime.time_until(cost)
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._stop_event.is_set():
+                    break
+                item, sequence = self._pop()
+
+            item.attempts += 1
+            try:
+                self.send(item.packet)
+            except Exception as e:
+                if item.attempts <= self.max_retries:
+                    self.retried += 1
+                    if DEBUG_MODE:
+                        print(f"\n[TX_QUEUE] Send failed ({e}), retrying...", end="")
+                    # Back at the head of the queue (unless it filled up in the meantime)
+                    with self._condition:
+                        if len(self) < self.maxsize:
+                            if self.policy == "drop_oldest":
+                                self._fifo.appendleft(item)
+                            else:
+                                self._push(item, sequence)
+                        else:
+                            self.dropped += 1
+                    self._stop_event.wait(self.retry_delay)
+                else:
+                    self.dropped += 1
+                    print("ERROR: Dropped packet after", item.attempts, "attempts:", e)
+                continue
+
+            # Only frames that went out use airtime (a failed send is not charged)
+            if cost is not None:
+                self.airtime.consume(cost)
+            item.sent_at = time.monotonic()
+            self.sent += 1
+            self.sent_items.append(item)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+
+# Shared queue used by main.send_beacon()
+queue = None
+
+
+def start_queue(send, **kwargs):
+    """
+    Starts the shared transmit queue (if it is not already running).
+
+    Returns:
+        TxQueue: The running queue.
+    """
+    global queue
+    if queue is None:
+        queue = TxQueue(send, **kwargs)
+        queue.start()
+    return queue
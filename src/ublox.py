@@ -1,33 +1,377 @@
 """
 UBLOX Max M8Q GPS Module - I2C Communication
 Reads GPS data via I2C and parses NMEA sentences manually
-No external dependencies required (except smbus)
+(or binary UBX NAV-PVT messages in UBX mode)
+No external dependencies required (except smbus, or smbus2)
 
 Troubleshooting tips:
     1. Check I2C is enabled: sudo raspi-config
     2. Check device is detected: i2cdetect -y 1
     3. Install smbus: sudo apt-get install python3-smbus
+       (or smbus2, which drains the output buffer in one transfer: pip install smbus2)
     4. Make sure EN pin is connected to 3.3V
 """
 
-import smbus
 import time
+import struct
+import threading
+import collections
 
-from config import DEBUG_MODE
+try:
+    # smbus2 can read the whole output buffer in one combined transaction
+    from smbus2 import SMBus, i2c_msg
+except ImportError:
+    from smbus import SMBus
+    i2c_msg = None
+
+try:
+    # Only needed when the TX-ready pin is wired to the Pi (GPS_TXREADY_PIN)
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
+from config import DEBUG_MODE, GPS_POLL_INTERVAL, GPS_MAX_FIX_AGE, GPS_FIX_HISTORY
+from config import GPS_NMEA_FIELDS
+from config import GPS_PROTOCOL, GPS_CONFIGURE, GPS_DISABLED_NMEA, GPS_DYNAMIC_MODEL, GPS_MEASUREMENT_RATE
+from config import GPS_CAPTURE
+from config import GPS_TXREADY_PIN, GPS_TXREADY_PIO, GPS_TXREADY_THRESHOLD, GPS_TXREADY_TIMEOUT
+
+import gps_capture
+
+# Largest SMBus block read
+I2C_BLOCK_SIZE = 32
+
+# UBX protocol
+UBX_SYNC = b'\xb5\x62'
+UBX_HEADER = struct.Struct('<2sBBH')  # sync chars, class, id, payload length
+UBX_NAV = 0x01
+UBX_NAV_PVT = 0x07
+UBX_CFG = 0x06
+UBX_CFG_PRT = 0x00
+UBX_CFG_MSG = 0x01
+UBX_CFG_RATE = 0x08
+UBX_CFG_NAV5 = 0x24
+UBX_ACK = 0x05
+UBX_ACK_NAK = 0x00
+UBX_ACK_ACK = 0x01
+
+# UBX-CFG-MSG ids of the standard NMEA sentences (class 0xF0)
+NMEA_CLASS = 0xF0
+NMEA_MSG_IDS = {'GGA': 0x00, 'GLL': 0x01, 'GSA': 0x02, 'GSV': 0x03, 'RMC': 0x04, 'VTG': 0x05}
+
+# UBX-CFG-NAV5 dynamic platform models
+DYNAMIC_MODELS = {'portable': 0, 'stationary': 2, 'pedestrian': 3, 'automotive': 4, 'sea': 5,
+                  'airborne1g': 6, 'airborne2g': 7, 'airborne4g': 8}
+
+# UBX-CFG-NAV5 payload (36 bytes): mask, dynModel, fixMode, fixedAlt, fixedAltVar,
+# minElev, drLimit, pDop, tDop, pAcc, tAcc, staticHoldThresh, dgnssTimeout,
+# cnoThreshNumSVs, cnoThresh, (reserved), staticHoldMaxDist, utcStandard, (reserved)
+CFG_NAV5 = struct.Struct('<HBBiIbBHHHHBBBB2xHB5x')
+CFG_NAV5_MASK_DYN = 0x0001
+
+# UBX-CFG-RATE payload: measRate (ms), navRate (cycles), timeRef (1 = GPS time)
+CFG_RATE = struct.Struct('<HHH')
+
+# UBX-NAV-PVT payload (92 bytes): iTOW, year, month, day, hour, min, sec, valid,
+# tAcc, nano, fixType, flags, flags2, numSV, lon, lat, height, hMSL, hAcc, vAcc,
+# velN, velE, velD, gSpeed, headMot, sAcc, headAcc, pDOP, flags3, (reserved),
+# headVeh, magDec, magAcc
+NAV_PVT = struct.Struct('<IHBBBBBBIiBBBBiiiiIIiiiiiIIHB5xihH')
+
+# UBX-CFG-PRT payload for the DDC (I2C) port (20 bytes): portID, (reserved), txReady,
+# mode (slave address << 1), (reserved), inProtoMask, outProtoMask, flags, (reserved)
+CFG_PRT_DDC = struct.Struct('<BxHI4xHHH2x')
+DDC_PORT_ID = 0
+PROTO_UBX = 0x0001
+PROTO_NMEA = 0x0002
+
+# txReady bits: en (0), pol (1, set = active low), pin (2-6), thres (7-15, in units of 8 bytes)
+TXREADY_EN = 0x0001
+TXREADY_ACTIVE_LOW = 0x0002
+
+MM_PER_S_TO_KNOTS = 0.00194384
+
+
+def ubx_checksum(data):
+    """
+    Computes the 8-bit Fletcher checksum of a UBX message (class through payload).
+
+    param data: The bytes covered by the checksum
+    returns: The two checksum bytes (CK_A, CK_B)
+    """
+    ck_a = 0
+    ck_b = 0
+    for byte in data:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return bytes((ck_a, ck_b))
+
+
+def ubx_frame(msg_class, msg_id, payload=b''):
+    """
+    Builds a complete UBX frame.
+
+    param msg_class: UBX message class
+    param msg_id: UBX message id
+    param payload: Message payload
+    returns: The framed message (sync chars, header, payload, checksum)
+    """
+    body = struct.pack('<BBH', msg_class, msg_id, len(payload)) + bytes(payload)
+    return UBX_SYNC + body + ubx_checksum(body)
+
+
+def parse_nav_pvt(payload):
+    """
+    Decodes a UBX-NAV-PVT payload.
+
+    param payload: The 92-byte NAV-PVT payload
+    returns: A collection of parsed GPS data (same keys as the NMEA parsers,
+        plus fix type and NED velocity)
+    """
+    if len(payload) != NAV_PVT.size:
+        raise ValueError("Input NAV-PVT payload is incomplete.")
+    (itow, year, month, day, hour, minute, second, valid, t_acc, nano,
+     fix_type, flags, flags2, num_sv, lon, lat, height, h_msl, h_acc, v_acc,
+     vel_n, vel_e, vel_d, g_speed, head_mot, s_acc, head_acc, p_dop, flags3,
+     head_veh, mag_dec, mag_acc) = NAV_PVT.unpack(payload)
+
+    # gnssFixOK (flags bit 0) and at least a 2D fix
+    fix_ok = bool(flags & 0x01) and fix_type >= 2
+
+    return {
+        'time': f"{hour:02d}{minute:02d}{second:02d}.00",
+        'date': f"{day:02d}{month:02d}{year % 100:02d}",
+        'status': 'A' if fix_ok else 'V',
+        'latitude': lat * 1e-7,
+        'longitude': lon * 1e-7,
+        'fix_quality': 1 if fix_ok else 0,
+        'fix_type': fix_type,
+        'num_sats': num_sv,
+        'pdop': p_dop * 0.01,
+        'altitude': h_msl / 1000.0,
+        'speed_knots': g_speed * MM_PER_S_TO_KNOTS,
+        'course': head_mot * 1e-5,
+        'vel_n': vel_n / 1000.0,
+        'vel_e': vel_e / 1000.0,
+        'vel_d': vel_d / 1000.0,
+    }
+
+
+def _text(index):
+    return lambda parts: parts[index] or None
+
+
+def _float(index):
+    return lambda parts: float(parts[index]) if parts[index] else None
+
+
+def _int(index):
+    return lambda parts: int(parts[index]) if parts[index] else None
+
+
+def _coordinate(index, degree_digits, negative):
+    """
+    Converts a ddmm.mmmm / dddmm.mmmm field and its hemisphere field into signed degrees.
+    """
+    def convert(parts):
+        value, hemisphere = parts[index], parts[index + 1]
+        if not value or not hemisphere:
+            return None
+        degrees = float(value[:degree_digits]) + float(value[degree_digits:]) / 60.0
+        return -degrees if hemisphere == negative else degrees
+    return convert
+
+
+# NMEA sentence type -> (minimum field count, {field name: converter})
+# Sentence types are talker-agnostic (GPGGA, GNGGA and GLGGA all use 'GGA')
+#   GGA: https://docs.fixposition.com/fd/nmea-gp-gga
+#   RMC: https://docs.fixposition.com/fd/nmea-gp-rmc
+NMEA_PARSERS = {
+    'GGA': (15, {
+        'time': _text(1),
+        'latitude': _coordinate(2, 2, 'S'),
+        'longitude': _coordinate(4, 3, 'W'),
+        'fix_quality': _int(6),     # 0=no fix, 1=GPS, 2=DGPS
+        'num_sats': _int(7),
+        'hdop': _float(8),
+        'altitude': _float(9),
+    }),
+    'RMC': (12, {
+        'status': _text(2),         # A=active, V=void
+        'speed_knots': _float(7),
+        'course': _float(8),
+        'date': _text(9),           # ddmmyy
+    }),
+    'GSA': (18, {
+        'fix_mode': _int(2),        # 1=no fix, 2=2D, 3=3D
+        'pdop': _float(15),
+        'hdop': _float(16),
+        'vdop': _float(17),
+    }),
+    'VTG': (9, {
+        'course': _float(1),
+        'speed_knots': _float(5),
+        'speed_kmh': _float(7),
+    }),
+}
+
+
+def nmea_dispatch_table(fields=None):
+    """
+    Builds a sentence type -> parser table restricted to the requested fields.
+
+    Each field is converted from the first sentence type (in NMEA_PARSERS
+    order) that provides it. Sentence types left with no fields are not in
+    the table, so they are skipped without being split or converted.
+
+    param fields: The field names to convert (None for every field)
+    returns: Sentence type -> (minimum field count, [(field name, converter)])
+    """
+    table = {}
+    claimed = set()
+    for sentence_type, (min_parts, converters) in NMEA_PARSERS.items():
+        selected = [(name, convert) for name, convert in converters.items()
+                    if (fields is None or name in fields) and name not in claimed]
+        if selected:
+            table[sentence_type] = (min_parts, selected)
+            claimed.update(name for name, _ in selected)
+    return table
+
+
+def parse_nmea_sentence(sentence, table):
+    """
+    Parses one NMEA sentence using a dispatch table.
+
+    param sentence: A checksum-verified sentence without the '*hh' suffix
+    param table: Dispatch table from nmea_dispatch_table()
+    returns: A collection of parsed data (empty if the sentence type is not in the table)
+    """
+    parser = table.get(sentence[3:6])
+    if parser is None:
+        return {}
+    min_parts, converters = parser
+    parts = sentence.split(',')
+    if len(parts) < min_parts:
+        raise ValueError(f"Input {sentence[3:6]} sentence is incomplete.")
+
+    data = {}
+    for name, convert in converters:
+        value = convert(parts)
+        if value is not None:
+            data[name] = value
+    return data
+
+
+def nmea_checksum(data):
+    """
+    Computes the NMEA checksum (XOR of every byte between '$' and '*').
+
+    The bytes are folded as one integer (halving its length each step), which
+    is much faster than XOR-ing them one at a time in Python.
+
+    param data: The sentence body
+    returns: The checksum value (0-255)
+    """
+    value = int.from_bytes(data, 'big')
+    length = len(data)
+    while length > 1:
+        half = (length + 1) // 2
+        value = (value >> (8 * half)) ^ (value & ((1 << (8 * half)) - 1))
+        length = half
+    return value
+
+
+class NMEAFramer:
+    """
+    Incremental NMEA sentence framer.
+
+    Bytes are appended to one bytearray and scanned from a read offset;
+    consumed bytes are dropped once per feed (not once per line), so a
+    backlog is framed in linear time. Sentences with a bad or missing
+    '*hh' checksum are dropped and counted.
+    """
+
+    def __init__(self, max_buffer=4096):
+        """
+        param max_buffer: Maximum number of bytes kept while waiting for a line end
+        """
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+        self.bad_checksums = 0
+
+    def feed(self, data, sentence_types=None):
+        """
+        Adds raw bytes and returns the complete, checksum-verified sentences.
+
+        param data: Raw bytes read from the module
+        param sentence_types: If given, only sentences of these types (e.g. {b'GGA'})
+            are verified and returned; others are skipped unparsed
+        returns: A list of sentences ('$' through the field before '*')
+        """
+        buffer = self.buffer
+        buffer += data
+        view = memoryview(buffer)
+        sentences = []
+        offset = 0
+
+        try:
+            while True:
+                end = buffer.find(b'\n', offset)
+                if end < 0:
+                    break
+                start = buffer.rfind(b'$', offset, end)
+                star = buffer.rfind(b'*', offset, end)
+                offset = end + 1
+                if start < 0:
+                    continue
+                if sentence_types is not None and bytes(view[start + 3:start + 6]) not in sentence_types:
+                    continue
+                if star < start or end - star < 3:
+                    self.bad_checksums += 1
+                    continue
+
+                try:
+                    valid = nmea_checksum(view[start + 1:star]) == int(buffer[star + 1:star + 3], 16)
+                except ValueError:
+                    valid = False
+                if not valid:
+                    self.bad_checksums += 1
+                    continue
+
+                sentences.append(view[start:star].tobytes().decode('ascii', errors='ignore'))
+        finally:
+            view.release()
+
+        # Drop consumed bytes (and runaway data with no line end)
+        if offset:
+            del buffer[:offset]
+        if len(buffer) > self.max_buffer:
+            buffer.clear()
+
+        return sentences
 
 
 class UBLOX_I2C:
 
-    def __init__(self, bus_num=1, address=0x42):
+    def __init__(self, bus_num=1, address=0x42, protocol=GPS_PROTOCOL, bus=None, capture=None):
         """
         Initializes an I2C connection to UBLOX GPS module.
         
         param bus_num: I2C bus number (usually 1 on Raspberry Pi)
         param address: I2C address (default 0x42 for UBLOX)
+        param protocol: 'nmea' (GGA/RMC sentences) or 'ubx' (NAV-PVT messages)
+        param bus: An open bus to read from instead of SMBus(bus_num) (e.g. a gps_capture.ReplayBus)
+        param capture: A gps_capture.CaptureWriter that records every raw byte read (None to disable)
         """
-        self.bus = smbus.SMBus(bus_num)
+        if protocol not in ('nmea', 'ubx'):
+            raise ValueError(f"Invalid GPS protocol: {protocol}")
+        self.bus = bus if bus is not None else SMBus(bus_num)
         self.address = address
-        self.buffer = b''
+        self.capture = capture
+        self.protocol = protocol
+        self.framer = NMEAFramer()
+        self.ubx_buffer = bytearray()
+        self.set_nmea_fields(GPS_NMEA_FIELDS)
 
         
     def data_available(self):
@@ -37,9 +381,8 @@ class UBLOX_I2C:
         returns: The data available bit status
         """
         try:
-            # Read registers 0xFD and 0xFE for available byte count
-            high = self.bus.read_byte_data(self.address, 0xFD)
-            low = self.bus.read_byte_data(self.address, 0xFE)
+            # Read registers 0xFD and 0xFE (available byte count) in one combined read
+            high, low = self.bus.read_i2c_block_data(self.address, 0xFD, 2)
             return (high << 8) | low
         except Exception:
             raise
@@ -59,31 +402,65 @@ class UBLOX_I2C:
             raise
         
     
+    def drain(self, available=None):
+        """
+        Reads everything in the module's output buffer in one pass.
+
+        Uses a single combined i2c_rdwr transaction when the bus supports it
+        (smbus2), otherwise back-to-back 32-byte block reads.
+
+        param available: The number of bytes to read (default: read registers 0xFD/0xFE)
+        returns: The bytes read
+        """
+        if available is None:
+            available = self.data_available()
+        if available <= 0:
+            return b''
+
+        try:
+            if i2c_msg is not None and hasattr(self.bus, 'i2c_rdwr'):
+                # Point at the data stream register (0xFF), then read it all in one transfer
+                write = i2c_msg.write(self.address, [0xFF])
+                read = i2c_msg.read(self.address, available)
+                self.bus.i2c_rdwr(write, read)
+                data = bytes(read)
+            else:
+                data = bytearray()
+                while len(data) < available:
+                    data += self.read_data(min(available - len(data), I2C_BLOCK_SIZE))
+                data = bytes(data)
+        except Exception:
+            raise
+
+        if self.capture is not None:
+            self.capture.write(data)
+        return data
+
+
+    def set_nmea_fields(self, fields):
+        """
+        Selects the fields converted by parse_gps_data() in NMEA mode.
+
+        param fields: The field names to convert (None for every field)
+        """
+        self.nmea_table = nmea_dispatch_table(fields)
+        self.nmea_types = {sentence_type.encode('ascii') for sentence_type in self.nmea_table}
+
+
     def get_nmea_sentences(self):
         """
         Fetches a collection of NMEA sentences.
 
-        returns: A collection of NMEA sentence byte data decoded into ASCII
+        returns: A collection of checksum-verified NMEA sentences decoded into ASCII
+            (without the '*hh' checksum), limited to the types that provide the selected fields
         """
+        sentences = []
         try:
             available = self.data_available()
         
             if available > 0:
-                # Read available data (max 32 bytes at a time due to I2C limitation)
-                chunk_size = min(available, 32)
-                data = self.read_data(chunk_size)
-                self.buffer += data
-                
-                # Process complete NMEA sentences
-                sentences = []
-                while b'\n' in self.buffer:
-                    line, self.buffer = self.buffer.split(b'\n', 1)
-                    try:
-                        sentence = line.decode('ascii', errors='ignore').strip()
-                        if sentence.startswith('$'):
-                            sentences.append(sentence)
-                    except Exception:
-                        pass
+                # Drain all available data at once and frame complete sentences
+                sentences = self.framer.feed(self.drain(available), self.nmea_types)
             
         except Exception:
             raise
@@ -102,50 +479,9 @@ class UBLOX_I2C:
         """
         if type(sentence) != str:
             raise TypeError("Input GGA sentence must be a string.")
-        parts = sentence.split(',')
-        if len(parts) < 15 or not parts[0].endswith('GGA'):
+        if sentence[3:6] != 'GGA':
             raise ValueError("Input GGA sentence is incomplete.")
-        
-        data = {}
-        try:
-            # Time (hhmmss.ss)
-            if parts[1]:
-                data['time'] = parts[1]
-            
-            # Latitude
-            if parts[2] and parts[3]:
-                lat = float(parts[2][:2]) + float(parts[2][2:]) / 60.0
-                if parts[3] == 'S':
-                    lat = -lat
-                data['latitude'] = lat
-            
-            # Longitude
-            if parts[4] and parts[5]:
-                lon = float(parts[4][:3]) + float(parts[4][3:]) / 60.0
-                if parts[5] == 'W':
-                    lon = -lon
-                data['longitude'] = lon
-            
-            # Fix quality (0=no fix, 1=GPS, 2=DGPS)
-            if parts[6]:
-                data['fix_quality'] = int(parts[6])
-            
-            # Number of satellites
-            if parts[7]:
-                data['num_sats'] = int(parts[7])
-            
-            # Horizontal dilution of precision
-            if parts[8]:
-                data['hdop'] = float(parts[8])
-            
-            # Altitude
-            if parts[9]:
-                data['altitude'] = float(parts[9])
-                
-        except Exception:
-            raise
-        
-        return data
+        return parse_nmea_sentence(sentence.split('*')[0], nmea_dispatch_table())
     
     
     def parse_rmc(self, sentence):
@@ -159,51 +495,212 @@ class UBLOX_I2C:
         """
         if type(sentence) != str:
             raise TypeError("Input RMC sentence must be a string.")
-        parts = sentence.split(',')
-        if len(parts) < 12 or not parts[0].endswith('RMC'):
+        if sentence[3:6] != 'RMC':
             raise ValueError("Input RMC sentence is incomplete.")
-        
-        data = {}
+        return parse_nmea_sentence(sentence.split('*')[0], nmea_dispatch_table())
+
+
+    def write_ubx(self, msg_class, msg_id, payload=b''):
+        """
+        Sends a UBX message to the module.
+
+        param msg_class: UBX message class
+        param msg_id: UBX message id
+        param payload: Message payload
+        """
+        frame = ubx_frame(msg_class, msg_id, payload)
         try:
-            # Status (A=active, V=void)
-            if parts[2]:
-                data['status'] = parts[2]
-            
-            # Speed over ground (knots)
-            if parts[7]:
-                data['speed_knots'] = float(parts[7])
-            
-            # Course over ground (degrees)
-            if parts[8]:
-                data['course'] = float(parts[8])
-            
-            # Date (ddmmyy)
-            if parts[9]:
-                data['date'] = parts[9]
-                
-        except (ValueError, IndexError):
+            if i2c_msg is not None and hasattr(self.bus, 'i2c_rdwr'):
+                self.bus.i2c_rdwr(i2c_msg.write(self.address, frame))
+                return
+
+            # SMBus block writes: the first byte of each chunk goes out as the "register"
+            for start in range(0, len(frame), I2C_BLOCK_SIZE):
+                chunk = frame[start:start + I2C_BLOCK_SIZE]
+                self.bus.write_i2c_block_data(self.address, chunk[0], list(chunk[1:]))
+        except Exception:
             raise
-        
-        return data
-    
-    
+
+
+    def get_ubx_messages(self):
+        """
+        Fetches the complete UBX messages in the module's output buffer.
+
+        Bytes outside UBX frames (idle 0xFF bytes, NMEA) are skipped, and
+        frames with a bad checksum are dropped.
+
+        returns: A list of (class, id, payload) tuples
+        """
+        messages = []
+        available = self.data_available()
+        if available > 0:
+            self.ubx_buffer += self.drain(available)
+
+        buffer = self.ubx_buffer
+        offset = 0
+        while True:
+            start = buffer.find(UBX_SYNC, offset)
+            if start < 0:
+                # Keep a trailing first sync char, it may start the next frame
+                offset = len(buffer) - 1 if buffer.endswith(UBX_SYNC[:1]) else len(buffer)
+                break
+            if len(buffer) - start < UBX_HEADER.size:
+                offset = start
+                break
+            _, msg_class, msg_id, length = UBX_HEADER.unpack_from(buffer, start)
+            end = start + UBX_HEADER.size + length + 2
+            if end > len(buffer):
+                offset = start
+                break
+
+            body = bytes(buffer[start + 2:end - 2])
+            if ubx_checksum(body) == buffer[end - 2:end]:
+                messages.append((msg_class, msg_id, body[4:]))
+                offset = end
+            else:
+                # Not a valid frame: resync after this sync char
+                offset = start + 1
+
+        del buffer[:offset]
+        return messages
+
+
+    def enable_nav_pvt(self, rate=1):
+        """
+        Subscribes to periodic NAV-PVT output on the I2C (DDC) port (UBX-CFG-MSG).
+
+        param rate: Send a NAV-PVT every 'rate' navigation solutions (0 disables it)
+        """
+        self.write_ubx(UBX_CFG, UBX_CFG_MSG, bytes((UBX_NAV, UBX_NAV_PVT, rate)))
+
+
+    def send_config(self, msg_class, msg_id, payload, timeout=1.0):
+        """
+        Sends a UBX-CFG message and waits for the module to acknowledge it.
+
+        param msg_class: UBX message class
+        param msg_id: UBX message id
+        param payload: Message payload
+        param timeout: Maximum time to wait for ACK/NAK (seconds)
+        """
+        self.write_ubx(msg_class, msg_id, payload)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for ack_class, ack_id, ack_payload in self.get_ubx_messages():
+                if ack_class != UBX_ACK or bytes(ack_payload[:2]) != bytes((msg_class, msg_id)):
+                    continue
+                if ack_id == UBX_ACK_ACK:
+                    return
+                raise RuntimeError(f"UBX message 0x{msg_class:02X} 0x{msg_id:02X} rejected (NAK).")
+            time.sleep(GPS_POLL_INTERVAL)
+        raise RuntimeError(f"Timeout: No ACK for UBX message 0x{msg_class:02X} 0x{msg_id:02X}.")
+
+
+    def configure(self, disabled_nmea=GPS_DISABLED_NMEA, dynamic_model=GPS_DYNAMIC_MODEL,
+                  measurement_rate=GPS_MEASUREMENT_RATE):
+        """
+        Configures the receiver for flight (each message must be acknowledged).
+
+        Selects the dynamic platform model (UBX-CFG-NAV5; the factory
+        "portable" model loses fix above about 12 km), sets the measurement
+        rate (UBX-CFG-RATE) and turns off unused NMEA sentences on the I2C port
+        (UBX-CFG-MSG). In UBX mode every NMEA sentence is turned off.
+
+        Every message is sent even if an earlier one is rejected (the dynamic
+        model goes first, as the one that matters most for the flight).
+
+        param disabled_nmea: NMEA sentence types to turn off (e.g. ['GSV', 'GSA'])
+        param dynamic_model: Dynamic platform model name (see DYNAMIC_MODELS)
+        param measurement_rate: Time between measurements (ms)
+        raises RuntimeError: Listing the messages that were rejected or not acknowledged
+        """
+        if self.protocol == 'ubx':
+            disabled_nmea = list(NMEA_MSG_IDS)
+
+        nav5 = CFG_NAV5.pack(CFG_NAV5_MASK_DYN, DYNAMIC_MODELS[dynamic_model],
+                             0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        messages = [
+            (f"CFG-NAV5 ({dynamic_model})", UBX_CFG_NAV5, nav5),
+            (f"CFG-RATE ({measurement_rate} ms)", UBX_CFG_RATE, CFG_RATE.pack(measurement_rate, 1, 1)),
+        ]
+        for sentence in disabled_nmea:
+            messages.append((f"CFG-MSG ({sentence} off)", UBX_CFG_MSG,
+                             bytes((NMEA_CLASS, NMEA_MSG_IDS[sentence], 0))))
+
+        failed = []
+        for name, msg_id, payload in messages:
+            try:
+                self.send_config(UBX_CFG, msg_id, payload)
+            except RuntimeError as e:
+                failed.append(f"{name}: {e}")
+
+        if failed:
+            raise RuntimeError("GPS configuration incomplete; " + "; ".join(failed))
+
+        if DEBUG_MODE:
+            print(f"\n[UBLOX] Configured: {dynamic_model} model, {measurement_rate} ms rate, "
+                  f"disabled {', '.join(disabled_nmea)}")
+
+
+    def configure_tx_ready(self, pio=GPS_TXREADY_PIO, threshold=GPS_TXREADY_THRESHOLD, active_high=True):
+        """
+        Enables the TX-ready output for the I2C (DDC) port (UBX-CFG-PRT).
+
+        The module then drives PIO 'pio' while at least 'threshold' bytes are
+        waiting in its output buffer, so reads can wait for the pin instead
+        of polling registers 0xFD/0xFE.
+
+        param pio: Module PIO used as the TX-ready output
+        param threshold: Bytes pending before the pin is asserted (rounded down to a multiple of 8)
+        param active_high: Drive the pin high (True) or low (False) when data is ready
+        """
+        tx_ready = TXREADY_EN | ((pio & 0x1F) << 2) | (((threshold // 8) & 0x1FF) << 7)
+        if not active_high:
+            tx_ready |= TXREADY_ACTIVE_LOW
+        payload = CFG_PRT_DDC.pack(DDC_PORT_ID, tx_ready, self.address << 1,
+                                   PROTO_UBX | PROTO_NMEA, PROTO_UBX | PROTO_NMEA, 0)
+        self.send_config(UBX_CFG, UBX_CFG_PRT, payload)
+
+
+    def poll_nav_pvt(self, timeout=1.0):
+        """
+        Polls a single NAV-PVT message.
+
+        param timeout: Maximum time to wait for the response (seconds)
+        returns: A collection of parsed GPS data, or an empty collection on timeout
+        """
+        self.write_ubx(UBX_NAV, UBX_NAV_PVT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for msg_class, msg_id, payload in self.get_ubx_messages():
+                if (msg_class, msg_id) == (UBX_NAV, UBX_NAV_PVT):
+                    return parse_nav_pvt(payload)
+            time.sleep(GPS_POLL_INTERVAL)
+        return {}
+
+
     def parse_gps_data(self):
         """
-        Parses GPS data from NMEA GGA or NMEA RMC sentences.
+        Parses GPS data from NMEA sentences (GGA, RMC, GSA, VTG; only the
+        fields selected with set_nmea_fields()), or from the latest NAV-PVT
+        message in UBX mode.
 
         returns: A collection of parsed GPS data.
         """
+        if self.protocol == 'ubx':
+            gps_data = {}
+            for msg_class, msg_id, payload in self.get_ubx_messages():
+                if (msg_class, msg_id) == (UBX_NAV, UBX_NAV_PVT):
+                    gps_data = parse_nav_pvt(payload)
+            return gps_data
+
         try:
             sentences = self.get_nmea_sentences()
             gps_data = {}
+            table = self.nmea_table
             
             for sentence in sentences:
-                if 'GGA' in sentence:
-                    gga_data = self.parse_gga(sentence)
-                    gps_data.update(gga_data)
-                elif 'RMC' in sentence:
-                    rmc_data = self.parse_rmc(sentence)
-                    gps_data.update(rmc_data)
+                gps_data.update(parse_nmea_sentence(sentence, table))
         
         except Exception:
             raise
@@ -211,61 +708,254 @@ class UBLOX_I2C:
         return gps_data
 
 
-def poll_gps(timeout_seconds=20, max_no_fix_cycles=10):
+class GPIOEdgeSource:
+    """
+    Waits for the module's TX-ready output on a Raspberry Pi GPIO pin (RPi.GPIO).
+    """
+
+    def __init__(self, pin, active_high=True):
+        """
+        param pin: BCM number of the GPIO wired to the module's TX-ready PIO
+        param active_high: The module drives the pin high (True) or low (False) when data is ready
+        """
+        if GPIO is None:
+            raise RuntimeError("RPi.GPIO is not installed.")
+        self.pin = pin
+        self.active_level = GPIO.HIGH if active_high else GPIO.LOW
+        self.edge = GPIO.RISING if active_high else GPIO.FALLING
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN if active_high else GPIO.PUD_UP)
+
+    def wait(self, timeout):
+        """
+        Waits until data is ready.
+
+        param timeout: Maximum time to wait (seconds)
+        returns: True if the pin is asserted, False on timeout
+        """
+        # The pin may already be asserted (data arrived while the last read was parsed)
+        if GPIO.input(self.pin) == self.active_level:
+            return True
+        return GPIO.wait_for_edge(self.pin, self.edge, timeout=max(1, int(timeout * 1000))) is not None
+
+    def close(self):
+        GPIO.cleanup(self.pin)
+
+
+class GPSService(threading.Thread):
     """
-    Polls the GPS module for positional data.
+    Background GPS reader.
 
-    param timeout_seconds: Maximum time to wait for initial GPS fix
-    param max_no_fix_cycles: Maximum iterations without a fix before giving up
+    Keeps one bus handle and one UBLOX_I2C (so partial sentences are kept
+    between reads), continuously drains and parses the module's output, and
+    caches the latest fix with its age plus a short fix history.
+    """
+
+    def __init__(self, bus_num=1, address=0x42, poll_interval=GPS_POLL_INTERVAL, history=GPS_FIX_HISTORY,
+                 protocol=GPS_PROTOCOL, capture=GPS_CAPTURE, txready_pin=GPS_TXREADY_PIN, edge_source=None,
+                 bus=None):
+        """
+        param bus_num: I2C bus number (usually 1 on Raspberry Pi)
+        param address: I2C address (default 0x42 for UBLOX)
+        param poll_interval: Time to wait between reads when no data is available
+        param history: Number of fixes kept in the fix history
+        param protocol: 'nmea' or 'ubx' (subscribes to periodic NAV-PVT)
+        param capture: Record the raw byte stream to data/gps_capture.bin (see gps_capture)
+        param txready_pin: BCM GPIO wired to the module's TX-ready output (None to poll)
+        param edge_source: An object with wait(timeout) used instead of the GPIO pin
+            (e.g. SimulatedEdgeSource in utils/sim.py); the module is still configured for TX-ready
+        param bus: An SMBus-like object used instead of opening bus 'bus_num'
+            (e.g. FakeSMBus in utils/sim.py, or gps_capture.ReplayBus)
+        """
+        super().__init__(name="ublox", daemon=True)
+        self.bus_num = bus_num
+        self.bus = bus
+        self.address = address
+        self.protocol = protocol
+        self.poll_interval = poll_interval
+        self.capture = gps_capture.CaptureWriter() if capture else None
+        self.txready_pin = txready_pin
+        self.edge_source = edge_source
+        self.gps = None
+        self.started_at = time.monotonic()
+        self.no_fix_count = 0
+        self.error = None
+
+        self._latest = None
+        self._history = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._new_fix = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def latest(self):
+        """
+        Returns the latest fix and its age.
+
+        returns: (fix dict, age in seconds), or (None, None) if there has been no fix
+        """
+        latest = self._latest
+        if latest is None:
+            return None, None
+        fix, timestamp = latest
+        return dict(fix), time.monotonic() - timestamp
+
+    def wait_for_fix(self, timeout, max_age=GPS_MAX_FIX_AGE):
+        """
+        Waits until the cached fix is at most 'max_age' seconds old.
+
+        returns: True if there is such a fix (within 'timeout' seconds)
+        """
+        deadline = time.monotonic() + timeout
+        with self._new_fix:
+            while True:
+                _, age = self.latest()
+                if age is not None and age <= max_age:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._new_fix.wait(remaining)
+
+    def history(self):
+        """
+        Returns the recent fixes, oldest first.
+
+        returns: A list of (monotonic timestamp, fix dict) pairs
+        """
+        with self._lock:
+            return list(self._history)
+
+    def _record(self, data):
+        """
+        Records one complete epoch (a GGA sentence and whatever preceded it).
+        """
+        if data.get('fix_quality', 0) > 0:
+            timestamp = time.monotonic()
+            self._latest = (data, timestamp)
+            with self._lock:
+                self._history.append((timestamp, data))
+            self.no_fix_count = 0
+            with self._new_fix:
+                self._new_fix.notify_all()
+        else:
+            self.no_fix_count += 1
+        if self.capture is not None:
+            # Keep the capture file complete up to the last epoch
+            self.capture.flush()
+
+    def run(self):
+        # Data from sentences of the epoch that is still being read (RMC comes before GGA)
+        pending = {}
+        while not self._stop_event.is_set():
+            data = {}
+            try:
+                if self.gps is None:
+                    gps = UBLOX_I2C(bus_num=self.bus_num, address=self.address, protocol=self.protocol,
+                                    bus=self.bus, capture=self.capture)
+                    if GPS_CONFIGURE:
+                        try:
+                            gps.configure()
+                        except Exception as e:
+                            # Keep reading with whatever settings were applied
+                            print("ERROR: GPS configuration failed:", e)
+                    if self.protocol == 'ubx':
+                        gps.enable_nav_pvt()
+                    if self.txready_pin is not None or self.edge_source is not None:
+                        self._setup_tx_ready(gps)
+                    self.gps = gps
+                data = self.gps.parse_gps_data()
+                self.error = None
+            except Exception as e:
+                self.error = e
+
+            if data:
+                pending.update(data)
+                # The GGA sentence carries the fix quality and closes the epoch
+                if 'fix_quality' in data:
+                    self._record(pending)
+                    pending = {}
+            elif self.edge_source is not None:
+                # Read as soon as the module has data (re-checks the registers after a timeout)
+                self.edge_source.wait(GPS_TXREADY_TIMEOUT)
+            else:
+                self._stop_event.wait(self.poll_interval)
+
+    def _setup_tx_ready(self, gps):
+        """
+        Configures the TX-ready output and opens the edge source, falling back to polling on failure.
+        """
+        try:
+            gps.configure_tx_ready()
+            if self.edge_source is None:
+                self.edge_source = GPIOEdgeSource(self.txready_pin)
+        except Exception as e:
+            print("ERROR: GPS TX-ready setup failed, polling instead:", e)
+            self.edge_source = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self.edge_source is not None and hasattr(self.edge_source, 'close'):
+            self.edge_source.close()
+        if self.capture is not None:
+            self.capture.flush()
+
+
+# Shared background reader used by poll_gps()
+service = None
+
+
+def start_service(**kwargs):
+    """
+    Starts the shared background GPS reader (if it is not already running).
+
+    returns: The running GPSService
+    """
+    global service
+    if service is None:
+        service = GPSService(**kwargs)
+        service.start()
+    return service
+
+
+def poll_gps(timeout_seconds=20, max_no_fix_cycles=10, max_age=GPS_MAX_FIX_AGE, wait=0, with_timestamp=False):
+    """
+    Returns the freshest fix from the background GPS reader (without waiting,
+    unless 'wait' is given).
+
+    param timeout_seconds: Maximum time to wait for the initial GPS fix (after the reader starts)
+    param max_no_fix_cycles: Maximum epochs without a fix before the fix is reported as lost
+    param max_age: Maximum age (seconds) of a fix before it is reported as stale
+    param wait: Time to wait for a fresh fix when there is none (e.g. the deadline stage budget)
+    param with_timestamp: Also return when the fix was read (time.monotonic())
+    returns: The fix dict, or (fix dict, timestamp) with 'with_timestamp'
     """
     try:
         print("[UBLOX] Polling GPS...", end="")
-        gps = UBLOX_I2C(bus_num=1, address=0x42)
-        if DEBUG_MODE:
-            print("\nGPS module connected!")
-            print(f"Waiting for GPS fix (timeout: {timeout_seconds}s)...")
-        
-        start_time = time.time()
-        last_fix = 0
-        no_fix_count = 0
-        got_first_fix = False
-        data = {}
-        
-        while True:
-            # Check timeout
-            elapsed = time.time() - start_time
-            if not got_first_fix and elapsed > timeout_seconds:
+        gps_service = start_service()
+        if wait > 0:
+            gps_service.wait_for_fix(wait, max_age)
+
+        data, age = gps_service.latest()
+        if data is None:
+            if gps_service.error is not None:
+                raise RuntimeError(f"GPS read error: {gps_service.error}")
+            if time.monotonic() - gps_service.started_at > timeout_seconds:
                 raise RuntimeError(f"Timeout: No GPS fix after {timeout_seconds} seconds.")
-            
-            try:
-                data = gps.parse_gps_data()
-            except Exception:
-                pass
-            
-            if data:
-                # Only print when we have a fix
-                has_fix = data.get('fix_quality', 0) > 0
-                
-                if has_fix:
-                    got_first_fix = True
-                    no_fix_count = 0
-                    print("DONE:",f"({len(data.values())} values)")
-                    return data                 
-                else:
-                    # No fix in this cycle
-                    no_fix_count += 1
-                    
-                    # Check if we've lost fix for too long (after having a fix)
-                    if got_first_fix and no_fix_count > max_no_fix_cycles:
-                        raise RuntimeError(f"Lost GPS fix for {max_no_fix_cycles} cycles.")
-                    
-                    if time.time() - last_fix > 5:
-                        # Print waiting message every 5 seconds if no fix
-                        print(".", end="", flush=True)
-                        last_fix = time.time()
-            
-            time.sleep(0.5)
-            
+            raise RuntimeError("Waiting for first GPS fix.")
+
+        if gps_service.no_fix_count > max_no_fix_cycles:
+            raise RuntimeError(f"Lost GPS fix for {max_no_fix_cycles} cycles.")
+
+        if age > max_age:
+            raise RuntimeError(f"Stale GPS fix ({age:.0f} seconds old).")
+
+        if DEBUG_MODE:
+            print(f"\nGPS fix age: {age:.1f}s")
+        print("DONE:",f"({len(data.values())} values)")
+        if with_timestamp:
+            return data, time.monotonic() - age
+        return data
+
     except KeyboardInterrupt:
         raise
     except Exception:
@@ -1,98 +1,242 @@
-import subprocess
-from gps import gps, WATCH_ENABLE
+import os
+import json
 import time
+import socket
+import threading
 from datetime import datetime
 
 from debug import DEBUG_MODE
+from config import GPS_MAX_FIX_AGE
 
-def read_gps(gps_device, max_attempts=5, timeout=3):
+# gpsd JSON socket
+GPSD_HOST = "localhost"
+GPSD_PORT = 2947
+WATCH_COMMAND = b'?WATCH={"enable":true,"json":true};\n'
+
+# Where gpsd reports are logged by read_gps() (None disables logging)
+REPORT_LOG = None
+
+
+class GpsdClient(threading.Thread):
     """
-    Connects to a USB VFAN GPS device and attempts to read latitude, longitude, 
-    and altitude data. Makes a limited number of attempts before returning.
-    
+    Long-lived gpsd streaming client.
+
+    Keeps one socket to gpsd with WATCH enabled, splits the JSON stream into
+    reports as it arrives, and caches the latest TPV (fix) and SKY (satellite)
+    reports. The connection is re-opened after an error. Reports can be logged
+    to a file, which is kept open and flushed every 'flush_lines' lines.
+    """
+
+    def __init__(self, host=GPSD_HOST, port=GPSD_PORT, log_file=None, flush_lines=50, reconnect_delay=1.0):
+        """
+        Parameters:
+            host (str): gpsd host.
+            port (int): gpsd port.
+            log_file (str): File every report is appended to (None disables logging).
+            flush_lines (int): Logged lines buffered before they are written out.
+            reconnect_delay (float): Time to wait before reconnecting after an error (seconds).
+        """
+        super().__init__(name="gpsd", daemon=True)
+        self.host = host
+        self.port = port
+        self.log_file = log_file
+        self.flush_lines = flush_lines
+        self.reconnect_delay = reconnect_delay
+        self.error = None
+
+        self._tpv = None
+        self._sky = None
+        self._log = None
+        self._unflushed = 0
+        self._fix_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def latest(self):
+        """
+        Returns the latest TPV report and its age.
+
+        Returns:
+            tuple: (TPV report dict, age in seconds), or (None, None) if there has been none.
+        """
+        latest = self._tpv
+        if latest is None:
+            return None, None
+        report, timestamp = latest
+        return report, time.monotonic() - timestamp
+
+    def sky(self):
+        """
+        Returns the latest SKY report (or None).
+        """
+        return self._sky
+
+    def wait_for_fix(self, timeout):
+        """
+        Waits until the latest TPV report has a 2D/3D fix.
+
+        Returns:
+            bool: True if there is a fix.
+        """
+        return self._fix_event.wait(timeout)
+
+    def _log_report(self, line):
+        if self.log_file is None:
+            return
+        if self._log is None:
+            self._log = open(self.log_file, "a")
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._log.write(f"[{timestamp}] {line}\n")
+        self._unflushed += 1
+        if self._unflushed >= self.flush_lines:
+            self._log.flush()
+            self._unflushed = 0
+
+    def handle_line(self, line):
+        """
+        Decodes one line of the gpsd stream and caches TPV/SKY reports.
+        """
+        try:
+            report = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(report, dict):
+            return
+        self._log_report(line)
+
+        report_class = report.get("class")
+        if report_class == "TPV":
+            self._tpv = (report, time.monotonic())
+            if report.get("mode", 0) >= 2:
+                self._fix_event.set()
+            else:
+                # Fix lost: wait_for_fix() waits for the next one
+                self._fix_event.clear()
+        elif report_class == "SKY":
+            self._sky = report
+
+    def _stream(self):
+        """
+        Reads reports from one connection until it fails or the client is stopped.
+        """
+        with socket.create_connection((self.host, self.port), timeout=5) as sock:
+            sock.sendall(WATCH_COMMAND)
+            # Short timeout so stop() is noticed
+            sock.settimeout(1.0)
+            buffer = b""
+            while not self._stop_event.is_set():
+                try:
+                    data = sock.recv(4096)
+                except socket.timeout:
+                    continue
+                if not data:
+                    raise ConnectionError("gpsd closed the connection")
+
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        self.handle_line(line.decode("utf-8", "replace"))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        # Skip a malformed report rather than ending the reader
+                        if DEBUG_MODE:
+                            print(f"\n[VFAN] Skipped bad gpsd report: {e}", end="")
+                self.error = None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._stream()
+            except (OSError, ConnectionError) as e:
+                self.error = e
+                if DEBUG_MODE:
+                    print(f"\n[VFAN] gpsd connection error: {e}", end="")
+                self._stop_event.wait(self.reconnect_delay)
+
+        if self._log is not None:
+            self._log.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# Shared client used by read_gps()
+client = None
+
+
+def start_client(**kwargs):
+    """
+    Starts the shared gpsd client (if it is not already running).
+
+    Returns:
+        GpsdClient: The running client.
+    """
+    global client
+    if client is None:
+        kwargs.setdefault("log_file", REPORT_LOG)
+        client = GpsdClient(**kwargs)
+        client.start()
+    return client
+
+
+def read_gps(gps_device, max_attempts=5, timeout=3, max_age=GPS_MAX_FIX_AGE):
+    """
+    Returns the latest latitude, longitude, and altitude from a USB VFAN GPS
+    device (through the shared gpsd client).
+
     Parameters:
         gps_device (str): The GPS device found in the /dev folder (e.g. "ttyACM0").
         max_attempts (int): Maximum number of attempts to read GPS data.
-        timeout (int): Max wait time for GPS data
+        timeout (int): Max wait time for GPS data (per attempt, only while there is no fix)
+        max_age (float): Maximum age (seconds) of the latest report before it is rejected as stale.
 
     Returns:
         dict: A dictionary of latitude, longitude, and altitude readings, or empty dict if no data.
     """
-    
+
     print("[VFAN] Reading...", end="")
-        
+
     # Output initially empty
     gps_output_data = {}
 
-    try:
-        # Get the list of devices in /dev directory
-        device_list = subprocess.check_output(["ls", "/dev"]).decode("utf-8")
-
-        # Check if the GPS device path is present in the list of devices
-        if gps_device in device_list:
-            # GPS device (ttyACM0) is present, establish connection
-            session = gps(mode=WATCH_ENABLE)
-            
-            # Make a limited number of attempts to get GPS data
-            for attempt in range(1, max_attempts + 1):
-                if DEBUG_MODE:
-                    print(f"\n[VFAN] Read attempt {attempt}/{max_attempts}", end="")               
-		    
-                # Set a short timeout for this attempt
-                if session.waiting(timeout):  # Wait for data (false if no data)
-                    report = session.next()
-                    if DEBUG_MODE:
-                        print("\n[VFAN] Data received.  Checking...", end="")
-                else:
-                    if DEBUG_MODE:
-                        print("\n[VFAN] Timeout exceeded. ", end="")
-                        if attempt == max_attempts:
-                            print("Exiting...")
-                        else:
-                            print("Retrying...")         
-                    continue
+    if not os.path.exists(os.path.join("/dev", gps_device)):
+        # GPS device was not found in the device list
+        raise IOError(f"GPS device {gps_device} not found")
 
-                # Test for UBLOX
-                with open("/home/n8ssu/ublox_log.txt", "a") as fp:
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    line = f"[{timestamp}] {report}"
-                    fp.write(line + "\n")
-
-                if hasattr(report, 'class') and report['class'] == 'TPV':
-                    # Check if report has the required attributes
-                    if hasattr(report, 'lat') and hasattr(report, 'lon') and hasattr(report, 'alt'):
-                        # Ensures latitude, longitude, and altitude are valid
-                        if report.lat != 'n/a' and report.lon != 'n/a' and report.alt != 'n/a':
-                            # Adds data to data dictionary
-                            gps_output_data["Latitude"] = str(report.lat)
-                            gps_output_data["Longitude"] = str(report.lon)
-                            gps_output_data["Altitude"] = str(round(report.alt, 1))
-                            
-                            print("DONE")
-                            
-                            return gps_output_data
-                        
-                    else:
-                        # Required key was missing, error
-                        raise ValueError("Required key was missing")
-                else:
-                    #Likely communicating with wrong device
-                    raise ValueError("Device class not TPV")
-                
-                # Brief pause before next attempt
-                time.sleep(0.5)
-                
-        else:
-            # GPS device was not found in the device list
-            raise IOError(f"GPS device {gps_device} not found")
-
-    except Exception:
-        raise
-            
-    finally:
-        # Close the session if it was opened
-        if 'session' in locals():
-            try:
-                session.close()
-            except:
-                pass
+    gpsd = start_client()
+
+    # Only waits while there is no fix; otherwise the cached report is returned immediately
+    if not gpsd.wait_for_fix(timeout * max_attempts):
+        if DEBUG_MODE:
+            print("\n[VFAN] Timeout exceeded. Exiting...")
+        if gpsd.error is not None:
+            raise IOError(f"gpsd error: {gpsd.error}")
+        return gps_output_data
+
+    report, age = gpsd.latest()
+    if report.get("mode", 0) < 2:
+        # Fix was lost since
+        return gps_output_data
+
+    if age > max_age:
+        # gpsd stopped sending reports
+        if DEBUG_MODE:
+            print(f"\n[VFAN] Stale report ({age:.0f} seconds old). Exiting...")
+        return gps_output_data
+
+    altitude = report.get("altMSL", report.get("alt"))
+    if report.get("lat") is None or report.get("lon") is None or altitude is None:
+        # Required key was missing, error
+        raise ValueError("Required key was missing")
+
+    # Adds data to data dictionary
+    gps_output_data["Latitude"] = str(report["lat"])
+    gps_output_data["Longitude"] = str(report["lon"])
+    gps_output_data["Altitude"] = str(round(altitude, 1))
+
+    if DEBUG_MODE:
+        print(f"\n[VFAN] Report age: {age:.1f}s")
+    print("DONE")
+
+    return gps_output_data
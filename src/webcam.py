@@ -1,5 +1,6 @@
 import os
 import subprocess
+import time
 from datetime import datetime
 from typing import List, Union
 
@@ -10,9 +11,14 @@ ROOT_DIR = Path(__file__).parent.parent
 IMAGE_DIR = ROOT_DIR / "data/images/"
 # Make a default image save location
 
+# The capture program and the directory searched for webcam devices
+# (both can be pointed elsewhere, e.g. at a stub when off the Pi)
+FSWEBCAM = "fswebcam"
+DEVICE_DIR = "/dev"
+
 def webcam_connected(webcam):
     """
-    Checks the /dev directory for a specified webcam device path.
+    Checks the device directory (/dev by default) for a specified webcam device path.
 
     Parameters:
     webcam (str): The webcam device found in the /dev folder (e.g. "video0").
@@ -22,7 +28,7 @@ def webcam_connected(webcam):
         bool: False if the webcam device is not found.
     """
     # Get the list of devices in /dev directory
-    device_list = subprocess.check_output(["ls", "/dev"]).decode("utf-8")
+    device_list = subprocess.check_output(["ls", DEVICE_DIR]).decode("utf-8")
 
     # Check if the webcam device path is present in the list of devices
     if webcam in device_list:
@@ -30,7 +36,8 @@ def webcam_connected(webcam):
     else:
         return False
 
-def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_path=IMAGE_DIR) -> List[Union[str, int]]:
+def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_path=None,
+                   timeout=None) -> List[Union[str, int]]:
     """
     Uses fswebcam to save an image of specified resolution to a specified filepath.
 
@@ -39,14 +46,19 @@ def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_p
         num_skip (int): The number of frames to skip before capturing.
         cap_delay (int): The delay before capturing an image (in seconds).
         num_cap (int): The number of frames to capture.
-        file_path (str): The directory where the images will be saved (relative to /main).
+        file_path (str): The directory where the images will be saved (default: IMAGE_DIR).
         webcam_devices (list[str]): A list of webcam USB devices to iterate through (e.g. "video0").
+        timeout (float): Maximum time (in seconds) for all of the captures (default: no limit).
+            Captures that would start past it, or that run past it, are skipped.
 
     Returns:
         Union[str, int]: A list of the filepaths of the capture images, and the number of saved images.
         The number of saved images is always the item in the last index.
     """
     print(f"[WEBCAM] Capturing {len(webcam_devices)} images...", end="")
+
+    if file_path is None:
+        file_path = IMAGE_DIR
     
     # The number of images saved
     num_images_saved = 0
@@ -54,8 +66,20 @@ def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_p
     # A list of the saved image filepaths (initially empty)
     generated_image_paths = []
 
+    # The number of captures skipped for lack of time
+    num_skipped = 0
+
+    # Time by which every capture must be done
+    deadline = None if timeout is None else time.monotonic() + timeout
+
     # Captures an image from each webcam
     for webcam in webcam_devices:
+        # Do not start a capture past the deadline
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            num_skipped += 1
+            continue
+
         # Ensures webcam is connected
         if not webcam_connected(webcam):
             raise IOError("Webcam disconnected or invalid device path.")
@@ -71,16 +95,16 @@ def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_p
             generated_image_paths.append(unique_image_file_path)
 
             # Constructs an fswebcam command using the the function arguments
-            cmd = (
-                f"fswebcam --quiet "
-                f"-r {img_res} -p YUYV "
-                f"-S {num_skip} -D {cap_delay} -F {num_cap} "
-                f"-d /dev/{webcam} {unique_image_file_path} "
-                "> /dev/null"
-            )
+            # (run without a shell, so the timeout kills fswebcam itself)
+            cmd = [
+                FSWEBCAM, "--quiet",
+                "-r", str(img_res), "-p", "YUYV",
+                "-S", str(num_skip), "-D", str(cap_delay), "-F", str(num_cap),
+                "-d", os.path.join(DEVICE_DIR, webcam), unique_image_file_path,
+            ]
 
             # Checks that the images were captured successfully
-            if (subprocess.run(cmd, shell=True)).returncode == 0:
+            if (subprocess.run(cmd, stdout=subprocess.DEVNULL, timeout=remaining)).returncode == 0:
                 # Increments the number of successful captures
                 num_images_saved += 1
                 if DEBUG_MODE:
@@ -88,9 +112,17 @@ def capture_images(img_res, num_skip, cap_delay, num_cap, webcam_devices, file_p
             else:
                 raise Exception("Unable to resolve fswebcam command for ", unique_image_file_path)
 
+        except subprocess.TimeoutExpired:
+            # Out of time: fswebcam was killed, carry on with the other webcams
+            generated_image_paths.remove(unique_image_file_path)
+            num_skipped += 1
+
         except Exception as e:
             raise Exception("Unable to capture image on" + webcam + "device: ", e)
 
+    if num_skipped > 0:
+        print(f"\n[WEBCAM] Skipped {num_skipped} capture(s) past the {timeout}s timeout")
+
     # Adds success count to the end of the list to be returned
     generated_image_paths.append(str(num_images_saved))
 
@@ -1,17 +1,143 @@
+import fcntl
+import socket
+import struct
 import subprocess
 
+from config import CUTOFF_ALTITUDE, WIFI_INTERFACE, WIFI_HYSTERESIS
+
+# Link state is read from sysfs and changed with SIOCSIFFLAGS, so no process
+# is forked (changing it needs CAP_NET_ADMIN, e.g. running the service as root).
+# Without it, 'sudo ifconfig' is used instead.
+SYSFS_NET_DIR = "/sys/class/net"
+SIOCGIFFLAGS = 0x8913
+SIOCSIFFLAGS = 0x8914
+IFF_UP = 0x1
+
+# struct ifreq: interface name + flags (padded to the size of the ifreq union)
+IFREQ_FLAGS = struct.Struct("16sH22x")
+
+
+def read_interface_up(interface=WIFI_INTERFACE):
+    """
+    Reads whether a network interface is administratively up (from sysfs).
+
+    Returns:
+        bool: True if the interface's IFF_UP flag is set.
+    """
+    with open(f"{SYSFS_NET_DIR}/{interface}/flags", "r") as fp:
+        return (int(fp.read().strip(), 16) & IFF_UP) != 0
+
+
+# False once SIOCSIFFLAGS was refused (no CAP_NET_ADMIN); 'sudo ifconfig' is used from then on
+ioctl_permitted = True
+
+
+def set_interface_up(interface, up):
+    """
+    Brings a network interface up or down (equivalent to 'ifconfig <interface> up/down').
+
+    Falls back to 'sudo ifconfig' if the process may not change the link state itself.
+
+    Raises:
+        OSError: If the state could not be changed either way.
+    """
+    global ioctl_permitted
+    if ioctl_permitted:
+        name = interface.encode("ascii")
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                result = fcntl.ioctl(sock, SIOCGIFFLAGS, IFREQ_FLAGS.pack(name, 0))
+                flags = IFREQ_FLAGS.unpack(result)[1]
+                flags = (flags | IFF_UP) if up else (flags & ~IFF_UP)
+                fcntl.ioctl(sock, SIOCSIFFLAGS, IFREQ_FLAGS.pack(name, flags))
+            return
+        except PermissionError as e:
+            ioctl_permitted = False
+            print(f"ERROR: Cannot switch {interface} directly ({e}), using 'sudo ifconfig' instead")
+
+    try:
+        subprocess.run(["sudo", "ifconfig", interface, "up" if up else "down"], check=True)
+    except subprocess.CalledProcessError as e:
+        raise OSError(f"'sudo ifconfig {interface}' failed: {e}")
+
+
+class WifiController:
+    """
+    Switches Wi-Fi off above the cutoff altitude, without forking.
+
+    The link state is cached after the first sysfs read. Wi-Fi is disabled
+    at or above the cutoff altitude and only re-enabled once the altitude
+    drops below (cutoff - hysteresis), so it does not flap near the
+    threshold.
+    """
+
+    def __init__(self, interface=WIFI_INTERFACE, cutoff=CUTOFF_ALTITUDE, hysteresis=WIFI_HYSTERESIS):
+        self.interface = interface
+        self.cutoff = cutoff
+        self.hysteresis = hysteresis
+        self._enabled = None
+
+    def is_enabled(self, refresh=False):
+        """
+        Returns the (cached) link state.
+
+        Args:
+            refresh: Re-read the state from sysfs instead of using the cache
+        """
+        if refresh or self._enabled is None:
+            self._enabled = read_interface_up(self.interface)
+        return self._enabled
+
+    def set_enabled(self, enabled):
+        """
+        Brings the interface up or down if it is not already in that state.
+
+        Returns:
+            bool: True if the interface state was changed.
+        """
+        # Confirm against sysfs before changing anything (the state may have been changed externally)
+        if self.is_enabled(refresh=True) == enabled:
+            return False
+        set_interface_up(self.interface, enabled)
+        self._enabled = enabled
+        print("Wi-Fi enabled" if enabled else "Wi-Fi disabled")
+        return True
+
+    def update(self, altitude):
+        """
+        Applies the cutoff for the current altitude.
+
+        Args:
+            altitude: Current altitude (m)
+        """
+        try:
+            if altitude >= self.cutoff:
+                if self.is_enabled():
+                    self.set_enabled(False)
+            elif altitude < self.cutoff - self.hysteresis:
+                if not self.is_enabled():
+                    self.set_enabled(True)
+            # Inside the hysteresis band: keep the current state
+
+        except OSError as e:
+            print(f"Error switching Wi-Fi: {e}")
+
+
+# Shared controller used by bmp280.read_sensor()
+controller = WifiController()
+
+
 def is_wifi_enabled():
     """
     Checks if the Wi-Fi interface (wlan0) is enabled.
-    
+
     Returns:
         bool: True if Wi-Fi is enabled, False otherwise.
     """
     try:
-        result = subprocess.run(['sudo', 'ifconfig', 'wlan0'], capture_output=True, text=True, check=True)
-        return 'UP' in result.stdout
-    
-    except subprocess.CalledProcessError as e:
+        return controller.is_enabled(refresh=True)
+
+    except OSError as e:
         print(f"Error checking Wi-Fi status: {e}")
         return False
 
@@ -20,13 +146,10 @@ def enable_wifi():
     Enables the Wi-Fi interface (wlan0) if it is not already enabled.
     """
     try:
-        if not is_wifi_enabled():
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'up'], check=True)
-            print("Wi-Fi enabled")
-        else:
+        if not controller.set_enabled(True):
             print("Wi-Fi already enabled")
 
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         print(f"Error enabling Wi-Fi: {e}")
 
 def disable_wifi():
@@ -34,11 +157,8 @@ def disable_wifi():
     Disables the Wi-Fi interface (wlan0) if it is enabled.
     """
     try:
-        if is_wifi_enabled():
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'down'], check=True)
-            print("Wi-Fi disabled")
-        else:
+        if not controller.set_enabled(False):
             print("Wi-Fi already disabled")
 
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         print(f"Error disabling Wi-Fi: {e}")
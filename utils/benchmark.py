@@ -0,0 +1,282 @@
+"""
+Off-Pi benchmark for the flight software.
+
+Runs the drivers and the main loop cycle against the fakes in utils/sim.py
+and reports throughput and latency per benchmark, so regressions show up
+before a launch.
+
+Usage:
+    python3 utils/benchmark.py [iterations] [cycles]
+
+The GPS parser is also benchmarked on a recorded byte stream (see
+src/gps_capture.py): a capture of simulated epochs is replayed as fast as
+possible, reporting sentences/s and allocations per sentence.
+
+Finally the background GPS reader is run with each TX-ready setup
+(polling, TX-ready edges, a pin that never fires, and a module that
+rejects the TX-ready configuration), reporting fixes and bus transactions.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR.resolve()))
+
+import sim
+
+# The fakes must be installed before any driver is imported
+# (the background GPS reader gets a new epoch once a second, like the real module)
+GPS_BUS = sim.install(gps_bus=sim.FakeSMBus(epoch_interval=1.0), bmp280_profile=sim.ascent_profile())
+
+import wifi
+import bmp280
+import ublox
+import gps_capture
+import aprs_tx
+import telem
+import tx_queue
+import beacon
+import webcam
+import timing
+import main
+
+DEFAULT_ITERATIONS = 2000
+DEFAULT_CYCLES = 200
+DEFAULT_REPLAY_EPOCHS = 2000
+DEFAULT_TXREADY_SECONDS = 3.0
+
+
+def run_benchmark(name, func, iterations):
+    """
+    Calls 'func' repeatedly (with its output silenced) and times every call.
+
+    Returns:
+        dict: Benchmark name, call count, throughput (calls/s) and p50/p95/max latency (s)
+    """
+    histogram = timing.LatencyHistogram()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            call_start = time.perf_counter()
+            func()
+            histogram.record(time.perf_counter() - call_start)
+        total = time.perf_counter() - start
+
+    stats = histogram.summary()
+    stats["name"] = name
+    stats["rate"] = iterations / total if total > 0 else float("inf")
+    return stats
+
+
+def print_results(results):
+    print(f"{'Benchmark':<40}{'Calls':>8}{'Calls/s':>12}{'p50 (ms)':>11}{'p95 (ms)':>11}{'max (ms)':>11}")
+    print("-" * 93)
+    for stats in results:
+        print(f"{stats['name']:<40}{stats['count']:>8}{stats['rate']:>12.1f}"
+              f"{stats['p50'] * 1000:>11.3f}{stats['p95'] * 1000:>11.3f}{stats['max'] * 1000:>11.3f}")
+
+
+def record_capture(file, epochs):
+    """
+    Records a capture of 'epochs' simulated GPS epochs (one per read).
+    """
+    capture = gps_capture.CaptureWriter(file)
+    gps = ublox.UBLOX_I2C(bus=sim.FakeSMBus(), capture=capture)
+    for _ in range(epochs):
+        gps.drain()
+    capture.close()
+    return capture.records
+
+
+def replay_capture(file, trace=False):
+    """
+    Replays a capture as fast as possible through get_nmea_sentences() and
+    parses every sentence (all NMEA fields).
+
+    Args:
+        file: Capture file path
+        trace: Measure the allocation high-water mark of every read with tracemalloc
+
+    Returns:
+        tuple[int, float, int]: Sentences parsed, elapsed time (s), and the summed
+            per-read allocation peaks (bytes, 0 unless 'trace')
+    """
+    gps = ublox.UBLOX_I2C(bus=gps_capture.ReplayBus(file))
+    gps.set_nmea_fields(None)
+    table = gps.nmea_table
+
+    sentences = 0
+    peak_bytes = 0
+    start = time.perf_counter()
+    while not gps.bus.exhausted:
+        if trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        for sentence in gps.get_nmea_sentences():
+            ublox.parse_nmea_sentence(sentence, table)
+            sentences += 1
+        if trace:
+            peak_bytes += tracemalloc.get_traced_memory()[1] - before
+    return sentences, time.perf_counter() - start, peak_bytes
+
+
+def replay_benchmark(epochs):
+    """
+    Parser throughput and allocation benchmark on a recorded byte stream.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        file = os.path.join(tmp, "gps_capture.bin")
+        records = record_capture(file, epochs)
+
+        # Throughput without tracing overhead, then a second pass for allocations
+        sentences, elapsed, _ = replay_capture(file)
+        tracemalloc.start()
+        try:
+            _, _, peak_bytes = replay_capture(file, trace=True)
+        finally:
+            tracemalloc.stop()
+
+    print(f"\nGPS replay: {records} records, {sentences} sentences in {elapsed * 1000:.1f} ms "
+          f"({sentences / elapsed:.0f} sentences/s, "
+          f"{peak_bytes / max(1, sentences):.0f} peak bytes allocated per sentence)")
+
+
+def run_gps_service(bus, edge_source, seconds):
+    """
+    Runs a background GPS reader on 'bus' for 'seconds'.
+
+    Returns:
+        GPSService: The stopped reader
+    """
+    service = ublox.GPSService(bus=bus, capture=False, edge_source=edge_source)
+    service.start()
+    time.sleep(seconds)
+    service.stop()
+    service.join()
+    return service
+
+
+def txready_benchmark(seconds):
+    """
+    Fixes and bus transactions of the background GPS reader with each TX-ready setup.
+    """
+    title = f"GPS reader ({seconds:g} s, 1 epoch/s)"
+    print(f"\n{title:<34} {'Fixes':>6} {'Bus transactions':>17} {'Edges':>6} {'Timeouts':>9}  Mode")
+    print("-" * 91)
+
+    cases = []
+    bus = sim.FakeSMBus(epoch_interval=1.0)
+    cases.append(("polling", bus, None))
+    bus = sim.FakeSMBus(epoch_interval=1.0)
+    cases.append(("TX-ready edges", bus, sim.SimulatedEdgeSource(bus)))
+    # The pin never fires: the reader re-checks the registers after every timeout
+    cases.append(("TX-ready pin missing", sim.FakeSMBus(epoch_interval=1.0), sim.SimulatedEdgeSource()))
+    # The module rejects UBX-CFG-PRT: the reader falls back to polling
+    bus = sim.FakeSMBus(epoch_interval=1.0)
+    bus.nak.add((ublox.UBX_CFG, ublox.UBX_CFG_PRT))
+    cases.append(("TX-ready setup rejected", bus, sim.SimulatedEdgeSource(bus)))
+
+    for name, bus, edge_source in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            service = run_gps_service(bus, edge_source, seconds)
+        mode = "TX-ready" if service.edge_source is not None else "polling"
+        edges = edge_source.edges if edge_source is not None else "-"
+        timeouts = edge_source.timeouts if edge_source is not None else "-"
+        print(f"{name:<34} {len(service.history()):>6} {bus.transactions:>17} {edges:>6} {timeouts:>9}  {mode}")
+
+
+def main_benchmark(iterations, cycles):
+    # Fixed waits (GPS poll interval) would dominate every result
+    sim.skip_sleeps(ublox)
+    sim.patch_wifi(wifi)
+
+    telemetry = {
+        "BMP280": {"Temperature": "12.3", "Pressure": "0.95", "Altitude": "545.0"},
+        "UBLOX": {"latitude": 41.41494, "longitude": -81.86140, "altitude": 545.4,
+                  "fix_quality": 1, "num_sats": 8},
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        packet = aprs_tx.create_aprs_packet("N0CALL", "11", telemetry, message="BENCH")
+
+    with tempfile.TemporaryDirectory() as tmp, sim.KissSink() as sink, sim.AgwServer() as agw:
+        # Point every output of the loop at the fakes / the temporary directory
+        webcam.FSWEBCAM = sim.make_capture_stub(tmp)
+        webcam.DEVICE_DIR = sim.make_device_dir(tmp, main.WEBCAM_DEVICES)
+        webcam.IMAGE_DIR = tmp
+        telem.LOG_FNAME = os.path.join(tmp, "data.txt")
+        main.KISS_HOST, main.KISS_PORT = sink.host, sink.port
+        main.AGW_HOST, main.AGW_PORT = agw.host, agw.port
+        main.LATENCY_FLUSH_CYCLES = 0
+        # Send every packet right away (the airtime budget would hold most of them back)
+        beacon.budget = None
+
+        # Parser benchmark on its own bus, with a new epoch on every read
+        gps = ublox.UBLOX_I2C()
+        gps.bus = sim.FakeSMBus()
+        # UBX mode: NAV-PVT only (no NMEA)
+        gps_ubx = ublox.UBLOX_I2C(protocol="ubx")
+        gps_ubx.bus = sim.FakeSMBus(sentences=[])
+        gps_ubx.enable_nav_pvt()
+        # Enqueue cost on its own queue (the sender discards the packets)
+        queue = tx_queue.TxQueue(lambda packet: None, maxsize=iterations)
+        queue.start()
+        results = [
+            run_benchmark("bmp280.read_sensor", bmp280.read_sensor, iterations),
+            run_benchmark("ublox.UBLOX_I2C.parse_gps_data", gps.parse_gps_data, iterations),
+            run_benchmark("ublox.UBLOX_I2C.parse_gps_data (ubx)", gps_ubx.parse_gps_data, iterations),
+            run_benchmark("ublox.poll_gps", ublox.poll_gps, iterations),
+            run_benchmark("aprs_tx.create_aprs_packet (compressed)",
+                          lambda: aprs_tx.create_aprs_packet("N0CALL", "11", telemetry,
+                                                             position_format="compressed"), iterations),
+            run_benchmark("aprs_tx.create_aprs_packet (base91)",
+                          lambda: aprs_tx.create_aprs_packet("N0CALL", "11", telemetry,
+                                                             position_format="compressed",
+                                                             telemetry_channels=main.APRS_TELEMETRY_CHANNELS,
+                                                             telemetry_bits=main.APRS_TELEMETRY_BITS),
+                          iterations),
+            run_benchmark("aprs_tx.create_aprs_packet",
+                          lambda: aprs_tx.create_aprs_packet("N0CALL", "11", telemetry), iterations),
+            run_benchmark("create_aprs_packet + TxQueue.put",
+                          lambda: queue.put(aprs_tx.create_aprs_packet("N0CALL", "11", telemetry)), iterations),
+            run_benchmark("aprs_tx.encode_kiss_frame", lambda: aprs_tx.encode_kiss_frame(packet), iterations),
+            run_benchmark("aprs_tx.transmit_via_direwolf_kiss",
+                          lambda: aprs_tx.transmit_via_direwolf_kiss(packet, sink.host, sink.port,
+                                                                     agw_host=agw.host, agw_port=agw.port),
+                          iterations),
+            run_benchmark("aprs_tx.transmit_via_direwolf_agw",
+                          lambda: aprs_tx.transmit_via_direwolf_agw(packet, agw.host, agw.port), iterations),
+            run_benchmark("telem.log_data", lambda: telem.log_data(packet), iterations),
+            run_benchmark("webcam.capture_images",
+                          lambda: webcam.capture_images(main.RESOLUTION, main.SKIPPED_FRAMES, main.CAPTURE_DELAY,
+                                                        main.CAPTURED_FRAMES, main.WEBCAM_DEVICES),
+                          max(1, iterations // 20)),
+            run_benchmark("main.run_cycle", main.run_cycle, cycles),
+        ]
+        # Give the sink a moment to drain the last frames
+        time.sleep(0.2)
+        frames = len(sink.frames)
+        queue.stop()
+        tx_stats = tx_queue.queue.stats()
+
+    print_results(results)
+    print(f"\nKISS sink received {frames} frames; GPS bus served {GPS_BUS.transactions} transactions "
+          f"({GPS_BUS.bytes_read} bytes)")
+    print(f"AGW server received {len(agw.frames)} frames over {agw.connections} connection(s), "
+          f"answered {agw.queries} transmit queue queries")
+    print(f"Transmit queue: {tx_stats['sent']} sent, {tx_stats['dropped']} dropped, {tx_stats['retried']} retried, "
+          f"mean enqueue-to-send latency {tx_stats['latency'] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CYCLES
+    main_benchmark(iterations, cycles)
+    replay_benchmark(DEFAULT_REPLAY_EPOCHS)
+    txready_benchmark(DEFAULT_TXREADY_SECONDS)
@@ -0,0 +1,734 @@
+"""
+Hardware simulation layer.
+
+Fakes for the hardware that src/ normally talks to, so the drivers and the
+main loop can run off the Pi:
+    - FakeSMBus: scripted u-blox DDC (I2C) port that emits NMEA bytes at 0x42
+      (and answers UBX polls/configuration messages), with smbus2's combined
+      i2c_rdwr() transfers (FakeI2cMsg stands in for smbus2.i2c_msg)
+    - SimulatedEdgeSource: stand-in for the u-blox TX-ready GPIO edge
+    - FakeBMP280: stand-in for adafruit_bmp280.Adafruit_BMP280_I2C
+    - KissSink: local TCP server standing in for the direwolf KISS port
+    - AgwServer: local TCP server standing in for the direwolf AGW port
+    - make_capture_stub: writes a stub capture program used in place of fswebcam
+
+Call install() BEFORE importing the drivers, so that their 'smbus'/'smbus2',
+'board' and 'adafruit_bmp280' imports resolve to the fakes. The fakes are kept out
+of the flight code in src/, which must be on sys.path (see benchmark.py).
+"""
+
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+import time
+import types
+
+UBLOX_ADDRESS = 0x42
+# i2c_msg flag of a read message (linux/i2c.h)
+I2C_M_RD = 0x0001
+
+
+def nmea_sentence(body):
+    """
+    Builds a complete NMEA sentence (with '$', checksum and CRLF) from its body.
+
+    Args:
+        body: Sentence body between '$' and '*' (e.g. "GPGGA,...")
+
+    Returns:
+        bytes: The encoded sentence
+    """
+    checksum = 0
+    for char in body.encode("ascii"):
+        checksum ^= char
+    return f"${body}*{checksum:02X}\r\n".encode("ascii")
+
+
+# One epoch of the M8Q factory-default NMEA output (with a valid fix)
+DEFAULT_EPOCH = [
+    "GPRMC,123519.00,A,4124.89630,N,08151.68380,W,22.4,84.4,230394,,,A",
+    "GPVTG,84.4,T,,M,22.4,N,41.5,K,A",
+    "GPGGA,123519.00,4124.89630,N,08151.68380,W,1,08,0.9,545.4,M,-34.0,M,,",
+    "GPGSA,A,3,10,07,05,02,29,04,08,13,,,,,1.72,1.03,1.38",
+    "GPGSV,3,1,11,10,63,137,17,07,61,098,15,05,59,290,20,08,54,157,30",
+    "GPGSV,3,2,11,02,39,223,19,13,28,070,17,26,23,252,,04,14,186,14",
+    "GPGSV,3,3,11,29,09,301,24,16,09,020,,36,,,",
+    "GPGLL,4124.89630,N,08151.68380,W,123519.00,A,A",
+]
+
+
+# UBX-CFG-MSG ids of the standard NMEA sentences (class 0xF0)
+NMEA_MSG_IDS = {"GGA": 0x00, "GLL": 0x01, "GSA": 0x02, "GSV": 0x03, "RMC": 0x04, "VTG": 0x05}
+
+
+class FakeI2cMsg:
+    """
+    Stand-in for smbus2.i2c_msg: one read or write message of an i2c_rdwr() transfer.
+    """
+
+    def __init__(self, address, flags, data):
+        self.addr = address
+        self.flags = flags
+        self.buf = bytearray(data)
+        self.len = len(self.buf)
+
+    @classmethod
+    def read(cls, address, length):
+        return cls(address, I2C_M_RD, bytes(length))
+
+    @classmethod
+    def write(cls, address, buf):
+        return cls(address, 0, bytes(buf))
+
+    def __iter__(self):
+        return iter(self.buf)
+
+
+class FakeSMBus:
+    """
+    Scripted stand-in for smbus.SMBus (and smbus2.SMBus) with a u-blox receiver at 0x42.
+
+    Each epoch of sentences becomes available once the previous one has been
+    read out (and at most once every 'epoch_interval' seconds), like the
+    receiver's DDC output buffer.
+
+    UBX messages written to the fake are decoded: NAV-PVT polls are answered,
+    UBX-CFG-MSG turns NMEA sentences and periodic NAV-PVT on or off, and every
+    CFG message is acknowledged (ACK-ACK) and recorded in 'config', except the
+    (class, id) pairs in 'nak', which are rejected (ACK-NAK).
+    """
+
+    def __init__(self, sentences=None, address=UBLOX_ADDRESS, epoch_interval=0.0):
+        """
+        Args:
+            sentences: NMEA sentence bodies emitted every epoch (default: DEFAULT_EPOCH)
+            address: I2C address the fake receiver answers on
+            epoch_interval: Minimum time between epochs (seconds)
+        """
+        if sentences is None:
+            sentences = DEFAULT_EPOCH
+        self.sentences = list(sentences)
+        self.disabled = set()
+        self.nav_pvt_rate = 0
+        self.config = {}
+        self.nak = set()
+        self._received = bytearray()
+        self._build_epoch()
+        self.address = address
+        self.epoch_interval = epoch_interval
+        self.stream = bytearray()
+        self.next_epoch = 0.0
+        self.transactions = 0
+        self.bytes_read = 0
+        self.writes = []
+
+    def _build_epoch(self):
+        self.epoch = b"".join(nmea_sentence(body) for body in self.sentences
+                              if NMEA_MSG_IDS.get(body[2:5]) not in self.disabled)
+        if self.nav_pvt_rate:
+            self.epoch += self.nav_pvt_frame()
+
+    @staticmethod
+    def nav_pvt_frame():
+        """
+        Returns a UBX-NAV-PVT frame for the position in DEFAULT_EPOCH (3D fix, 8 satellites).
+        """
+        from ublox import NAV_PVT, ubx_frame
+
+        payload = NAV_PVT.pack(
+            45319000, 1994, 3, 23, 12, 35, 19, 0x07, 50, 0,  # iTOW, date/time, valid, tAcc, nano
+            3, 0x01, 0x00, 8,                                 # fixType, flags (gnssFixOK), flags2, numSV
+            -818613967, 414149383, 511400, 545400,           # lon, lat, height, hMSL
+            2500, 3500,                                       # hAcc, vAcc
+            1116, 11469, -5000, 11523, 8440000,               # velN, velE, velD, gSpeed, headMot
+            300, 200000, 172, 0,                              # sAcc, headAcc, pDOP, flags3
+            0, 0, 0,                                          # headVeh, magDec, magAcc
+        )
+        return ubx_frame(0x01, 0x07, payload)
+
+    def _handle_ubx(self, msg_class, msg_id, payload):
+        from ublox import ubx_frame
+
+        if (msg_class, msg_id) == (0x01, 0x07) and not payload:
+            # NAV-PVT poll
+            self.stream += self.nav_pvt_frame()
+            return
+        if msg_class != 0x06:
+            return
+        if (msg_class, msg_id) in self.nak:
+            self.stream += ubx_frame(0x05, 0x00, bytes((msg_class, msg_id)))
+            return
+
+        if msg_id == 0x01 and len(payload) in (3, 8):
+            # CFG-MSG: rate on the current port (3 bytes) or per port, DDC first (8 bytes)
+            target, rate = (payload[0], payload[1]), payload[2]
+            if target == (0x01, 0x07):
+                self.nav_pvt_rate = rate
+            elif target[0] == 0xF0:
+                if rate:
+                    self.disabled.discard(target[1])
+                else:
+                    self.disabled.add(target[1])
+            self._build_epoch()
+
+        self.config[(msg_class, msg_id)] = bytes(payload)
+        self.stream += ubx_frame(0x05, 0x01, bytes((msg_class, msg_id)))
+
+    def _receive(self, data):
+        """
+        Decodes the UBX frames written by the host.
+        """
+        self._received += data
+        while True:
+            start = self._received.find(b"\xb5\x62")
+            if start < 0 or len(self._received) - start < 6:
+                break
+            length = self._received[start + 4] | (self._received[start + 5] << 8)
+            end = start + 8 + length
+            if end > len(self._received):
+                break
+            frame = bytes(self._received[start:end])
+            del self._received[:end]
+            self._handle_ubx(frame[2], frame[3], frame[6:-2])
+
+    def feed(self, data):
+        """
+        Queues raw bytes to be read out ahead of the next epoch.
+        """
+        self.stream += data
+
+    def _check_address(self, address):
+        self.transactions += 1
+        if address != self.address:
+            raise OSError(121, "Remote I/O error")
+
+    def _refill(self):
+        now = time.monotonic()
+        if not self.stream and now >= self.next_epoch:
+            self.stream += self.epoch
+            self.next_epoch = now + self.epoch_interval
+
+    def _take(self, length):
+        data = bytes(self.stream[:length])
+        del self.stream[:length]
+        self.bytes_read += len(data)
+        # An empty output buffer reads as 0xFF
+        return list(data) + [0xFF] * (length - len(data))
+
+    def read_byte_data(self, address, register):
+        self._check_address(address)
+        if register == 0xFD:
+            self._refill()
+            return (len(self.stream) >> 8) & 0xFF
+        if register == 0xFE:
+            return len(self.stream) & 0xFF
+        return self._take(1)[0]
+
+    def _read_from(self, register, length):
+        if register == 0xFD:
+            # Register address auto-increments: 0xFD, 0xFE, then the data stream
+            self._refill()
+            available = len(self.stream)
+            header = [(available >> 8) & 0xFF, available & 0xFF]
+            return (header + self._take(max(0, length - 2)))[:length]
+        return self._take(length)
+
+    def read_i2c_block_data(self, address, register, length=32):
+        self._check_address(address)
+        return self._read_from(register, length)
+
+    def i2c_rdwr(self, *messages):
+        """
+        Runs a combined transfer (one transaction): a one-byte write sets the
+        register address, reads continue from it, longer writes are UBX data.
+        """
+        self._check_address(messages[0].addr)
+        register = 0xFF
+        for message in messages:
+            if message.addr != self.address:
+                raise OSError(121, "Remote I/O error")
+            if message.flags & I2C_M_RD:
+                message.buf[:] = bytes(self._read_from(register, message.len))
+                register = 0xFF
+            elif message.len == 1:
+                register = message.buf[0]
+            else:
+                self.writes.append(bytes(message.buf))
+                self._receive(bytes(message.buf))
+
+    def write_i2c_block_data(self, address, register, data):
+        self._check_address(address)
+        self.writes.append(bytes([register] + list(data)))
+        self._receive(bytes([register] + list(data)))
+
+    def write_byte(self, address, value):
+        self._check_address(address)
+        self.writes.append(bytes([value]))
+        self._receive(bytes([value]))
+
+    def close(self):
+        pass
+
+
+class SimulatedEdgeSource:
+    """
+    Stand-in for the TX-ready GPIO edge (ublox.GPIOEdgeSource).
+
+    Edges are raised with trigger(), or follow a FakeSMBus: the pin counts
+    as asserted while the fake has bytes queued or its next epoch is due.
+    """
+
+    def __init__(self, bus=None):
+        """
+        Args:
+            bus: FakeSMBus whose output drives the pin (None: only trigger() raises edges)
+        """
+        self.bus = bus
+        self.waits = 0
+        self.edges = 0
+        self.timeouts = 0
+        self._edge = threading.Event()
+
+    def trigger(self):
+        """
+        Raises one edge.
+        """
+        self._edge.set()
+
+    def _delay(self):
+        """
+        Returns the time until the bus has data, or None without a bus.
+        """
+        if self.bus is None:
+            return None
+        if self.bus.stream:
+            return 0.0
+        return max(0.0, self.bus.next_epoch - time.monotonic())
+
+    def wait(self, timeout):
+        self.waits += 1
+        delay = self._delay()
+        if delay is not None and delay <= timeout:
+            self._edge.wait(delay)
+        elif not self._edge.wait(timeout):
+            self.timeouts += 1
+            return False
+        self._edge.clear()
+        self.edges += 1
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeI2C:
+    """
+    Stand-in for board.I2C().
+    """
+
+    def deinit(self):
+        pass
+
+
+class FakeBMP280:
+    """
+    Stand-in for adafruit_bmp280.Adafruit_BMP280_I2C.
+
+    Readings follow an altitude profile (a function of the time since the
+    fake was created) through the standard atmosphere.
+    """
+
+    # Altitude profile shared by every instance: seconds -> metres
+    profile = staticmethod(lambda elapsed: 250.0)
+
+    # Number of driver instances created (each one re-reads the calibration)
+    instances = 0
+
+    def __init__(self, i2c, address=0x77):
+        FakeBMP280.instances += 1
+        self.mode = 0x00
+        self.i2c = i2c
+        self.address = address
+        self.sea_level_pressure = 1013.25
+        self.start = time.monotonic()
+        self.reads = 0
+        self.register_reads = 0
+        # Like the driver, read the calibration block once on construction
+        coefficients = [float(value) for value in struct.unpack("<HhhHhhhhhhhh", self._read_register(0x88, 24))]
+        self._temp_calib, self._pressure_calib = coefficients[:3], coefficients[3:]
+
+    def _altitude_m(self):
+        self.reads += 1
+        return self.profile(time.monotonic() - self.start)
+
+    # Example calibration block from the BMP280 datasheet (dig_T1..T3, dig_P1..P9)
+    CALIBRATION = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+
+    def _read_register(self, register, length):
+        """
+        Register-level reads: the calibration block (0x88) and the raw data burst (0xF7).
+        """
+        self.register_reads += 1
+        if register == 0x88:
+            return bytearray(struct.pack("<HhhHhhhhhhhh", *self.CALIBRATION))[:length]
+        if register == 0xF7:
+            altitude = self._altitude_m()
+            raw_temperature, raw_pressure = self._raw_sample(15.0 - 0.0065 * altitude,
+                                                             self._pressure_at(altitude))
+            data = bytearray([(raw_pressure >> 12) & 0xFF, (raw_pressure >> 4) & 0xFF, (raw_pressure & 0x0F) << 4,
+                              (raw_temperature >> 12) & 0xFF, (raw_temperature >> 4) & 0xFF,
+                              (raw_temperature & 0x0F) << 4])
+            return data[:length]
+        return bytearray(length)
+
+    def _raw_sample(self, temperature, pressure):
+        """
+        Inverts the datasheet compensation (by bisection) to get the raw ADC
+        values that read back as the given temperature (C) and pressure (hPa).
+        """
+        from bmp280 import compensate
+
+        calibration = (self.CALIBRATION[:3], self.CALIBRATION[3:])
+
+        def bisect(target, index, increasing, fixed):
+            low, high = 0, (1 << 20) - 1
+            while low < high:
+                middle = (low + high) // 2
+                if index == 0:
+                    value = compensate(middle, fixed, calibration)[0]
+                else:
+                    value = compensate(fixed, middle, calibration)[1]
+                if (value < target) == increasing:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        raw_temperature = bisect(temperature, 0, True, 0)
+        raw_pressure = bisect(pressure, 1, False, raw_temperature)
+        return raw_temperature, raw_pressure
+
+    def _pressure_at(self, altitude):
+        return self.sea_level_pressure * (1.0 - altitude / 44330.0) ** 5.255
+
+    @property
+    def temperature(self):
+        return 15.0 - 0.0065 * self._altitude_m()
+
+    @property
+    def pressure(self):
+        return self._pressure_at(self._altitude_m())
+
+    @property
+    def altitude(self):
+        return self._altitude_m()
+
+
+class KissSink:
+    """
+    Local TCP server standing in for the direwolf KISS port.
+
+    Counts the KISS frames (FEND ... FEND) received over every connection.
+    """
+
+    FEND = 0xC0
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.frames = []
+        self.bytes_received = 0
+        self.connections = 0
+        self._server = None
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(128)
+        self.port = self._server.getsockname()[1]
+        self._running.set()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        if self._server:
+            self._server.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while self._running.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        buffer = bytearray()
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    break
+                if not data:
+                    break
+                buffer += data
+                with self._lock:
+                    self.bytes_received += len(data)
+                    # Split out complete frames, keeping any partial one
+                    while True:
+                        start = buffer.find(self.FEND)
+                        if start < 0:
+                            buffer.clear()
+                            break
+                        end = buffer.find(self.FEND, start + 1)
+                        if end < 0:
+                            del buffer[:start]
+                            break
+                        if end > start + 1:
+                            self.frames.append(bytes(buffer[start:end + 1]))
+                        del buffer[:end]
+
+
+class AgwServer:
+    """
+    Local TCP server standing in for the direwolf AGW port.
+
+    Answers callsign registration ('X') and transmit queue queries ('y'/'Y'),
+    and records the frames sent ('K' raw, 'V' unproto) as (kind, radio port,
+    call from, call to, data). Each frame is "transmitted" 'tx_time' seconds
+    after the previous one, and counts as outstanding until then.
+    """
+
+    HEADER = struct.Struct('<B3xcxBx10s10sII')
+
+    def __init__(self, host="127.0.0.1", port=0, tx_time=0.0):
+        self.host = host
+        self.port = port
+        self.tx_time = tx_time
+        self.frames = []
+        self.registered = []
+        self.queries = 0
+        self.connections = 0
+        self._done_at = []
+        self._server = None
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(128)
+        self.port = self._server.getsockname()[1]
+        self._running.set()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        if self._server:
+            self._server.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def outstanding(self):
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for done_at in self._done_at if done_at > now)
+
+    def _accept_loop(self):
+        while self._running.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(conn, length):
+        data = b""
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def _reply(self, conn, port, kind, data):
+        conn.sendall(self.HEADER.pack(port, kind, 0, b"", b"", len(data), 0) + data)
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    header = self._recv_exact(conn, self.HEADER.size)
+                    port, kind, _, call_from, call_to, length, _ = self.HEADER.unpack(header)
+                    data = self._recv_exact(conn, length)
+                except OSError:
+                    break
+                call_from = call_from.rstrip(b"\0").decode("ascii")
+                call_to = call_to.rstrip(b"\0").decode("ascii")
+
+                if kind == b"X":
+                    with self._lock:
+                        self.registered.append(call_from)
+                    self._reply(conn, port, b"X", b"\x01")
+                elif kind in (b"y", b"Y"):
+                    with self._lock:
+                        self.queries += 1
+                    count = self.outstanding() if kind == b"y" else 0
+                    self._reply(conn, port, kind, struct.pack("<I", count))
+                elif kind in (b"K", b"V"):
+                    now = time.monotonic()
+                    with self._lock:
+                        start = max([now] + self._done_at[-1:])
+                        self._done_at.append(start + self.tx_time)
+                        self.frames.append((kind, port, call_from, call_to, data))
+
+
+CAPTURE_STUB = """#!/bin/sh
+# Stand-in for fswebcam: creates an empty image at the output path (last argument)
+for last; do :; done
+: > "$last"
+"""
+
+
+def make_capture_stub(directory):
+    """
+    Writes a stub capture program that accepts fswebcam's arguments.
+
+    Args:
+        directory: Directory to write the stub to
+
+    Returns:
+        str: Path of the stub (use as webcam.FSWEBCAM)
+    """
+    path = os.path.join(directory, "fswebcam")
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(CAPTURE_STUB)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def make_device_dir(directory, devices):
+    """
+    Creates placeholder device files (use the directory as webcam.DEVICE_DIR).
+    """
+    for device in devices:
+        open(os.path.join(directory, device), "w").close()
+    return directory
+
+
+class _NoSleepTime(types.ModuleType):
+    """
+    'time' module replacement whose sleep() returns immediately.
+    """
+
+    def __init__(self):
+        super().__init__("time")
+        self.__dict__.update({name: getattr(time, name) for name in dir(time) if not name.startswith("__")})
+        self.sleep = lambda seconds: None
+
+
+def skip_sleeps(*modules):
+    """
+    Makes time.sleep() a no-op inside the given driver modules, so fixed
+    waits do not dominate a benchmark.
+    """
+    no_sleep = _NoSleepTime()
+    for module in modules:
+        module.time = no_sleep
+
+
+def patch_wifi(wifi_module, enabled=True):
+    """
+    Replaces the sysfs read and the interface ioctl with a simulated link
+    that records every state change.
+
+    Args:
+        wifi_module: The imported wifi module
+        enabled: Initial link state
+
+    Returns:
+        list[str]: The recorded state changes ("enable"/"disable")
+    """
+    calls = []
+    link = {"up": enabled}
+
+    def set_interface_up(interface, up):
+        link["up"] = up
+        calls.append("enable" if up else "disable")
+
+    wifi_module.read_interface_up = lambda interface=None: link["up"]
+    wifi_module.set_interface_up = set_interface_up
+    return calls
+
+
+def install(gps_bus=None, bmp280_profile=None):
+    """
+    Registers the fake 'smbus', 'smbus2', 'board' and 'adafruit_bmp280' modules.
+
+    Args:
+        gps_bus: FakeSMBus returned by every smbus.SMBus()/smbus2.SMBus() (default: a new FakeSMBus)
+        bmp280_profile: Altitude profile for FakeBMP280 (seconds -> metres)
+
+    Returns:
+        FakeSMBus: The bus shared by every smbus.SMBus() call
+    """
+    if gps_bus is None:
+        gps_bus = FakeSMBus()
+    if bmp280_profile is not None:
+        FakeBMP280.profile = staticmethod(bmp280_profile)
+
+    smbus = types.ModuleType("smbus")
+    smbus.SMBus = lambda bus_num=1: gps_bus
+
+    smbus2 = types.ModuleType("smbus2")
+    smbus2.SMBus = smbus.SMBus
+    smbus2.i2c_msg = FakeI2cMsg
+
+    board = types.ModuleType("board")
+    board.I2C = FakeI2C
+
+    adafruit_bmp280 = types.ModuleType("adafruit_bmp280")
+    adafruit_bmp280.Adafruit_BMP280_I2C = FakeBMP280
+    adafruit_bmp280.MODE_SLEEP, adafruit_bmp280.MODE_FORCE, adafruit_bmp280.MODE_NORMAL = 0x00, 0x01, 0x03
+
+    sys.modules.update({"smbus": smbus, "smbus2": smbus2, "board": board, "adafruit_bmp280": adafruit_bmp280})
+    return gps_bus
+
+
+def ascent_profile(rate=5.0, ground=250.0, burst=30000.0):
+    """
+    Returns a simple flight altitude profile: constant ascent, then descent at twice the rate.
+    """
+    climb_time = (burst - ground) / rate
+
+    def profile(elapsed):
+        if elapsed < climb_time:
+            return ground + rate * elapsed
+        return max(ground, burst - 2 * rate * (elapsed - climb_time))
+
+    return profile